@@ -3,10 +3,22 @@
 BEMIFY Batch Klimasimulering
 
 Kjører BEMIFY-simuleringer for flere EPW-klimafiler automatisk.
-Bruker BEMIFY's innebygde batchSimulateToNdjson som skriver direkte til fil.
+Uten -o brukes BEMIFY's innebygde batchSimulateToNdjson som skriver direkte
+til fil via en fil-dialog. Med -o skriver Python NDJSON-filen, og
+simuleringene kan fordeles på flere parallelle nettlesere.
 
 Bruk:
     python bemify_batch_runner.py bygning.sxi ./klimafiler/ --headed
+    python bemify_batch_runner.py bygning.sxi ./klimafiler/ -o results.ndjson --workers 8
+    python bemify_batch_runner.py bygning.sxi ./klimafiler/ -o results.ndjson --daemon
+    python bemify_batch_runner.py bygning.sxi ./klimafiler/ -o results.ndjson --profile --trace run.jsonl
+    python bemify_batch_runner.py bygning.sxi ./klimafiler/ -o results.bemstore --felt inneklima
+
+Med -o kan en avbrutt kjøring startes på nytt med samme kommando:
+klimasteder som allerede står i filen, hoppes over. Slutter filnavnet
+på .gz eller .zst, komprimeres hver linje for seg (zstd krever pakken
+zstandard). Slutter det på .bemstore, overføres de valgte tidsseriene
+binært fra siden og skrives rett til et kolonnelager (se bemify_binary.py).
 
 Krav:
     pip install playwright tqdm
@@ -14,12 +26,17 @@ Krav:
 """
 
 import argparse
+import json
+import os
+import shutil
 import sys
 import time
+from functools import partial
 from pathlib import Path
+from typing import BinaryIO
 
 try:
-    from playwright.sync_api import sync_playwright, Page, TimeoutError as PlaywrightTimeout
+    from playwright.sync_api import Page
 except ImportError:
     print("Feil: playwright er ikke installert. Kjør:")
     print("  pip install playwright")
@@ -33,6 +50,107 @@ except ImportError:
     print("  pip install tqdm")
     sys.exit(1)
 
+from bemify_binary import LagerSkriver, eksporter_binar, er_lager, legg_til_binar_argumenter, read_header
+from bemify_cache import (
+    ResultatCache,
+    cache_fra_argumenter,
+    cache_nokkel,
+    innholds_hash,
+    legg_til_cache_argumenter,
+)
+from bemify_daemon import koble_til
+from bemify_klima import EpwFil, les_epw_filer
+from bemify_ndjson import (
+    climate_name_from_head,
+    compression_for_suffix,
+    detect_compression,
+    iter_lines,
+    iter_members,
+    member_writer,
+)
+from bemify_session import (
+    ArbeiderPool,
+    forbered_neste,
+    hent_auth_sti,
+    hent_bygg_id,
+    last_klima,
+    sikre_prosjekt,
+    slipp_klima,
+    start_simulering,
+)
+from bemify_trace import (
+    avslutt_sporing,
+    legg_til_sporings_argumenter,
+    pakk_ut,
+    registrer,
+    registrer_simulering,
+    spenn,
+    spor_forberedelse,
+    spor_oppgave,
+    sporing_fra_argumenter,
+)
+
+# Maks antall tegn per overføring når et resultat hentes ut av siden
+EKSPORT_BIT = 4_000_000
+
+# Serialiserer én NDJSON-linje i biter, så verken siden eller Python må
+# holde hele JSON-strengen (flere hundre MB for store bygg) samtidig
+EKSPORT_JS = """
+(navn) => {
+    function* verdi(v, dybde) {
+        if (Array.isArray(v) && v.length > 256) {
+            yield '[';
+            for (let i = 0; i < v.length; i += 256) {
+                const biter = [];
+                for (let j = i; j < Math.min(i + 256, v.length); j++) {
+                    biter.push(JSON.stringify(v[j]) ?? 'null');
+                }
+                yield (i ? ',' : '') + biter.join(',');
+            }
+            yield ']';
+        } else if (dybde < 2 && v && typeof v === 'object' && !Array.isArray(v)) {
+            yield '{';
+            let forste = true;
+            for (const [k, x] of Object.entries(v)) {
+                if (x === undefined || typeof x === 'function') continue;
+                yield (forste ? '' : ',') + JSON.stringify(k) + ':';
+                forste = false;
+                yield* verdi(x, dybde + 1);
+            }
+            yield '}';
+        } else {
+            yield JSON.stringify(v) ?? 'null';
+        }
+    }
+    function* linje(result) {
+        yield '{"climateName":' + JSON.stringify(navn) + ',"result":';
+        yield* verdi(result, 0);
+        yield '}\\n';
+    }
+    window._bemifyEksport = linje(window._simResult);
+    delete window._simResult;
+}
+"""
+
+HENT_BIT_JS = """
+(maks) => {
+    const deler = [];
+    let n = 0;
+    while (n < maks) {
+        const r = window._bemifyEksport.next();
+        if (r.done) {
+            delete window._bemifyEksport;
+            return { data: deler.join(''), done: true };
+        }
+        deler.push(r.value);
+        n += r.value.length;
+    }
+    return { data: deler.join(''), done: false };
+}
+"""
+
+_fremdrift_mottakere: dict = {}
+
 
 def finn_epw_filer(mappe: Path) -> list[Path]:
     """Finn alle .epw-filer i mappen."""
@@ -48,57 +166,42 @@ def les_filinnhold(filsti: Path) -> str:
         return f.read()
 
 
-def escape_js_string(s: str) -> str:
-    """Escape streng for JavaScript template literal."""
-    return s.replace("\\", "\\\\").replace("`", "\\`").replace("${", "\\${")
-
-
 def kjor_batch_simulering(
     page: Page,
     sxi_innhold: str,
-    epw_filer: list[tuple[str, str]],
+    epw_filer: list[tuple[str, EpwFil]],
     timeout_per_sim: int = 300_000,
+    cache: ResultatCache | None = None,
 ) -> dict:
     """
     Kjør batch-simulering med BEMIFY's innebygde fil-streaming.
     Bruker batchSimulateToNdjson som åpner fil-dialog og skriver direkte til fil.
+    Med cache hentes klimadataene fra klimalageret (se bemify_klima.py).
     """
     total_timeout = timeout_per_sim * len(epw_filer) + 60000
     page.set_default_timeout(total_timeout)
     
     # Parse SXI-fil
     print("[Runner] Parser SXI-fil...")
-    sxi_escaped = escape_js_string(sxi_innhold)
-    
-    project_node = page.evaluate(f"""
-        async () => {{
-            const sxiContent = `{sxi_escaped}`;
-            const projectNode = await window.bemify.parseSxi(sxiContent);
-            window._bemifyProject = projectNode;
-            return {{
-                name: projectNode.data.navn,
-                category: projectNode.data.bygningskategori,
-                zones: projectNode.children?.filter(c => c.type === 'sone')?.length || 0
-            }};
-        }}
-    """)
+    project_node = sikre_prosjekt(page, sxi_innhold)
     
     print(f"[Runner] Prosjekt: {project_node['name']}")
     print(f"[Runner] Kategori: {project_node['category']}, Soner: {project_node['zones']}")
     
-    # Last ALLE klimafiler inn i nettleseren FØR simulering
+    # Last ALLE klimafiler inn i nettleseren FØR simulering.
+    # batchSimulateToNdjson tar hele klimalisten, så her kan de ikke lastes
+    # i et vindu; for store klimabibliotek bør -o brukes.
     print(f"[Runner] Laster {len(epw_filer)} klimafiler inn i nettleseren...")
     
-    for i, (navn, epw_innhold) in enumerate(epw_filer):
-        epw_escaped = escape_js_string(epw_innhold)
-        page.evaluate(f"""
-            () => {{
-                if (!window._climates) window._climates = [];
-                const epwContent = `{epw_escaped}`;
-                const {{ climateData }} = window.bemify.parseEpw(epwContent);
-                window._climates.push({{ name: "{navn}", data: climateData }});
-            }}
-        """)
+    nokler = []
+    for navn, epw in epw_filer:
+        nokler.append(last_klima(page, epw, cache, navn))
+    page.evaluate("""
+        ({ nokler, navn }) => {
+            window._climates = nokler.map((k, i) => ({ name: navn[i], data: window._bemifyKlima.get(k) }));
+        }
+    """, {"nokler": nokler, "navn": [navn for navn, _ in epw_filer]})
+    slipp_klima(page, nokler)
     
     print("[Runner] Alle klimafiler lastet")
     print("")
@@ -110,113 +213,374 @@ def kjor_batch_simulering(
     print("=" * 60)
     print("")
     
-    # Start batch-simulering
+    # Fremdrift sendes fra siden til Python via en eksponert funksjon, og
+    # evaluate venter på promiset fra batchSimulateToNdjson - ingen polling
+    total = len(epw_filer)
+    pbar = tqdm(total=total, desc="Simulerer", unit="klima", ncols=60)
+    progress = {"completed": 0}
+
+    def ved_fremdrift(completed: int, total: int, current_name: str) -> None:
+        if completed > progress["completed"]:
+            pbar.update(completed - progress["completed"])
+            progress["completed"] = completed
+        if current_name and current_name != "Ferdig":
+            pbar.set_description(f"Simulerer: {current_name}")
+
+    # En funksjon kan bare eksponeres én gang per side, så mottakeren
+    # byttes ut for hver kjøring
+    _fremdrift_mottakere[page] = ved_fremdrift
+    if not page.evaluate("() => typeof window._bemifyProgress === 'function'"):
+        page.expose_function("_bemifyProgress", lambda *args: _fremdrift_mottakere[page](*args))
+
+    status = page.evaluate("""
+        async () => {
+            try {
+                const result = await window.bemify.batchSimulateToNdjson(
+                    window._bemifyProject,
+                    window._climates,
+                    (completed, total, currentName) => window._bemifyProgress(completed, total, currentName)
+                );
+                return { result };
+            } catch (err) {
+                return { error: err.message || String(err) };
+            }
+        }
+    """)
+
+    pbar.update(total - progress["completed"])
+    pbar.set_description("Simulerer")
+    pbar.close()
+
+    # Rydd opp
     page.evaluate("""
         () => {
-            window._simProgress = { current: 0, total: 0, name: '' };
-            window._simDone = false;
-            window._simResult = null;
-            window._simError = null;
-            
-            window.bemify.batchSimulateToNdjson(
-                window._bemifyProject,
-                window._climates,
-                (completed, total, currentName) => {
-                    window._simProgress = { current: completed, total, name: currentName };
-                }
-            ).then(result => {
-                window._simResult = result;
-                window._simDone = true;
-            }).catch(err => {
-                window._simError = err.message || String(err);
-                window._simDone = true;
-            });
+            delete window._climates;
+            delete window._bemifyProject;
+            delete window._bemifyProjectKey;
+            delete window._bemifyProjectInfo;
         }
     """)
-    
-    # Poll for progress med progressbar
-    total = len(epw_filer)
-    pbar = tqdm(total=total, desc="Simulerer", unit="klima", ncols=60)
-    last_completed = 0
-    current_name = ""
-    
-    while True:
-        time.sleep(0.3)
-        
-        status = page.evaluate("""
-            () => ({
-                done: window._simDone,
-                progress: window._simProgress,
-                result: window._simResult,
-                error: window._simError
-            })
-        """)
-        
-        progress = status.get("progress", {})
-        current = progress.get("current", 0)
-        name = progress.get("name", "")
-        
-        if current > last_completed:
-            pbar.update(current - last_completed)
-            last_completed = current
-        
-        if name and name != current_name and name != "Ferdig":
-            current_name = name
-            pbar.set_description(f"Simulerer: {name}")
-        
-        if status.get("done"):
-            pbar.update(total - last_completed)
-            pbar.set_description("Simulerer")
-            pbar.close()
-            
-            # Rydd opp
-            page.evaluate("""
-                () => {
-                    delete window._climates;
-                    delete window._bemifyProject;
-                    delete window._simProgress;
-                    delete window._simResult;
-                    delete window._simDone;
-                    delete window._simError;
-                }
-            """)
-            
-            if status.get("error"):
-                print(f"[Runner] Feil: {status['error']}")
-                return {"succeeded": [], "failed": [n for n, _ in epw_filer]}
-            
-            return status.get("result", {"succeeded": [], "failed": []})
 
+    if status.get("error"):
+        print(f"[Runner] Feil: {status['error']}")
+        return {"succeeded": [], "failed": [n for n, _ in epw_filer]}
 
-def hent_auth_sti() -> Path:
-    """Hent sti til lagret autentiseringstilstand."""
-    return Path.home() / ".bemify_auth_state.json"
+    return status.get("result") or {"succeeded": [], "failed": []}
 
 
-def logg_inn_og_lagre(playwright, bemify_url: str) -> Path:
-    """Åpne nettleser for manuell innlogging, lagre autentiseringstilstand."""
-    auth_sti = hent_auth_sti()
-    
-    print("\n" + "=" * 60)
-    print("INNLOGGING KREVES")
-    print("=" * 60)
-    print("En nettleser åpnes nå. Vennligst logg inn på BEMIFY.")
-    print("Når du er logget inn, trykk ENTER her for å fortsette...")
-    print("=" * 60 + "\n")
-    
-    browser = playwright.chromium.launch(headless=False)
-    context = browser.new_context()
-    page = context.new_page()
-    
-    page.goto(bemify_url, wait_until="networkidle", timeout=60000)
-    
-    input("Trykk ENTER når du er logget inn...")
-    
-    context.storage_state(path=str(auth_sti))
-    print(f"[Runner] Autentisering lagret")
-    
-    browser.close()
-    return auth_sti
+def simuler_til_fil(
+    page: Page,
+    sxi_innhold: str,
+    navn: str,
+    epw: EpwFil,
+    del_sti: Path,
+    timeout_per_sim: int = 300_000,
+    binar: bool = False,
+    felt: list[str] | None = None,
+    dtype: str = "float32",
+    cache: ResultatCache | None = None,
+) -> str:
+    """
+    Simuler ett klimasted og skriv NDJSON-linjen til del_sti. Med binar=True
+    skrives i stedet feltene i felt som typede arrays (se bemify_binary.py).
+    Med cache hentes klimadataene fra klimalageret (se bemify_klima.py).
+    """
+    page.set_default_timeout(timeout_per_sim + 60_000)
+    sikre_prosjekt(page, sxi_innhold)
+
+    start_simulering(page, epw, cache)
+    start = time.time()
+    forbered_neste(page)  # Neste klima lastes mens denne simuleringen regner
+    venter_fra = time.time()
+
+    status = page.evaluate("""
+        async () => {
+            const status = await window._bemifySim;
+            delete window._bemifySim;
+            if (status.error) return status;
+            window._simResult = status.result;
+            return { ms: status.ms, simulationTime: status.result.metadata?.simulationTime };
+        }
+    """)
+
+    if status.get("error"):
+        raise RuntimeError(status["error"])
+
+    if binar:
+        # Filen skrives mens bitene kommer, så alt telles som extract
+        eksporter_binar(page, navn, del_sti, felt, dtype)
+        registrer_simulering(start, venter_fra, time.time(), status)
+        return navn
+
+    # Hent resultatet ut av siden i biter
+    page.evaluate(EKSPORT_JS, navn)
+    skrivetid = 0.0
+    with open(del_sti, "w", encoding="utf-8", newline="\n") as f:
+        while True:
+            bit = page.evaluate(HENT_BIT_JS, EKSPORT_BIT)
+            t0 = time.perf_counter()
+            f.write(bit["data"])
+            skrivetid += time.perf_counter() - t0
+            if bit["done"]:
+                break
+
+    # Skrivingen til delfilen skjer mellom bitene, men telles som write
+    slutt = time.time() - skrivetid
+    registrer_simulering(start, venter_fra, slutt, status)
+    registrer("write", slutt, skrivetid)
+    return navn
+
+
+def _skriv_med_navn(kilde: Path, ut: BinaryIO, navn: str) -> None:
+    """Kopier en cachet NDJSON-linje til ut med gjeldende klimanavn."""
+    with open(kilde, "rb") as src:
+        hode = src.read(64 * 1024)
+        start = hode.index(b',"result":')
+        ut.write(b'{"climateName":' + json.dumps(navn, ensure_ascii=False).encode("utf-8"))
+        ut.write(hode[start:])
+        shutil.copyfileobj(src, ut)
+
+
+def utdata_komprimering(output: Path) -> str | None:
+    """Komprimeringen i en eksisterende output, ellers den endelsen gir."""
+    if output.exists() and output.stat().st_size:
+        return detect_compression(output)
+    return compression_for_suffix(output)
+
+
+def les_ferdige_klima(output: Path) -> set[str]:
+    """
+    Finn klimasteder som allerede er skrevet til output. En ufullstendig
+    siste linje (eller et ufullstendig komprimert medlem) fra en avbrutt
+    kjøring kuttes bort.
+    """
+    ferdige = set()
+    slutt = 0
+    codec = detect_compression(output)
+    if codec:
+        ventende = set()
+        for medlem_slutt, hoder, apen in iter_members(output, codec):
+            ventende.update(navn for navn in map(climate_name_from_head, hoder) if navn is not None)
+            if not apen:
+                ferdige |= ventende
+                ventende = set()
+                slutt = medlem_slutt
+    else:
+        with open(output, "rb") as f:
+            for offset, lengde, hode, komplett in iter_lines(f):
+                if not komplett:
+                    break
+                navn = climate_name_from_head(hode)
+                if navn is not None:
+                    ferdige.add(navn)
+                slutt = offset + lengde
+    if slutt < output.stat().st_size:
+        print(f"[Runner] Kutter ufullstendig siste linje i {output}")
+        os.truncate(output, slutt)
+    return ferdige
+
+
+def _delfil_klima(sti: Path) -> str | None:
+    """Klimanavnet i en hel delfil, None hvis den er ufullstendig."""
+    if sti.suffix == ".bin":
+        try:
+            return read_header(sti).get("climateName")
+        except ValueError:
+            return None
+    with open(sti, "rb") as f:
+        hode = f.read(4096)
+        f.seek(0, os.SEEK_END)
+        if not f.tell():
+            return None
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b"\n":
+            return None
+    return climate_name_from_head(hode)
+
+
+def hent_ferdige_deler(deler: Path, navn: set[str]) -> dict[str, Path]:
+    """
+    Finn hele delfiler fra en avbrutt kjøring for klimastedene i navn (hel
+    linje eller gyldig binær hale). De flyttes til deler/gjenbruk, så nye
+    delfiler ikke overskriver dem; resten slettes.
+    """
+    gjenbruk = deler / "gjenbruk"
+    stier = [p for p in deler.iterdir() if p.is_file()] if deler.is_dir() else []
+    if gjenbruk.is_dir():
+        stier += list(gjenbruk.iterdir())
+    funnet = {}
+    for sti in sorted(stier):
+        klima = _delfil_klima(sti)
+        if klima not in navn:
+            sti.unlink()
+            continue
+        gjenbruk.mkdir(parents=True, exist_ok=True)
+        funnet[klima] = gjenbruk / f"{innholds_hash(klima)}{sti.suffix}"
+        os.replace(sti, funnet[klima])
+    return funnet
+
+
+def kjor_batch_til_fil(
+    pool: ArbeiderPool,
+    sxi_innhold: str,
+    epw_filer: list[tuple[str, EpwFil]],
+    output: Path,
+    timeout_per_sim: int = 300_000,
+    cache: ResultatCache | None = None,
+    fortsett: bool = True,
+    vindu: int = 1,
+    felt: list[str] | None = None,
+    dtype: str = "float32",
+) -> dict:
+    """
+    Kjør batch-simulering fordelt på arbeiderne og skriv NDJSON fra Python.
+    Hver arbeider skriver til en delfil; delfilene føyes til output i
+    klimarekkefølge etter hvert som de blir klare, og hver linje skrives
+    helt til disk før neste. Klimasteder som finnes i cachen simuleres
+    ikke, linjen hentes fra cachen i stedet.
+
+    Med fortsett=True og en eksisterende output hoppes klimasteder som
+    allerede står i filen over, og nye linjer føyes til på slutten. Hele
+    delfiler som en avbrutt kjøring ikke rakk å føye til, brukes om igjen.
+    Hver arbeider laster inntil vindu klima på forhånd.
+
+    Er output komprimert (eller slutter på .gz/.zst), skrives hver linje som
+    et eget gzip-medlem eller en egen zstd-ramme, så filen kan fortsettes på
+    samme måte.
+
+    Slutter output på .bemstore, overføres feltene i felt binært og hver
+    simulering legges til i kolonnelageret i stedet.
+    """
+    # Delfilene skrives av arbeiderne, som kan være en daemon med en annen arbeidsmappe
+    output = output.resolve()
+    lager = er_lager(output)
+    codec = None if lager else utdata_komprimering(output)
+    endelse = ".bin" if lager else ".ndjson"
+    skipped = []
+    if fortsett and output.exists():
+        i_fil = LagerSkriver(output).ferdige() if lager else les_ferdige_klima(output)
+        skipped = [navn for navn, _ in epw_filer if navn in i_fil]
+        epw_filer = [(navn, epw) for navn, epw in epw_filer if navn not in i_fil]
+        print(f"[Runner] Fortsetter {output}: {len(skipped)} klima ferdige, {len(epw_filer)} gjenstår")
+    else:
+        fortsett = False
+
+    if not epw_filer:
+        return {"succeeded": [], "failed": [], "skipped": skipped}
+
+    print("[Runner] Parser SXI-fil...")
+    infos = [pakk_ut(i) for i in pool.pa_alle(spor_oppgave(partial(sikre_prosjekt, sxi_innhold=sxi_innhold)))]
+    feil = next((i for i in infos if isinstance(i, Exception)), None)
+    if feil:
+        raise feil
+    print(f"[Runner] Prosjekt: {infos[0]['name']}")
+    print(f"[Runner] Kategori: {infos[0]['category']}, Soner: {infos[0]['zones']}")
+
+    # Hele delfiler fra en avbrutt kjøring brukes om igjen, halvskrevne slettes
+    deler = output.with_name(output.name + ".deler")
+    if fortsett:
+        gjenbruk = hent_ferdige_deler(deler, {navn for navn, _ in epw_filer})
+    else:
+        gjenbruk = {}
+        shutil.rmtree(deler, ignore_errors=True)
+    deler.mkdir(parents=True, exist_ok=True)
+
+    # Cachede linjer er ferdige før simuleringen starter
+    ferdige = {}
+    nokler: list = [None] * len(epw_filer)
+    if cache:
+        bygg_id = pool.pa_alle(hent_bygg_id)[0]
+        if not bygg_id or isinstance(bygg_id, Exception):
+            print("[Runner] Fant ikke BEMIFY-versjon, cache brukes ikke")
+        else:
+            sxi_hash = innholds_hash(sxi_innhold)
+            # Binære resultater avhenger også av feltene og datatypen
+            art = ["binary", json.dumps(felt), dtype] if lager else ["ndjson"]
+            for i, (_, epw) in enumerate(epw_filer):
+                nokler[i] = cache_nokkel(*art, bygg_id, sxi_hash, epw.innholds_hash)
+                treff = cache.hent(nokler[i], endelse)
+                if treff:
+                    ferdige[i] = treff
+            print(f"[Runner] Cache: {len(ferdige)} treff, {len(epw_filer) - len(ferdige)} skal simuleres")
+
+    gjenbrukt = {i for i, (navn, _) in enumerate(epw_filer) if navn in gjenbruk and i not in ferdige}
+    for i in gjenbrukt:
+        ferdige[i] = gjenbruk[epw_filer[i][0]]
+    if gjenbrukt:
+        print(f"[Runner] Gjenbruker {len(gjenbrukt)} ferdige delfiler fra forrige kjøring")
+
+    bom = [i for i in range(len(epw_filer)) if i not in ferdige]
+    succeeded, failed = [], []
+    neste = 0
+    pbar = tqdm(total=len(bom), desc="Simulerer", unit="klima", ncols=60)
+
+    with LagerSkriver(output, fortsett) if lager else open(output, "ab" if fortsett else "wb") as ut:
+
+        def skriv_klare() -> None:
+            """Føy til alle linjer som nå står for tur."""
+            nonlocal neste
+            while neste in ferdige:
+                r = ferdige.pop(neste)
+                navn = epw_filer[neste][0]
+                del_sti = deler / f"{neste:05d}{endelse}"
+                if isinstance(r, Exception):
+                    failed.append(navn)
+                else:
+                    with spenn("write", navn):
+                        if lager:
+                            ut.legg_til(r if isinstance(r, Path) else del_sti, navn)
+                        else:
+                            with member_writer(ut, codec) as linje:
+                                if isinstance(r, Path):
+                                    _skriv_med_navn(r, linje, navn)
+                                else:
+                                    with open(del_sti, "rb") as src:
+                                        shutil.copyfileobj(src, linje)
+                        if nokler[neste] and (neste in gjenbrukt or not isinstance(r, Path)):
+                            cache.lagre_fil(nokler[neste], endelse, r if neste in gjenbrukt else del_sti)
+                        if not lager:
+                            ut.flush()
+                            os.fsync(ut.fileno())
+                    succeeded.append(navn)
+                del_sti.unlink(missing_ok=True)
+                if neste in gjenbrukt:
+                    r.unlink(missing_ok=True)
+                neste += 1
+
+        def ved_ferdig(j: int, resultat) -> None:
+            i = bom[j]
+            resultat = pakk_ut(resultat)
+            if isinstance(resultat, Exception):
+                pbar.write(f"[Runner] Feil for {epw_filer[i][0]}: {resultat}")
+            ferdige[i] = resultat
+            pbar.update(1)
+            skriv_klare()
+
+        skriv_klare()
+        oppgaver = [
+            spor_oppgave(partial(
+                simuler_til_fil,
+                sxi_innhold=sxi_innhold,
+                navn=epw_filer[i][0],
+                epw=epw_filer[i][1],
+                del_sti=deler / f"{i:05d}{endelse}",
+                timeout_per_sim=timeout_per_sim,
+                binar=lager,
+                felt=felt,
+                dtype=dtype,
+                cache=cache,
+            ), epw_filer[i][0])
+            for i in bom
+        ]
+        forberedelser = [
+            spor_forberedelse(partial(last_klima, epw=epw_filer[i][1], cache=cache), epw_filer[i][0])
+            for i in bom
+        ]
+        pool.kjor(oppgaver, ved_ferdig, forberedelser, vindu)
+
+    pbar.close()
+    shutil.rmtree(deler, ignore_errors=True)
+    return {"succeeded": succeeded, "failed": failed, "skipped": skipped}
 
 
 def main():
@@ -227,9 +591,23 @@ def main():
     parser.add_argument("sxi_fil", type=Path, help="Sti til SIMIEN Pro .sxi-fil")
     parser.add_argument("epw_mappe", type=Path, help="Mappe med .epw-filer")
     parser.add_argument("--bemify-url", default="https://app.bemify.no", help="BEMIFY URL")
-    parser.add_argument("--headed", action="store_true", help="Kjør nettleser synlig (PÅKREVD)")
+    parser.add_argument("--headed", action="store_true", help="Kjør nettleser synlig (påkrevd uten -o)")
     parser.add_argument("--timeout", type=int, default=300, help="Timeout per simulering i sekunder")
     parser.add_argument("--relogin", action="store_true", help="Logg inn på nytt")
+    parser.add_argument("-o", "--output", type=Path,
+                        help="Skriv NDJSON fra Python til denne filen (ingen fil-dialog); .gz/.zst komprimerer, "
+                             ".bemstore gir kolonnelager med binær overføring")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Antall parallelle nettlesere, krever -o (standard: 1)")
+    parser.add_argument("--overwrite", action="store_true",
+                        help="Skriv -o-filen på nytt i stedet for å fortsette der forrige kjøring stoppet")
+    parser.add_argument("--vindu", type=int, default=1,
+                        help="Klima som lastes på forhånd per arbeider, krever -o (standard: 1)")
+    parser.add_argument("--daemon", action="store_true",
+                        help="Bruk nettleserne til en kjørende bemify_daemon.py, krever -o (--workers ignoreres)")
+    legg_til_binar_argumenter(parser)  # Brukes bare med -o results.bemstore
+    legg_til_cache_argumenter(parser)  # Resultatcachen brukes bare med -o, klimalageret alltid
+    legg_til_sporings_argumenter(parser)
     
     args = parser.parse_args()
     
@@ -246,21 +624,35 @@ def main():
         print(f"Feil: Ingen .epw-filer funnet i {args.epw_mappe}")
         sys.exit(1)
     
-    if not args.headed:
-        print("Feil: --headed er påkrevd (nettleseren må vise fil-dialogen)")
+    if not args.output and not args.headed:
+        print("Feil: --headed er påkrevd uten -o (nettleseren må vise fil-dialogen)")
+        sys.exit(1)
+    
+    if not args.output and len(epw_filer) > 50:
+        print(f"Advarsel: Uten -o lastes alle {len(epw_filer)} klimafilene i nettleseren samtidig. "
+              "Bruk -o for å holde minnebruken flat.")
+
+    if not args.output and args.daemon:
+        print("Feil: --daemon krever -o (fil-dialogen må vises i en egen nettleser)")
+        sys.exit(1)
+
+    if not args.output and args.workers > 1:
+        print("Feil: --workers krever -o (fil-dialogen kan bare brukes av én nettleser)")
         sys.exit(1)
     
     print(f"Fant {len(epw_filer)} EPW-filer")
     print(f"Leser SXI-fil: {args.sxi_fil}")
     sxi_innhold = les_filinnhold(args.sxi_fil)
     
+    sporing = sporing_fra_argumenter(args)
+
+    # Bare nye eller endrede EPW-filer leses her (EPW-indeksen i cachen)
+    cache = cache_fra_argumenter(args)
     print("Leser EPW-filer...")
     epw_data = []
-    for epw_sti in epw_filer:
-        navn = epw_sti.stem
-        innhold = les_filinnhold(epw_sti)
-        epw_data.append((navn, innhold))
-        print(f"  Lastet: {navn}")
+    for epw_sti, epw in zip(epw_filer, les_epw_filer(epw_filer, cache)):
+        epw_data.append((epw_sti.stem, epw))
+        print(f"  Lastet: {epw_sti.stem}")
     
     auth_sti = hent_auth_sti()
     
@@ -271,53 +663,54 @@ def main():
     print(f"\nStarter batch-simulering...")
     print(f"BEMIFY URL: {args.bemify_url}")
     print(f"Simuleringer: {len(epw_data)} klimafiler")
+    print(f"Arbeidere: {'daemon' if args.daemon else args.workers}")
     print("-" * 60)
     
     start_tid = time.time()
     
-    with sync_playwright() as p:
-        if not auth_sti.exists():
-            logg_inn_og_lagre(p, args.bemify_url)
-        
-        browser = p.chromium.launch(headless=False)
-        context = browser.new_context(storage_state=str(auth_sti))
-        page = context.new_page()
-        
-        print(f"[Runner] Laster BEMIFY fra {args.bemify_url}...")
-        page.goto(args.bemify_url, wait_until="networkidle", timeout=60000)
-        
-        if "login" in page.url.lower() or "auth" in page.url.lower():
-            print("[Runner] Sesjonen har utløpt...")
-            browser.close()
-            if auth_sti.exists():
-                auth_sti.unlink()
-            logg_inn_og_lagre(p, args.bemify_url)
-            browser = p.chromium.launch(headless=False)
-            context = browser.new_context(storage_state=str(auth_sti))
-            page = context.new_page()
-            page.goto(args.bemify_url, wait_until="networkidle", timeout=60000)
-        
-        print("[Runner] Venter på bemify API...")
-        page.wait_for_function("typeof window.bemify !== 'undefined'", timeout=30000)
-        print("[Runner] BEMIFY lastet")
-        
-        resultat = kjor_batch_simulering(page, sxi_innhold, epw_data, args.timeout * 1000)
-        
-        vellykket = len(resultat.get("succeeded", []))
-        feilet = len(resultat.get("failed", []))
-        
-        if resultat.get("failed"):
-            print(f"\nFeilede simuleringer: {', '.join(resultat['failed'])}")
-        
-        browser.close()
+    if args.daemon:
+        try:
+            pool_kontekst = koble_til(args.bemify_url)
+        except ConnectionError as e:
+            print(f"Feil: {e}")
+            sys.exit(1)
+    else:
+        pool_kontekst = ArbeiderPool(args.workers, args.bemify_url, headless=not args.headed)
+
+    with pool_kontekst as pool:
+        if args.output:
+            resultat = kjor_batch_til_fil(
+                pool, sxi_innhold, epw_data, args.output, args.timeout * 1000,
+                cache, fortsett=not args.overwrite, vindu=args.vindu,
+                felt=args.felt, dtype=args.dtype,
+            )
+        else:
+            resultat = pakk_ut(pool.kjor([spor_oppgave(partial(
+                kjor_batch_simulering,
+                sxi_innhold=sxi_innhold,
+                epw_filer=epw_data,
+                timeout_per_sim=args.timeout * 1000,
+                cache=cache,
+            ))])[0])
+            if isinstance(resultat, Exception):
+                raise resultat
+    
+    vellykket = len(resultat.get("succeeded", [])) + len(resultat.get("skipped", []))
+    feilet = len(resultat.get("failed", []))
+    
+    if resultat.get("failed"):
+        print(f"\nFeilede simuleringer: {', '.join(resultat['failed'])}")
     
     tid_brukt = time.time() - start_tid
     print("-" * 60)
     print(f"Simulering fullført!")
     print(f"  Vellykket: {vellykket}/{len(epw_data)}")
     print(f"  Feilet: {feilet}")
+    if resultat.get("skipped"):
+        print(f"  Fra tidligere kjøring: {len(resultat['skipped'])}")
     print(f"  Tid brukt: {tid_brukt:.1f}s")
-    print(f"  Resultater lagret til valgt fil")
+    print(f"  Resultater lagret til {args.output or 'valgt fil'}")
+    avslutt_sporing(sporing, args)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,536 @@
+#!/usr/bin/env python3
+"""
+BEMIFY Benchmark - Ytelsestest uten app.bemify.no
+
+Starter en lokal testside med et falskt window.bemify (parseSxi, parseEpw,
+simulate og batchSimulateToNdjson) og kjører runnerne og analyzeren mot
+den. Testsiden lager syntetiske resultater etter RESULTS.md (35 040
+tidssteg per sone) og bruker en fast regnetid per simulering, så målingene
+viser hva scriptene selv koster:
+
+  - Oppstart av arbeiderne
+  - Overføring og parsing av EPW i siden
+  - Overhead per simulering (veggtid minus regnetid i siden), både når
+    promiset ventes på direkte og med den gamle pollingen (et flagg i
+    siden som sjekkes med time.sleep imellom) som sammenligning
+  - Gjennomstrømning for kompakt-runneren og NDJSON-runneren (-o)
+  - Gjennomstrømning med binær overføring til kolonnelager (-o .bemstore)
+  - Analyzer-hastighet [MB/s] per motor, og fra kolonnelageret
+
+Resultatet skrives som stabil JSON (sorterte nøkler, avrundede tall), så
+kjøringer kan sammenlignes over tid. Runnernes egne utskrifter går til
+stderr.
+
+Bruk:
+    python bemify_benchmark.py
+    python bemify_benchmark.py --soner 4 --sim-ms 500 --klima 16 --workers 4
+    python bemify_benchmark.py -o benchmark.json
+
+Krav:
+    pip install playwright tqdm pandas numpy
+    playwright install chromium
+"""
+
+import argparse
+import contextlib
+import json
+import math
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+
+try:
+    from playwright.sync_api import Page
+except ImportError:
+    print("Feil: playwright er ikke installert. Kjør:")
+    print("  pip install playwright")
+    print("  playwright install chromium")
+    sys.exit(1)
+
+from bemify_batch_runner import kjor_batch_til_fil
+from bemify_compact_runner import KOMPAKT_JS, kjor_compact_batch, simuler_kompakt
+from bemify_klima import les_epw_filer
+from bemify_metrics import STANDARD_SPESIFIKASJON, normaliser_spesifikasjon
+from bemify_results_analyzer import ENGINES, process_ndjson, process_store
+from bemify_session import ArbeiderPool, forbered_neste, last_klima, sikre_prosjekt, start_simulering
+
+BENCHMARK_VERSJON = 2
+
+# Falskt window.bemify. Parametre leses fra URL-en: ?soner=N&ms=M
+STUB_JS = r"""
+(() => {
+    const param = new URLSearchParams(location.search);
+    const SONER = Math.max(1, parseInt(param.get('soner') || '2', 10));
+    const REGNETID_MS = Math.max(0, parseFloat(param.get('ms') || '0'));
+    const N_STEG = 35040;
+    const POSTER = [
+        '1a Romoppvarming', '1b Ventilasjonsvarme', '2 Varmtvann',
+        '3a Romkjøling', '3b Ventilasjonskjøling', '4a Vifter', '4b Pumper',
+        '5 Belysning', '6 Teknisk utstyr', '7 El-billading', '8 Annet behov',
+        '9 Behov nærliggende bygg',
+    ];
+
+    // Deterministisk tilfeldighet per klimasted
+    function prng(tekst) {
+        let a = 2166136261;
+        for (let i = 0; i < tekst.length; i++) a = Math.imul(a ^ tekst.charCodeAt(i), 16777619);
+        return () => {
+            a = (a + 0x6D2B79F5) | 0;
+            let t = Math.imul(a ^ (a >>> 15), 1 | a);
+            t = (t + Math.imul(t ^ (t >>> 7), 61 | t)) ^ t;
+            return ((t ^ (t >>> 14)) >>> 0) / 4294967296;
+        };
+    }
+
+    function lagSteg(r, tUte, sone) {
+        const varme = Math.max(0, 20 - tUte) * 40 * (1 + sone * 0.1);
+        const kjole = Math.max(0, tUte - 18) * 30;
+        const tInne = 21 + Math.max(0, tUte - 18) * 0.5 + r() * 2;
+        const effektBehov = {};
+        for (const p of POSTER) effektBehov[p] = 0;
+        effektBehov['1a Romoppvarming'] = varme * 0.7;
+        effektBehov['1b Ventilasjonsvarme'] = varme * 0.3;
+        effektBehov['2 Varmtvann'] = 150 + r() * 100;
+        effektBehov['3a Romkjøling'] = kjole * 0.6;
+        effektBehov['3b Ventilasjonskjøling'] = kjole * 0.4;
+        effektBehov['4a Vifter'] = 120;
+        effektBehov['4b Pumper'] = 30 + varme * 0.01;
+        effektBehov['5 Belysning'] = 200 * r();
+        effektBehov['6 Teknisk utstyr'] = 300 + 100 * r();
+        return {
+            effektBehov,
+            termiskKildeYtelse: {
+                '1 Levert elektrisitet': {
+                    '1a Romoppvarming': { input_W: varme * 0.7 / 3, output_W: varme * 0.7, tap_W: varme * 0.01 },
+                    '2 Varmtvann': { input_W: effektBehov['2 Varmtvann'], output_W: effektBehov['2 Varmtvann'], tap_W: 5 },
+                    '3a Romkjøling': { input_W: kjole * 0.6 / 3, output_W: kjole * 0.6, tap_W: 0 },
+                },
+                '3 Levert fjernvarme': {
+                    '1b Ventilasjonsvarme': { input_W: varme * 0.32, output_W: varme * 0.3, tap_W: varme * 0.02 },
+                },
+            },
+            distribusjonsOgAkkumuleringstap: { romoppvarming: varme * 0.01, ventilasjon: varme * 0.005 },
+            inneklima: {
+                luftTemperatur: tInne,
+                overflateTemperatur: tInne - 0.5,
+                masseTemperatur: tInne - 0.3,
+                operativTemperatur: tInne - 0.25,
+                tilluftsTemperatur: 18,
+                tilluftsLuftmengde: 300,
+                CO2_nivå: 450 + r() * 400,
+                relativ_fuktighet: 30 + r() * 30,
+                distribusjonsTap_rom: { varme: varme * 0.01 },
+            },
+            ventilasjon: {
+                theta_sup: 18, theta_sup_setpoint: 18, RH_sup: 40, AH_sup: 5,
+                V_TV: 300, V_AV: 300, fanPower_W: 120, eta: 0.8,
+                batteriResultat: {
+                    varme_lokal_W: 0, varme_sentral_W: varme * 0.3, kjøle_lokal_W: 0,
+                    kjøle_sentral_W: kjole * 0.4, distribusjonstap_varme_W: 0,
+                    distribusjonstap_kjøle_W: 0, tilskudd_W: 0,
+                },
+            },
+        };
+    }
+
+    window.bemify = {
+        version: 'stub-1',
+
+        async parseSxi(sxiContent) {
+            const navn = /<navn>([^<]*)<\/navn>/.exec(sxiContent)?.[1] || 'Testbygg';
+            return {
+                type: 'prosjekt',
+                data: { navn, bygningskategori: 'Kontorbygg' },
+                children: Array.from({ length: SONER }, (_, i) => ({ type: 'sone', id: 'sone_' + i })),
+            };
+        },
+
+        parseEpw(epwContent) {
+            const linjer = epwContent.split('\n');
+            const location = (linjer[0] || '').split(',')[1] || '';
+            const temperatur = new Float64Array(8760);
+            let t = 0;
+            for (let i = 8; i < linjer.length && t < 8760; i++) {
+                const felt = linjer[i].split(',');
+                if (felt.length > 6) temperatur[t++] = parseFloat(felt[6]);
+            }
+            return { climateData: { location, temperatur } };
+        },
+
+        async simulate(projectNode, climateData) {
+            const start = performance.now();
+            while (performance.now() - start < REGNETID_MS) { /* fast regnetid */ }
+
+            const r = prng(climateData.location);
+            const stepResultsPerSone = {};
+            const soner = projectNode.children.filter((c) => c.type === 'sone');
+            soner.forEach((sone, z) => {
+                const steg = new Array(N_STEG);
+                for (let i = 0; i < N_STEG; i++) steg[i] = lagSteg(r, climateData.temperatur[i >> 2], z);
+                stepResultsPerSone[sone.id] = steg;
+            });
+            const solcelleProduction = new Array(N_STEG);
+            for (let i = 0; i < N_STEG; i++) {
+                const sol = Math.max(0, Math.sin(((i % 96) / 96 - 0.25) * 2 * Math.PI));
+                solcelleProduction[i] = { quarterOfYear: i, powerOutput: sol * 2000, cellTemperature: 20 + sol * 25, I_sol: sol * 800 };
+            }
+            const simulationTime = performance.now() - start;
+            window._stubSimMs = simulationTime;
+            return {
+                stepResultsPerSone,
+                varmetapstallPerSone: soner.map((sone) => ({
+                    id: sone.id,
+                    areal: 250,
+                    varmetapstall: {
+                        yttervegger: 0.15, yttertak: 0.08, gulv: 0.05, vinduer: 0.25,
+                        kuldebroer: 0.06, infiltrasjon: 0.04, ventilasjon: 0.12,
+                    },
+                })),
+                solcelleProduction,
+                warnings: [{
+                    type_: 'warning', message: 'Testside: syntetiske resultater',
+                    zoneId: soner[0].id, method: 'Stub.simulate', step: 0, log: '',
+                }],
+                metadata: { simulationTime, totalSteps: N_STEG, stepDuration: 0.25, totalHours: 8760 },
+            };
+        },
+
+        async batchSimulate(projectNode, climates) {
+            const ut = [];
+            for (const c of climates) ut.push({ climateName: c.name, result: await this.simulate(projectNode, c.data) });
+            return ut;
+        },
+
+        // Som originalen, men uten fil-dialog: linjene serialiseres og telles
+        async batchSimulateToNdjson(projectNode, climates, onProgress) {
+            const succeeded = [], failed = [];
+            let bytes = 0;
+            for (let i = 0; i < climates.length; i++) {
+                const c = climates[i];
+                if (onProgress) await onProgress(i, climates.length, c.name);
+                try {
+                    const result = await this.simulate(projectNode, c.data);
+                    bytes += JSON.stringify({ climateName: c.name, result }).length + 1;
+                    succeeded.push(c.name);
+                } catch (err) {
+                    failed.push(c.name);
+                }
+            }
+            if (onProgress) await onProgress(climates.length, climates.length, 'Ferdig');
+            return { succeeded, failed, bytes };
+        },
+    };
+})();
+"""
+
+STUB_HTML = (
+    "<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>BEMIFY testside</title>\n"
+    "<script>" + STUB_JS + "</script>\n</head><body></body></html>\n"
+).encode("utf-8")
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(STUB_HTML)))
+        self.end_headers()
+        self.wfile.write(STUB_HTML)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+@contextlib.contextmanager
+def stub_server():
+    """Server testsiden på en ledig port på 127.0.0.1. Gir basis-URL-en."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}/"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def lag_epw(navn: str, forskyvning: float) -> str:
+    """Lag en syntetisk EPW med 8760 timer og årlig temperaturvariasjon."""
+    linjer = [
+        f"LOCATION,{navn},-,NOR,Syntetisk,000000,60.00,10.00,1.0,100.0",
+        "DESIGN CONDITIONS,0",
+        "TYPICAL/EXTREME PERIODS,0",
+        "GROUND TEMPERATURES,0",
+        "HOLIDAYS/DAYLIGHT SAVINGS,No,0,0,0",
+        "COMMENTS 1,Syntetisk klima for bemify_benchmark.py",
+        "COMMENTS 2,",
+        "DATA PERIODS,1,1,Data,Sunday, 1/ 1,12/31",
+    ]
+    dager = [31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+    time_nr = 0
+    for mnd, antall in enumerate(dager, 1):
+        for dag in range(1, antall + 1):
+            for time_ in range(1, 25):
+                sesong = -10 * math.cos(2 * math.pi * time_nr / 8760)
+                dogn = 3 * math.sin(2 * math.pi * (time_ - 9) / 24)
+                temp = 6 + forskyvning + sesong + dogn
+                linjer.append(
+                    f"2023,{mnd},{dag},{time_},60,?9?9?9?9E0?9?9?9?9?9?9?9?9?9?9?9?9?9?9?9*9*9?9?9?9,"
+                    f"{temp:.1f},{temp - 4:.1f},70,101300,0,0,300,0,0,0,0,0,0,0,180,3.0,5,5,"
+                    "20.0,77777,9,999999999,0,0.1,0,88,0.000,0.0,0.0"
+                )
+                time_nr += 1
+    return "\n".join(linjer) + "\n"
+
+
+def _persentil(verdier: list[float], p: float) -> float:
+    ordnet = sorted(verdier)
+    return ordnet[min(len(ordnet) - 1, int(round(p / 100 * (len(ordnet) - 1))))]
+
+
+def _avrund(obj, desimaler: int = 3):
+    """Avrund alle flyttall, så JSON-en er stabil å sammenligne."""
+    if isinstance(obj, float):
+        return round(obj, desimaler)
+    if isinstance(obj, dict):
+        return {k: _avrund(v, desimaler) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_avrund(v, desimaler) for v in obj]
+    return obj
+
+
+def _mal_epw(page: Page, epw_innhold: str, gjentak: int) -> dict:
+    """Mål overføring av EPW til siden og parsing i siden [ms]."""
+    overforing, parsing = [], []
+    for _ in range(gjentak):
+        start = time.perf_counter()
+        page.evaluate("(s) => s.length", epw_innhold)
+        overforing.append((time.perf_counter() - start) * 1000)
+        parsing.append(page.evaluate("""
+            (s) => {
+                const start = performance.now();
+                window.bemify.parseEpw(s);
+                return performance.now() - start;
+            }
+        """, epw_innhold))
+    return {"transfer_ms": statistics.median(overforing), "parse_ms": statistics.median(parsing)}
+
+
+def _tidsmal(oppgave, page: Page) -> dict:
+    """Kjør en simuleringsoppgave og mål veggtid mot regnetiden i siden."""
+    start = time.perf_counter()
+    oppgave(page)
+    vegg = (time.perf_counter() - start) * 1000
+    return {"wall_ms": vegg, "compute_ms": page.evaluate("() => window._stubSimMs")}
+
+
+def _simuler_polling(page: Page, sxi_innhold: str, navn: str, epw, intervall: float) -> dict:
+    """
+    Som simuler_kompakt, men venter slik runnerne gjorde før: siden setter
+    et flagg når simuleringen er ferdig, og Python sjekker det med
+    time.sleep(intervall) mellom hver gang. Brukes bare som sammenligning.
+    """
+    sikre_prosjekt(page, sxi_innhold)
+    start_simulering(page, epw)
+    forbered_neste(page)
+    page.evaluate("() => { window._simDone = false; window._bemifySim.then(() => { window._simDone = true; }); }")
+    while True:
+        time.sleep(intervall)
+        if page.evaluate("() => window._simDone"):
+            break
+    page.evaluate("() => { delete window._simDone; }")
+    status = page.evaluate(KOMPAKT_JS, {"navn": navn, "spec": normaliser_spesifikasjon(STANDARD_SPESIFIKASJON)})
+    if status.get("error"):
+        raise RuntimeError(status["error"])
+    return status["result"]
+
+
+def _mal_overhead(pool: ArbeiderPool, simuler, epw_filer: list, vindu: int) -> dict:
+    """Kjør simuler(navn=..., epw=...) for hvert klima og oppsummer veggtid mot regnetid."""
+    oppgaver = [partial(_tidsmal, partial(simuler, navn=navn, epw=epw)) for navn, epw in epw_filer]
+    forberedelser = [partial(last_klima, epw=epw) for _, epw in epw_filer]
+    malinger = pool.kjor(oppgaver, None, forberedelser, vindu)
+    feil = next((m for m in malinger if isinstance(m, Exception)), None)
+    if feil:
+        raise feil
+    overhead = [m["wall_ms"] - m["compute_ms"] for m in malinger]
+    return {
+        "wall_ms_median": statistics.median(m["wall_ms"] for m in malinger),
+        "compute_ms_median": statistics.median(m["compute_ms"] for m in malinger),
+        "overhead_ms_median": statistics.median(overhead),
+        "overhead_ms_p95": _persentil(overhead, 95),
+    }
+
+
+def kjor_benchmark(args) -> dict:
+    """Kjør alle målingene og returner resultatet som en ordbok."""
+    sxi_innhold = "<prosjekt><navn>Testbygg</navn></prosjekt>\n"
+    resultat: dict = {}
+
+    with stub_server() as basis, tempfile.TemporaryDirectory() as tmp:
+        navn = [f"Klima {i:03d}" for i in range(args.klima)]
+        stier = [Path(tmp) / f"klima_{i:03d}.epw" for i in range(args.klima)]
+        for i, sti in enumerate(stier):
+            sti.write_text(lag_epw(navn[i], i % 7 - 3), encoding="utf-8")
+        epw_filer = list(zip(navn, les_epw_filer(stier)))
+        epw_innhold = epw_filer[0][1].les()
+        epw_bytes = len(epw_innhold.encode("utf-8"))
+        url = f"{basis}?soner={args.soner}&ms={args.sim_ms}"
+
+        start = time.perf_counter()
+        with ArbeiderPool(args.workers, url, headless=True, innlogging=False) as pool:
+            resultat["startup_s"] = time.perf_counter() - start
+
+            print("[Benchmark] EPW-overføring...", file=sys.stderr)
+            epw = pool.pa_alle(partial(_mal_epw, epw_innhold=epw_innhold, gjentak=args.gjentak))[0]
+            if isinstance(epw, Exception):
+                raise epw
+            resultat["epw"] = {
+                "bytes": epw_bytes,
+                "transfer_ms": epw["transfer_ms"],
+                "transfer_mb_s": epw_bytes / 1e6 / (epw["transfer_ms"] / 1000),
+                "parse_ms": epw["parse_ms"],
+            }
+
+            print("[Benchmark] Overhead per simulering...", file=sys.stderr)
+            resultat["per_sim"] = _mal_overhead(
+                pool, partial(simuler_kompakt, sxi_innhold=sxi_innhold), epw_filer, args.vindu,
+            )
+            print(f"[Benchmark] Overhead per simulering med polling hvert {args.poll_s} s...", file=sys.stderr)
+            resultat["per_sim_polling"] = {
+                "poll_s": args.poll_s,
+                **_mal_overhead(
+                    pool, partial(_simuler_polling, sxi_innhold=sxi_innhold, intervall=args.poll_s),
+                    epw_filer, args.vindu,
+                ),
+            }
+
+            print("[Benchmark] Kompakt-runner...", file=sys.stderr)
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(sys.stderr):
+                kompakt = kjor_compact_batch(pool, sxi_innhold, epw_filer, cache=None, vindu=args.vindu)
+            tid = time.perf_counter() - start
+            resultat["compact"] = {
+                "seconds": tid,
+                "sims_per_s": kompakt["n_simulations"] / tid,
+                "succeeded": kompakt["n_simulations"],
+            }
+
+            print("[Benchmark] NDJSON-runner...", file=sys.stderr)
+            ndjson = Path(tmp) / "benchmark.ndjson"
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(sys.stderr):
+                status = kjor_batch_til_fil(
+                    pool, sxi_innhold, epw_filer, ndjson, cache=None, fortsett=False, vindu=args.vindu,
+                )
+            tid = time.perf_counter() - start
+            storrelse = ndjson.stat().st_size
+            resultat["ndjson"] = {
+                "seconds": tid,
+                "sims_per_s": len(status["succeeded"]) / tid,
+                "mb_per_s": storrelse / 1e6 / tid,
+                "bytes_per_sim": storrelse // max(1, len(status["succeeded"])),
+                "succeeded": len(status["succeeded"]),
+            }
+
+            print("[Benchmark] Binær overføring...", file=sys.stderr)
+            lager = Path(tmp) / "benchmark.bemstore"
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(sys.stderr):
+                status = kjor_batch_til_fil(
+                    pool, sxi_innhold, epw_filer, lager, cache=None, fortsett=False, vindu=args.vindu,
+                )
+            tid = time.perf_counter() - start
+            lager_bytes = sum(f.stat().st_size for f in (lager / "data").iterdir())
+            resultat["binary"] = {
+                "seconds": tid,
+                "sims_per_s": len(status["succeeded"]) / tid,
+                "bytes_per_sim": lager_bytes // max(1, len(status["succeeded"])),
+                "succeeded": len(status["succeeded"]),
+            }
+
+        print("[Benchmark] Analyzer...", file=sys.stderr)
+        resultat["analyzer"] = {}
+        for motor in ENGINES:
+            start = time.perf_counter()
+            df = process_ndjson(ndjson, engine=motor, workers=args.analyzer_workers)
+            tid = time.perf_counter() - start
+            resultat["analyzer"][motor] = {
+                "seconds": tid,
+                "mb_per_s": storrelse / 1e6 / tid,
+                "rows": len(df),
+            }
+        start = time.perf_counter()
+        df = process_store(lager)
+        resultat["analyzer"]["store"] = {"seconds": time.perf_counter() - start, "rows": len(df)}
+
+    return resultat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mål ytelsen til runnerne og analyzeren mot en lokal testside")
+    parser.add_argument("-o", "--output", type=Path, help="Lagre resultatet som JSON (standard: stdout)")
+    parser.add_argument("--soner", type=int, default=2, help="Soner i testbygget (standard: 2)")
+    parser.add_argument("--sim-ms", type=float, default=200, help="Regnetid per simulering i siden [ms] (standard: 200)")
+    parser.add_argument("--klima", type=int, default=8, help="Antall syntetiske klimasteder (standard: 8)")
+    parser.add_argument("--workers", type=int, default=1, help="Antall parallelle nettlesere (standard: 1)")
+    parser.add_argument("--vindu", type=int, default=1, help="Klima som lastes på forhånd per arbeider (standard: 1)")
+    parser.add_argument("--gjentak", type=int, default=5, help="Gjentak for EPW-målingen (standard: 5)")
+    parser.add_argument("--analyzer-workers", type=int, default=1, help="Prosesser for analyzeren (standard: 1)")
+    parser.add_argument("--poll-s", type=float, default=0.5,
+                        help="Intervall for polling-sammenligningen [s] (standard: 0.5, som kompakt-runneren brukte)")
+    args = parser.parse_args()
+
+    if args.klima < 1 or args.soner < 1 or args.gjentak < 1:
+        print("Feil: --klima, --soner og --gjentak må være minst 1")
+        sys.exit(1)
+    if args.poll_s <= 0:
+        print("Feil: --poll-s må være større enn 0")
+        sys.exit(1)
+
+    resultat = kjor_benchmark(args)
+
+    def pakkeversjon(navn: str) -> str:
+        try:
+            return version(navn)
+        except PackageNotFoundError:
+            return "ukjent"
+
+    rapport = _avrund({
+        "benchmark_version": BENCHMARK_VERSJON,
+        "config": {
+            "zones": args.soner,
+            "sim_ms": args.sim_ms,
+            "climates": args.klima,
+            "workers": args.workers,
+            "window": args.vindu,
+            "analyzer_workers": args.analyzer_workers,
+            "poll_s": args.poll_s,
+        },
+        "env": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "numpy": pakkeversjon("numpy"),
+            "pandas": pakkeversjon("pandas"),
+            "playwright": pakkeversjon("playwright"),
+        },
+        "results": resultat,
+    })
+    tekst = json.dumps(rapport, indent=2, sort_keys=True, ensure_ascii=False) + "\n"
+    if args.output:
+        args.output.write_text(tekst, encoding="utf-8")
+        print(f"Resultat lagret: {args.output}", file=sys.stderr)
+    else:
+        sys.stdout.write(tekst)
+
+
+if __name__ == "__main__":
+    main()
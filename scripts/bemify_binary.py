@@ -0,0 +1,284 @@
+"""
+BEMIFY Binary - Binær overføring av tidsserier fra siden
+
+I stedet for å serialisere hele resultatet som JSON pakkes de valgte
+feltene i stepResultsPerSone i Float32Array/Float64Array i siden, én
+sammenhengende blokk per sone med shape (felt, tidssteg). Blokkene sendes
+som binære POST-forespørsler til en adresse på sidens egen origin som
+Playwright fanger opp (page.route), så de aldri går ut på nettet, og
+skrives rett til fil i Python.
+
+Filformat (.bin):
+
+    [sone 0][sone 1]...[solcelleProduction][header (JSON, UTF-8)][lengde][b"BMFB"]
+
+lengde er headerens lengde i byte (uint32, little endian). Headeren har
+dtype, klimanavn og per sone id, offset, antall tidssteg og feltstier
+(samme stier som i kolonnelageret, f.eks. "inneklima/luftTemperatur"),
+pluss metadata, varmetapstallPerSone og antall advarsler. Feltene hentes
+fra første tidssteg i hver sone; verdier som mangler senere blir NaN.
+
+Batch-runneren skriver et kolonnelager direkte med -o results.bemstore,
+og kompakt-runneren med --tidsserier results.bemstore. Analyzeren og
+ResultStore leser lageret.
+
+Bruk:
+    from bemify_binary import load_binary
+    sim = load_binary("0001.bin")
+    sim["zones"][0]["data"]        # memmap med shape (felt, tidssteg)
+"""
+
+import json
+import os
+import shutil
+import struct
+import sys
+import time
+from functools import partial
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:
+    print("Feil: numpy ikke installert. Kjør: pip install numpy")
+    sys.exit(1)
+
+from bemify_result_store import STEG_GRUPPER, STORE_FORMAT, STORE_VERSION
+
+BINARY_FORMAT = "bemify-binary"
+BINARY_VERSION = 1
+MAGIC = b"BMFB"
+_HALE = struct.Struct("<I4s")
+
+# Forespørslene fanges av page.route og når aldri serveren
+EKSPORT_STI = "/__bemify_binary"
+
+# Maks byte per POST, så verken siden eller Playwright holder store kopier
+POST_BIT = 8 * 1024 * 1024
+
+# Pakker window._simResult i typede arrays og sender dem i biter
+PAKK_JS = """
+async ({ navn, felt, dtype, bit, sti, format, versjon }) => {
+    const result = window._simResult;
+    delete window._simResult;
+    const Type = dtype === 'float64' ? Float64Array : Float32Array;
+    const url = location.origin + sti;
+    let offset = 0;
+
+    async function send(data) {
+        for (let i = 0; i < data.byteLength; i += bit) {
+            const del = new Uint8Array(data.buffer, data.byteOffset + i, Math.min(bit, data.byteLength - i));
+            const svar = await fetch(url, { method: 'POST', body: del });
+            if (!svar.ok) throw new Error('Binæroverføring feilet: HTTP ' + svar.status);
+        }
+        offset += data.byteLength;
+    }
+
+    // Numeriske blader (og null) under v, som stier fra prefix
+    function blader(v, prefix, ut) {
+        if (v && typeof v === 'object' && !Array.isArray(v)) {
+            for (const [k, x] of Object.entries(v)) blader(x, prefix.concat(k), ut);
+        } else if (v === null || typeof v === 'number') {
+            ut.push(prefix);
+        }
+        return ut;
+    }
+
+    function velg(steg) {
+        const ut = [];
+        for (const f of felt) {
+            const sti = f.split('/');
+            let v = steg;
+            for (const k of sti) v = v?.[k];
+            if (v !== undefined) blader(v, sti, ut);
+        }
+        return ut;
+    }
+
+    async function blokk(steg, stier) {
+        const n = steg.length;
+        const data = new Type(stier.length * n).fill(NaN);
+        for (let i = 0; i < n; i++) {
+            for (let f = 0; f < stier.length; f++) {
+                let v = steg[i];
+                const sti = stier[f];
+                for (let k = 0; k < sti.length && v != null; k++) v = v[sti[k]];
+                if (typeof v === 'number') data[f * n + i] = v;
+            }
+        }
+        const entry = { offset, steps: n, fields: stier.map((s) => s.join('/')) };
+        await send(data);
+        return entry;
+    }
+
+    const zones = [];
+    for (const [id, steg] of Object.entries(result.stepResultsPerSone || {})) {
+        zones.push({ id, ...await blokk(steg, steg.length ? velg(steg[0]) : []) });
+    }
+    const header = {
+        format, version: versjon, dtype, climateName: navn, zones,
+        n_warnings: (result.warnings || []).length,
+        metadata: result.metadata,
+        varmetapstallPerSone: result.varmetapstallPerSone,
+    };
+    const sol = result.solcelleProduction;
+    if (sol?.length) header.solcelleProduction = await blokk(sol, blader(sol[0], [], []));
+
+    const tekst = new TextEncoder().encode(JSON.stringify(header));
+    const hale = new Uint8Array(tekst.length + 8);
+    hale.set(tekst);
+    new DataView(hale.buffer).setUint32(tekst.length, tekst.length, true);
+    hale.set([0x42, 0x4d, 0x46, 0x42], tekst.length + 4);
+    await send(hale);
+    return offset;
+}
+"""
+
+_mottakere: dict = {}
+
+
+def _motta(page, route) -> None:
+    _mottakere[page].write(route.request.post_data_buffer)
+    route.fulfill(status=204)
+
+
+def eksporter_binar(page, navn: str, sti: Path, felt: list[str] | None = None, dtype: str = "float32") -> int:
+    """
+    Pakk window._simResult binært og skriv det til sti. felt er grupper
+    eller feltstier i StepData (standard: som kolonnelageret). Returnerer
+    antall byte.
+    """
+    # En rute registreres én gang per side; filen byttes for hver eksport
+    if page not in _mottakere:
+        page.route(f"**{EKSPORT_STI}", partial(_motta, page))
+    with open(sti, "wb") as f:
+        _mottakere[page] = f
+        try:
+            return page.evaluate(PAKK_JS, {
+                "navn": navn,
+                "felt": felt or STEG_GRUPPER,
+                "dtype": dtype,
+                "bit": POST_BIT,
+                "sti": EKSPORT_STI,
+                "format": BINARY_FORMAT,
+                "versjon": BINARY_VERSION,
+            })
+        finally:
+            _mottakere[page] = None
+
+
+def read_header(path: Path | str) -> dict:
+    """Les headeren fra slutten av en .bin-fil (ValueError hvis det ikke er en)."""
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size < _HALE.size:
+            raise ValueError(f"Ikke en BEMIFY-binærfil: {path}")
+        f.seek(size - _HALE.size)
+        lengde, magi = _HALE.unpack(f.read(_HALE.size))
+        if magi != MAGIC or lengde > size - _HALE.size:
+            raise ValueError(f"Ikke en BEMIFY-binærfil: {path}")
+        f.seek(size - _HALE.size - lengde)
+        header = json.loads(f.read(lengde))
+    if header.get("format") != BINARY_FORMAT:
+        raise ValueError(f"Ikke en BEMIFY-binærfil: {path}")
+    return header
+
+
+def _block(path: Path | str, dtype: str, entry: dict) -> np.ndarray:
+    shape = (len(entry["fields"]), entry["steps"])
+    if not shape[0] or not shape[1]:
+        return np.empty(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", offset=entry["offset"], shape=shape)
+
+
+def load_binary(path: Path | str) -> dict:
+    """Les headeren og legg (felt, tidssteg)-arrayen til hver blokk under "data" (memmap)."""
+    header = read_header(path)
+    for entry in header["zones"]:
+        entry["data"] = _block(path, header["dtype"], entry)
+    if "solcelleProduction" in header:
+        header["solcelleProduction"]["data"] = _block(path, header["dtype"], header["solcelleProduction"])
+    return header
+
+
+class LagerSkriver:
+    """
+    Føyer binæreksporter til et kolonnelager (.bemstore). Manifestet skrives
+    på nytt etter hver simulering, så et avbrutt lager kan fortsettes og
+    leses med ResultStore underveis.
+    """
+
+    def __init__(self, store_dir: Path, fortsett: bool = True):
+        self.path = Path(store_dir)
+        self.simulations: list[dict] = []
+        manifest = self.path / "manifest.json"
+        if fortsett and manifest.exists():
+            with open(manifest, "r", encoding="utf-8") as f:
+                lagret = json.load(f)
+            if lagret.get("format") != STORE_FORMAT:
+                raise ValueError(f"Ikke et BEMIFY-kolonnelager: {self.path}")
+            self.simulations = lagret["simulations"]
+        else:
+            shutil.rmtree(self.path / "data", ignore_errors=True)
+            manifest.unlink(missing_ok=True)
+        (self.path / "data").mkdir(parents=True, exist_ok=True)
+
+    def __enter__(self) -> "LagerSkriver":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+    def ferdige(self) -> set[str]:
+        return {s["climateName"] for s in self.simulations}
+
+    def legg_til(self, kilde: Path, navn: str, **ekstra) -> dict:
+        """Kopier blokkene i en .bin-fil til .npy-filer og oppdater manifestet."""
+        sim = load_binary(kilde)
+        index = len(self.simulations)
+        entry = {"index": index, "climateName": navn, **ekstra, "zones": []}
+        for z, zone in enumerate(sim["zones"]):
+            entry["zones"].append({"id": zone["id"], **self._lagre(f"{index:04d}_{z:03d}.npy", zone)})
+        for key in ("n_warnings", "metadata", "varmetapstallPerSone"):
+            if sim.get(key) is not None:
+                entry[key] = sim[key]
+        if "solcelleProduction" in sim:
+            entry["solcelleProduction"] = self._lagre(f"{index:04d}_solcelle.npy", sim["solcelleProduction"])
+        self.simulations.append(entry)
+        self._skriv_manifest(sim["dtype"])
+        return entry
+
+    def _lagre(self, name: str, blokk: dict) -> dict:
+        np.save(self.path / "data" / name, blokk["data"])
+        return {"file": f"data/{name}", "steps": blokk["steps"], "fields": blokk["fields"]}
+
+    def _skriv_manifest(self, dtype: str) -> None:
+        manifest = {
+            "format": STORE_FORMAT,
+            "version": STORE_VERSION,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "source": None,  # Skrevet direkte fra siden, ingen kildefil
+            "dtype": dtype,
+            "layout": "(felt, tidssteg), C-ordnet .npy",
+            "simulations": self.simulations,
+        }
+        tmp = self.path / "manifest.json.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, self.path / "manifest.json")
+
+
+def er_lager(sti: Path) -> bool:
+    """Skal output skrives som kolonnelager (binær overføring)?"""
+    return Path(sti).suffix == ".bemstore"
+
+
+def legg_til_binar_argumenter(parser) -> None:
+    """Felles kommandolinjevalg for binær overføring."""
+    parser.add_argument("--felt", action="append", metavar="STI",
+                        help="Grupper eller feltstier i StepData som overføres binært, f.eks. inneklima "
+                             "eller effektBehov/2 Varmtvann (kan gjentas; standard: "
+                             + ", ".join(STEG_GRUPPER) + ")")
+    parser.add_argument("--dtype", choices=["float32", "float64"], default="float32",
+                        help="Datatype for binær overføring (standard: float32)")
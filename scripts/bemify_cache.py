@@ -0,0 +1,124 @@
+"""
+BEMIFY Cache - Innholdsadressert lager for simuleringsresultater
+
+Et resultat identifiseres av hash av normalisert SXI, hash av EPW, BEMIFY-
+byggets identifikator og hva slags resultat det er (full NDJSON-linje
+eller kompakt oppsummering). Samme bygg mot samme klima med samme
+BEMIFY-versjon simuleres dermed bare én gang.
+
+Lageret har en størrelsesgrense. Et treff oppdaterer filens mtime, og de
+minst nylig brukte filene slettes først når grensen overskrides.
+
+Bruk:
+    cache = ResultatCache(standard_cache_mappe(), maks_bytes=20 * 1024**3)
+    nokkel = cache_nokkel("kompakt", innholds_hash(sxi), innholds_hash(epw), bygg_id)
+    treff = cache.hent(nokkel, ".json")
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+# Øk når formatet på lagrede resultater endres
+CACHE_VERSJON = "1"
+
+
+def standard_cache_mappe() -> Path:
+    """Standard plassering for cachen."""
+    return Path.home() / ".cache" / "bemify"
+
+
+def innholds_hash(tekst: str) -> str:
+    """Hash av filinnhold med normaliserte linjeskift og uten avsluttende mellomrom."""
+    normalisert = "\n".join(line.rstrip() for line in tekst.splitlines())
+    return hashlib.sha256(normalisert.encode("utf-8")).hexdigest()
+
+
+def cache_nokkel(*deler: str) -> str:
+    """Kombiner delene til én nøkkel."""
+    h = hashlib.sha256(CACHE_VERSJON.encode("utf-8"))
+    for del_ in deler:
+        h.update(b"\0" + del_.encode("utf-8"))
+    return h.hexdigest()
+
+
+class ResultatCache:
+    """Filbasert cache med LRU-utkastelse etter total størrelse."""
+
+    def __init__(self, mappe: Path, maks_bytes: int):
+        self.mappe = mappe.resolve()  # Brukes også av daemonen, som har en annen arbeidsmappe
+        self.maks_bytes = maks_bytes
+        self.mappe.mkdir(parents=True, exist_ok=True)
+
+    def _sti(self, nokkel: str, suffix: str) -> Path:
+        return self.mappe / nokkel[:2] / f"{nokkel}{suffix}"
+
+    def hent(self, nokkel: str, suffix: str) -> Path | None:
+        """Returner stien til et lagret resultat, eller None ved bom."""
+        sti = self._sti(nokkel, suffix)
+        try:
+            os.utime(sti)  # Merk som nylig brukt
+        except FileNotFoundError:
+            return None
+        return sti
+
+    def hent_json(self, nokkel: str):
+        sti = self.hent(nokkel, ".json")
+        if sti is None:
+            return None
+        with open(sti, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def lagre_fil(self, nokkel: str, suffix: str, kilde: Path) -> None:
+        """Kopier en fil inn i cachen (atomisk via midlertidig fil)."""
+        sti = self._sti(nokkel, suffix)
+        sti.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=sti.parent, suffix=".tmp")
+        os.close(fd)
+        shutil.copyfile(kilde, tmp)
+        os.replace(tmp, sti)
+        self.rydd()
+
+    def lagre_json(self, nokkel: str, data) -> None:
+        sti = self._sti(nokkel, ".json")
+        sti.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=sti.parent, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, sti)
+        self.rydd()
+
+    def rydd(self) -> None:
+        """Slett minst nylig brukte filer til cachen er under størrelsesgrensen."""
+        filer = []
+        total = 0
+        for sti in self.mappe.glob("*/*"):
+            if sti.suffix == ".tmp":
+                continue
+            st = sti.stat()
+            filer.append((st.st_mtime, st.st_size, sti))
+            total += st.st_size
+        filer.sort()
+        for _, size, sti in filer:
+            if total <= self.maks_bytes:
+                break
+            sti.unlink(missing_ok=True)
+            total -= size
+
+
+def legg_til_cache_argumenter(parser) -> None:
+    """Felles kommandolinjevalg for cachen."""
+    parser.add_argument("--no-cache", action="store_true", help="Ikke bruk resultatcache")
+    parser.add_argument("--cache-dir", type=Path, default=standard_cache_mappe(),
+                        help="Mappe for resultatcache (standard: ~/.cache/bemify)")
+    parser.add_argument("--cache-max-gb", type=float, default=20.0,
+                        help="Maks størrelse på cachen i GB (standard: 20)")
+
+
+def cache_fra_argumenter(args) -> ResultatCache | None:
+    if args.no_cache:
+        return None
+    return ResultatCache(args.cache_dir, int(args.cache_max_gb * 1024**3))
@@ -3,15 +3,29 @@
 BEMIFY Compact Batch Runner
 
 Kjører BEMIFY-simuleringer for flere EPW-klimafiler og returnerer kun
-3 nøkkeltall per klimasted (designet for NMBUs klimasammenligning):
+nøkkeltall per klimasted. Uten --metrics beregnes 3 nøkkeltall (designet
+for NMBUs klimasammenligning):
 
   - Timer med lufttemperatur over 26 °C
   - Årlig varmeenergi (netto, 1a + 1b) [kWh]
   - Årlig kjøleenergi (netto, 3a + 3b) [kWh]
 
+Med --metrics beregnes nøkkeltallene i en JSON/YAML-spesifikasjon i
+stedet (se bemify_metrics.py). Med --sweep kjøres alle varianter i en
+parameterstudie for alle klimafilene (se bemify_sweep.py). Med
+--tidsserier lagres i tillegg hele tidsseriene for de valgte feltene i et
+kolonnelager, overført binært fra siden (se bemify_binary.py).
+
 Bruk:
     python bemify_compact_runner.py bygning.sxi ./klimafiler/ --headed
     python bemify_compact_runner.py bygning.sxi ./klimafiler/ --headed -o resultater.csv
+    python bemify_compact_runner.py bygning.sxi ./klimafiler/ --workers 8
+    python bemify_compact_runner.py bygning.sxi ./klimafiler/ --no-cache
+    python bemify_compact_runner.py bygning.sxi ./klimafiler/ --daemon
+    python bemify_compact_runner.py bygning.sxi ./klimafiler/ --metrics metrikker.yaml -o resultater.csv
+    python bemify_compact_runner.py bygning.sxi ./klimafiler/ --profile --trace run.jsonl
+    python bemify_compact_runner.py bygning.sxi ./klimafiler/ --sweep sweep.yaml -o resultater.csv
+    python bemify_compact_runner.py bygning.sxi ./klimafiler/ --tidsserier results.bemstore --felt inneklima
 
 Krav:
     pip install playwright tqdm
@@ -20,13 +34,16 @@ Krav:
 
 import argparse
 import csv
+import hashlib
 import json
+import shutil
 import sys
 import time
+from functools import partial
 from pathlib import Path
 
 try:
-    from playwright.sync_api import sync_playwright, Page
+    from playwright.sync_api import Page
 except ImportError:
     print("Feil: playwright er ikke installert. Kjør:")
     print("  pip install playwright")
@@ -40,15 +57,71 @@ except ImportError:
     print("  pip install tqdm")
     sys.exit(1)
 
+from bemify_binary import LagerSkriver, eksporter_binar, legg_til_binar_argumenter
+from bemify_result_store import STEG_GRUPPER
+from bemify_cache import (
+    ResultatCache,
+    cache_fra_argumenter,
+    cache_nokkel,
+    innholds_hash,
+    legg_til_cache_argumenter,
+)
+from bemify_daemon import koble_til
+from bemify_klima import EpwFil, les_epw_filer
+from bemify_metrics import (
+    REDUSER_JS,
+    STANDARD_SPESIFIKASJON,
+    er_skalar,
+    flat_rad,
+    les_spesifikasjon,
+    normaliser_spesifikasjon,
+)
+from bemify_session import (
+    ArbeiderPool,
+    forbered_neste,
+    hent_auth_sti,
+    hent_bygg_id,
+    last_klima,
+    sikre_prosjekt,
+    start_simulering,
+)
+from bemify_sweep import anvend_parametre, gjenopprett_parametre, lag_design, les_sweep, overstyringer
+from bemify_trace import (
+    avslutt_sporing,
+    legg_til_sporings_argumenter,
+    pakk_ut,
+    registrer_simulering,
+    spenn,
+    spor_forberedelse,
+    spor_oppgave,
+    sporing_fra_argumenter,
+)
+
+# Simulerer ett klima og reduserer resultatet til nøkkeltallene i siden
+KOMPAKT_JS = """
+async ({ navn, spec }) => {
+    const reduser = """ + REDUSER_JS.strip() + """;
+    const status = await window._bemifySim;
+    delete window._bemifySim;
+    if (status.error) return status;
+    return {
+        result: { climateName: navn, ...reduser(status.result, spec) },
+        ms: status.ms,
+        simulationTime: status.result.metadata?.simulationTime,
+    };
+}
+"""
+
+# Beholder resultatet i siden for binær eksport etter reduksjonen
+BEHOLD_JS = """
+async () => {
+    const status = await window._bemifySim;
+    if (!status.error) window._simResult = status.result;
+}
+"""
 
-def hent_epw_location(innhold: str) -> str | None:
-    """Hent LOCATION-felt fra EPW-header (første kommaseparerte felt etter 'LOCATION,')."""
-    for line in innhold.splitlines():
-        if line.startswith("LOCATION,"):
-            parts = line.split(",")
-            if len(parts) >= 2 and parts[1].strip():
-                return parts[1].strip()
-    return None
+# Cachede oppsummeringer er bare gyldige for samme reduksjon
+KOMPAKT_ID = hashlib.sha256(KOMPAKT_JS.encode("utf-8")).hexdigest()
 
 
 def finn_epw_filer(mappe: Path) -> list[Path]:
@@ -65,203 +138,269 @@ def les_filinnhold(filsti: Path) -> str:
         return f.read()
 
 
-def escape_js_string(s: str) -> str:
-    """Escape streng for JavaScript template literal."""
-    return s.replace("\\", "\\\\").replace("`", "\\`").replace("${", "\\${")
+def simuler_kompakt(
+    page: Page,
+    sxi_innhold: str,
+    navn: str,
+    epw: EpwFil,
+    timeout_per_sim: int = 300_000,
+    spec: dict | None = None,
+    overstyr: list[dict] | None = None,
+    del_sti: Path | None = None,
+    felt: list[str] | None = None,
+    dtype: str = "float32",
+    cache: ResultatCache | None = None,
+) -> dict:
+    """
+    Simuler ett klimasted på en arbeiders side og returner kun nøkkeltallene.
+    Klimaet slippes i siden når simuleringen starter, og mens den regner
+    lastes arbeiderens neste klima. spec er en normalisert
+    metrikkspesifikasjon (standard: de 3 faste nøkkeltallene). overstyr
+    er parameterverdiene til en sweep-variant (se bemify_sweep.py); de
+    settes i prosjektet før simuleringen og tilbake etterpå. Med del_sti
+    skrives også tidsseriene i felt binært dit (se bemify_binary.py).
+    Med cache hentes klimadataene fra klimalageret (se bemify_klima.py).
+    """
+    spec = spec or normaliser_spesifikasjon(STANDARD_SPESIFIKASJON)
+    page.set_default_timeout(timeout_per_sim + 60_000)
+    sikre_prosjekt(page, sxi_innhold)
+    try:
+        if overstyr:
+            anvend_parametre(page, overstyr)
+        start_simulering(page, epw, cache)
+        start = time.time()
+        forbered_neste(page)  # Neste klima lastes mens denne simuleringen regner
+        venter_fra = time.time()
+
+        # evaluate venter på promiset, så resultatet kommer tilbake i samme
+        # kall som simuleringen blir ferdig - uten polling. Navn og
+        # spesifikasjon sendes som data (evaluate-argument), ikke som
+        # JavaScript-kode.
+        if del_sti:
+            page.evaluate(BEHOLD_JS)
+        status = page.evaluate(KOMPAKT_JS, {"navn": navn, "spec": spec})
+        if del_sti and not status.get("error"):
+            eksporter_binar(page, navn, del_sti, felt, dtype)
+    finally:
+        if overstyr:
+            gjenopprett_parametre(page)
+
+    if status.get("error"):
+        raise RuntimeError(status["error"])
+    registrer_simulering(start, venter_fra, time.time(), status)
+    return status["result"]
 
 
 def kjor_compact_batch(
-    page: Page,
+    pool: ArbeiderPool,
     sxi_innhold: str,
-    epw_filer: list[tuple[str, str]],
+    epw_filer: list[tuple[str, EpwFil]],
     timeout_per_sim: int = 300_000,
+    cache: ResultatCache | None = None,
+    spec: dict | None = None,
+    vindu: int = 1,
+    sweep: dict | None = None,
+    tidsserier: Path | None = None,
+    felt: list[str] | None = None,
+    dtype: str = "float32",
 ) -> dict:
     """
-    Kjør kompakt batch-simulering via bemify.batchSimulateCompact.
-    Returnerer kun 3 nøkkeltall per klimasted.
+    Kjør kompakt batch-simulering fordelt på arbeiderne i poolen.
+    Returnerer kun nøkkeltallene i spec per klimasted, i samme rekkefølge
+    som epw_filer. Klimasteder som finnes i cachen simuleres ikke på nytt.
+    Hver arbeider laster inntil vindu klima på forhånd.
+
+    Med sweep (normalisert, se bemify_sweep.py) kjøres hver variant i
+    designet for alle klimasteder, variant for variant, og hvert resultat
+    får variantnummer og parameterverdier.
+
+    Med tidsserier skrives hele tidsseriene for feltene i felt til det
+    kolonnelageret etter hvert som simuleringene blir ferdige. Et
+    cachetreff krever da at også tidsseriene ligger i cachen.
     """
-    total_timeout = timeout_per_sim * len(epw_filer) + 60_000
-    page.set_default_timeout(total_timeout)
-
-    # Parse SXI
+    spec = spec or normaliser_spesifikasjon(STANDARD_SPESIFIKASJON)
+    if tidsserier:
+        # Delfilene skrives av arbeiderne, som kan være en daemon med en annen arbeidsmappe
+        tidsserier = tidsserier.resolve()
+    # Parse SXI på alle arbeidere
     print("[Runner] Parser SXI-fil...")
-    sxi_escaped = escape_js_string(sxi_innhold)
-
-    project_info = page.evaluate(f"""
-        async () => {{
-            const sxiContent = `{sxi_escaped}`;
-            const projectNode = await window.bemify.parseSxi(sxiContent);
-            window._bemifyProject = projectNode;
-            return {{
-                name: projectNode.data.navn,
-                category: projectNode.data.bygningskategori,
-                zones: projectNode.children?.filter(c => c.type === 'sone')?.length || 0
-            }};
-        }}
-    """)
+    infos = [pakk_ut(i) for i in pool.pa_alle(spor_oppgave(partial(sikre_prosjekt, sxi_innhold=sxi_innhold)))]
+    feil = next((i for i in infos if isinstance(i, Exception)), None)
+    if feil:
+        raise feil
+    project_info = infos[0]
 
     print(f"[Runner] Prosjekt: {project_info['name']}")
     print(f"[Runner] Kategori: {project_info['category']}, Soner: {project_info['zones']}")
 
-    # Last alle klimafiler
-    print(f"[Runner] Laster {len(epw_filer)} klimafiler...")
-    for navn, epw_innhold in epw_filer:
-        epw_escaped = escape_js_string(epw_innhold)
-        navn_escaped = navn.replace("\\", "\\\\").replace('"', '\\"')
-        page.evaluate(f"""
-            () => {{
-                if (!window._climates) window._climates = [];
-                const epwContent = `{epw_escaped}`;
-                const {{ climateData }} = window.bemify.parseEpw(epwContent);
-                window._climates.push({{ name: "{navn_escaped}", data: climateData }});
-            }}
-        """)
-
-    print("[Runner] Alle klimafiler lastet")
-
-    # Run simulations one at a time, extracting compact summary in JS
-    total = len(epw_filer)
-    compact_results = []
-
-    pbar = tqdm(total=total, unit="klima", bar_format="{l_bar}{bar}| {n_fmt}/{total_fmt} {postfix}")
-
-    for i in range(total):
-        # Start simulation i and poll until done
-        page.evaluate(f"""
-            () => {{
-                window._simDone = false;
-                window._simResult = null;
-                window._simError = null;
-
-                const climate = window._climates[{i}];
-                window.bemify.simulate(window._bemifyProject, climate.data)
-                    .then(result => {{
-                        // Extract compact summary in-browser
-                        let stepsOver26 = 0;
-                        let varme = 0;
-                        let kjole = 0;
-                        for (const steps of Object.values(result.stepResultsPerSone)) {{
-                            for (const s of steps) {{
-                                if (s.inneklima.luftTemperatur > 26) stepsOver26++;
-                                varme += (s.effektBehov['1a Romoppvarming'] || 0)
-                                       + (s.effektBehov['1b Ventilasjonsvarme'] || 0);
-                                kjole += (s.effektBehov['3a Romkjøling'] || 0)
-                                       + (s.effektBehov['3b Ventilasjonskjøling'] || 0);
-                            }}
-                        }}
-                        window._simResult = {{
-                            climateName: climate.name,
-                            timerOver26: stepsOver26 * 0.25,
-                            varmeenergi_kWh: varme * 0.25 / 1000,
-                            kjoleenergi_kWh: kjole * 0.25 / 1000,
-                        }};
-                        window._simDone = true;
-                    }})
-                    .catch(err => {{
-                        window._simError = err.message || String(err);
-                        window._simDone = true;
-                    }});
-            }}
-        """)
-
-        # Poll until this simulation finishes
-        while True:
-            time.sleep(0.5)
-            status = page.evaluate("""
-                () => ({
-                    done: window._simDone,
-                    result: window._simResult,
-                    error: window._simError
-                })
-            """)
-            if status.get("done"):
-                break
-
-        if status.get("error"):
-            print(f"\n[Runner] Feil for klima {i+1}: {status['error']}")
-        elif status.get("result"):
-            compact_results.append(status["result"])
-            r = status["result"]
-            pbar.set_postfix_str(r['climateName'])
-
+    # Én jobb per (variant, klimasted); uten sweep én variant uten parametre
+    varianter = lag_design(sweep) if sweep else [None]
+    jobber = [(v, i) for v in range(len(varianter)) for i in range(len(epw_filer))]
+    overstyr = [overstyringer(sweep, variant) if variant else None for variant in varianter]
+    if sweep:
+        print(f"[Runner] Sweep: {len(varianter)} varianter x {len(epw_filer)} klima = {len(jobber)} simuleringer")
+
+    def merk(resultat: dict, v: int) -> dict:
+        if varianter[v] is None:
+            return resultat
+        return {**resultat, "variant": v, "parameters": varianter[v]}
+
+    resultater: list = [None] * len(jobber)
+    nokler: list = [None] * len(jobber)
+    binar_nokler: list = [None] * len(jobber)
+    lagret_binar: dict = {}
+    if cache:
+        bygg_id = pool.pa_alle(hent_bygg_id)[0]
+        if not bygg_id or isinstance(bygg_id, Exception):
+            print("[Runner] Fant ikke BEMIFY-versjon, cache brukes ikke")
+        else:
+            sxi_hash = innholds_hash(sxi_innhold)
+            spec_id = json.dumps(spec, sort_keys=True)
+            for j, (v, i) in enumerate(jobber):
+                deler = ["kompakt", KOMPAKT_ID, spec_id, bygg_id, sxi_hash, epw_filer[i][1].innholds_hash]
+                if overstyr[v]:
+                    deler.append(json.dumps(overstyr[v], sort_keys=True))
+                nokler[j] = cache_nokkel(*deler)
+                lagret = cache.hent_json(nokler[j])
+                if tidsserier:
+                    # Samme nøkkel som batch-runneren bruker for binære resultater
+                    binar_nokler[j] = cache_nokkel("binary", json.dumps(felt), dtype, *deler[3:])
+                    lagret_binar[j] = cache.hent(binar_nokler[j], ".bin")
+                    if lagret_binar[j] is None:
+                        lagret = None
+                if lagret is not None:
+                    resultater[j] = merk({**lagret, "climateName": epw_filer[i][0]}, v)
+            treff = sum(r is not None for r in resultater)
+            print(f"[Runner] Cache: {treff} treff, {len(jobber) - treff} skal simuleres")
+
+    bom = [j for j, r in enumerate(resultater) if r is None]
+
+    lager = del_mappe = None
+    if tidsserier:
+        lager = LagerSkriver(tidsserier, fortsett=False)
+        del_mappe = tidsserier.with_name(tidsserier.name + ".deler")
+        shutil.rmtree(del_mappe, ignore_errors=True)
+        del_mappe.mkdir(parents=True, exist_ok=True)
+
+    def lagre_tidsserier(j: int, kilde: Path) -> None:
+        v, i = jobber[j]
+        with spenn("write", epw_filer[i][0]):
+            lager.legg_til(kilde, epw_filer[i][0], **({"variant": v, "parameters": varianter[v]} if sweep else {}))
+
+    if lager:
+        for j, r in enumerate(resultater):
+            if r is not None:
+                lagre_tidsserier(j, lagret_binar[j])
+
+    pbar = tqdm(total=len(bom), unit="klima", bar_format="{l_bar}{bar}| {n_fmt}/{total_fmt} {postfix}")
+
+    def ved_ferdig(k: int, resultat) -> None:
+        j = bom[k]
+        v, i = jobber[j]
+        resultat = pakk_ut(resultat)
+        if isinstance(resultat, Exception):
+            variant = f", variant {v}" if sweep else ""
+            pbar.write(f"[Runner] Feil for klima {i+1} ({epw_filer[i][0]}{variant}): {resultat}")
+        else:
+            pbar.set_postfix_str(resultat["climateName"])
+            if nokler[j]:
+                cache.lagre_json(nokler[j], resultat)
+            if lager:
+                del_sti = del_mappe / f"{j:05d}.bin"
+                lagre_tidsserier(j, del_sti)
+                if binar_nokler[j]:
+                    cache.lagre_fil(binar_nokler[j], ".bin", del_sti)
+                del_sti.unlink()
         pbar.update(1)
 
+    oppgaver = [
+        spor_oppgave(partial(
+            simuler_kompakt,
+            sxi_innhold=sxi_innhold,
+            navn=epw_filer[jobber[j][1]][0],
+            epw=epw_filer[jobber[j][1]][1],
+            timeout_per_sim=timeout_per_sim,
+            spec=spec,
+            overstyr=overstyr[jobber[j][0]],
+            del_sti=del_mappe / f"{j:05d}.bin" if del_mappe else None,
+            felt=felt,
+            dtype=dtype,
+            cache=cache,
+        ), epw_filer[jobber[j][1]][0])
+        for j in bom
+    ]
+    forberedelser = [
+        spor_forberedelse(
+            partial(last_klima, epw=epw_filer[jobber[j][1]][1], cache=cache), epw_filer[jobber[j][1]][0]
+        )
+        for j in bom
+    ]
+    for j, resultat in zip(bom, pool.kjor(oppgaver, ved_ferdig, forberedelser, vindu)):
+        resultat = pakk_ut(resultat)
+        resultater[j] = resultat if isinstance(resultat, Exception) else merk(resultat, jobber[j][0])
     pbar.close()
+    if del_mappe:
+        shutil.rmtree(del_mappe, ignore_errors=True)
 
-    # Clean up
-    page.evaluate("""
-        () => {
-            delete window._climates;
-            delete window._bemifyProject;
-            delete window._simDone;
-            delete window._simResult;
-            delete window._simError;
-        }
-    """)
+    compact_results = [r for r in resultater if not isinstance(r, Exception)]
 
-    return {
+    result = {
         "model": project_info["name"],
         "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
         "n_simulations": len(compact_results),
+        "metrics": spec["metrics"],
         "results": compact_results,
     }
-
-
-def hent_auth_sti() -> Path:
-    return Path.home() / ".bemify_auth_state.json"
-
-
-def logg_inn_og_lagre(playwright, bemify_url: str) -> Path:
-    auth_sti = hent_auth_sti()
-
-    print("\n" + "=" * 60)
-    print("INNLOGGING KREVES")
-    print("=" * 60)
-    print("En nettleser åpnes nå. Vennligst logg inn på BEMIFY.")
-    print("Når du er logget inn, trykk ENTER her for å fortsette...")
-    print("=" * 60 + "\n")
-
-    browser = playwright.chromium.launch(headless=False)
-    context = browser.new_context()
-    page = context.new_page()
-    page.goto(bemify_url, wait_until="networkidle", timeout=60000)
-
-    input("Trykk ENTER når du er logget inn...")
-
-    context.storage_state(path=str(auth_sti))
-    print("[Runner] Autentisering lagret")
-    browser.close()
-    return auth_sti
+    if sweep:
+        result["sweep"] = {
+            "design": sweep["design"],
+            "parameters": [p["name"] for p in sweep["parameters"]],
+            "variants": varianter,
+        }
+    return result
 
 
 def skriv_resultater(result: dict, output_path: Path | None):
     """Skriv resultater til konsoll og evt. CSV."""
     results = result.get("results", [])
     model = result.get("model", "Ukjent")
+    spec = {"metrics": result.get("metrics") or normaliser_spesifikasjon(STANDARD_SPESIFIKASJON)["metrics"]}
+
+    # Konsollen viser nøkkeltall med én verdi per klimasted; sonevise og
+    # månedlige verdier står i CSV og JSON
+    kolonner = [(m["name"], m["label"], max(12, len(m["label"]) + 2)) for m in spec["metrics"] if er_skalar(m)]
+    andre = [m["name"] for m in spec["metrics"] if not er_skalar(m)]
 
     print(f"\n{'=' * 78}")
     print(f"  Resultater for: {model}")
     print(f"  {result.get('n_simulations', 0)} simuleringer")
     print(f"{'=' * 78}")
-    print(f"  {'Klimasted':<30} {'Timer >26°C':>12} {'Varme [kWh]':>14} {'Kjøle [kWh]':>14}")
-    print(f"  {'-' * 72}")
+    if result.get("sweep"):
+        print(f"  Varianter ({result['sweep']['design']}):")
+        for v, variant in enumerate(result["sweep"]["variants"]):
+            verdier = ", ".join(f"{k}={x:g}" if isinstance(x, float) else f"{k}={x}" for k, x in variant.items())
+            print(f"    #{v}: {verdier}")
+        print()
+    print(f"  {'Klimasted':<30}" + "".join(f" {label:>{bredde}}" for _, label, bredde in kolonner))
+    print(f"  {'-' * (30 + sum(b + 1 for *_, b in kolonner))}")
 
     for r in results:
-        print(
-            f"  {r['climateName']:<30} "
-            f"{r['timerOver26']:>12.1f} "
-            f"{r['varmeenergi_kWh']:>14.1f} "
-            f"{r['kjoleenergi_kWh']:>14.1f}"
+        verdier = "".join(
+            f" {r[navn]:>{bredde}.1f}" if r.get(navn) is not None else f" {'-':>{bredde}}"
+            for navn, _, bredde in kolonner
         )
+        sted = r["climateName"] if "variant" not in r else f"{r['climateName'][:24]} #{r['variant']}"
+        print(f"  {sted:<30}{verdier}")
+    if andre:
+        print(f"\n  Sonevise/månedlige nøkkeltall i CSV/JSON: {', '.join(andre)}")
 
     if output_path:
+        rader = [flat_rad(r, spec) for r in results]
+        felt = list(dict.fromkeys(k for rad in rader for k in rad)) or ["climateName"]
         with open(output_path, "w", newline="", encoding="utf-8") as f:
-            writer = csv.DictWriter(
-                f,
-                fieldnames=["climateName", "timerOver26", "varmeenergi_kWh", "kjoleenergi_kWh"],
-            )
+            writer = csv.DictWriter(f, fieldnames=felt)
             writer.writeheader()
-            writer.writerows(results)
+            writer.writerows(rader)
         print(f"\nLagret til: {output_path}")
 
     # Lagre JSON også
@@ -282,9 +421,44 @@ def main():
     parser.add_argument("--headed", action="store_true", help="Kjør nettleser synlig")
     parser.add_argument("--timeout", type=int, default=300, help="Timeout per sim (sekunder)")
     parser.add_argument("--relogin", action="store_true", help="Logg inn på nytt")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Antall parallelle nettlesere (standard: 1)")
+    parser.add_argument("--metrics", type=Path,
+                        help="JSON/YAML-spesifikasjon av nøkkeltall (standard: timer >26°C, varme, kjøling)")
+    parser.add_argument("--vindu", type=int, default=1,
+                        help="Klima som lastes på forhånd per arbeider mens forrige simulerer (standard: 1)")
+    parser.add_argument("--daemon", action="store_true",
+                        help="Bruk nettleserne til en kjørende bemify_daemon.py (--workers ignoreres)")
+    parser.add_argument("--sweep", type=Path,
+                        help="JSON/YAML-spesifikasjon av parametre som varieres (se bemify_sweep.py)")
+    parser.add_argument("--tidsserier", type=Path, metavar="LAGER",
+                        help="Lagre også hele tidsseriene binært i dette kolonnelageret (.bemstore)")
+    legg_til_binar_argumenter(parser)
+    legg_til_cache_argumenter(parser)
+    legg_til_sporings_argumenter(parser)
 
     args = parser.parse_args()
 
+    try:
+        spec = normaliser_spesifikasjon(STANDARD_SPESIFIKASJON)
+        if args.metrics:
+            spec = les_spesifikasjon(args.metrics)
+    except (OSError, ValueError) as e:
+        print(f"Feil: Ugyldig metrikkspesifikasjon {args.metrics}: {e}")
+        sys.exit(1)
+
+    sweep = None
+    if args.sweep:
+        try:
+            sweep = les_sweep(args.sweep)
+        except (OSError, ValueError) as e:
+            print(f"Feil: Ugyldig sweep-spesifikasjon {args.sweep}: {e}")
+            sys.exit(1)
+        kollisjon = {p["name"] for p in sweep["parameters"]} & {m["name"] for m in spec["metrics"]}
+        if kollisjon:
+            print(f"Feil: Parameternavn brukes også av nøkkeltall: {', '.join(sorted(kollisjon))}")
+            sys.exit(1)
+
     if not args.sxi_fil.exists():
         print(f"Feil: Finner ikke SXI-fil: {args.sxi_fil}")
         sys.exit(1)
@@ -302,12 +476,16 @@ def main():
     print(f"Leser SXI-fil: {args.sxi_fil}")
     sxi_innhold = les_filinnhold(args.sxi_fil)
 
+    sporing = sporing_fra_argumenter(args)
+
+    # Bare nye eller endrede EPW-filer leses her; LOCATION for resten
+    # kommer fra EPW-indeksen i cachen
+    cache = cache_fra_argumenter(args)
     print("Leser EPW-filer...")
     epw_data = []
-    for epw_sti in epw_filer:
-        innhold = les_filinnhold(epw_sti)
-        navn = hent_epw_location(innhold) or epw_sti.stem
-        epw_data.append((navn, innhold))
+    for epw_sti, epw in zip(epw_filer, les_epw_filer(epw_filer, cache)):
+        navn = epw.location or epw_sti.stem
+        epw_data.append((navn, epw))
         print(f"  {epw_sti.name} -> {navn}")
 
     auth_sti = hent_auth_sti()
@@ -318,47 +496,38 @@ def main():
     print(f"\nStarter kompakt batch-simulering...")
     print(f"  BEMIFY URL: {args.bemify_url}")
     print(f"  Simuleringer: {len(epw_data)} klimafiler")
-    print(f"  Output: timer >26°C, varmeenergi, kjøleenergi")
+    print(f"  Arbeidere: {'daemon' if args.daemon else args.workers}")
+    print(f"  Output: {', '.join(m['name'] for m in spec['metrics'])}")
+    if args.tidsserier:
+        print(f"  Tidsserier: {args.tidsserier} ({', '.join(args.felt or STEG_GRUPPER)}, {args.dtype})")
     print("-" * 60)
 
     start_tid = time.time()
 
-    with sync_playwright() as p:
-        if not auth_sti.exists():
-            logg_inn_og_lagre(p, args.bemify_url)
-
-        browser = p.chromium.launch(headless=not args.headed)
-        context = browser.new_context(storage_state=str(auth_sti))
-        page = context.new_page()
-
-        print(f"[Runner] Laster BEMIFY fra {args.bemify_url}...")
-        page.goto(args.bemify_url, wait_until="networkidle", timeout=60000)
-
-        if "login" in page.url.lower() or "auth" in page.url.lower():
-            print("[Runner] Sesjonen har utløpt...")
-            browser.close()
-            if auth_sti.exists():
-                auth_sti.unlink()
-            logg_inn_og_lagre(p, args.bemify_url)
-            browser = p.chromium.launch(headless=not args.headed)
-            context = browser.new_context(storage_state=str(auth_sti))
-            page = context.new_page()
-            page.goto(args.bemify_url, wait_until="networkidle", timeout=60000)
-
-        print("[Runner] Venter på bemify API...")
-        page.wait_for_function("typeof window.bemify !== 'undefined'", timeout=30000)
-        print("[Runner] BEMIFY lastet")
-
-        result = kjor_compact_batch(page, sxi_innhold, epw_data, args.timeout * 1000)
-
-        browser.close()
+    if args.daemon:
+        try:
+            pool_kontekst = koble_til(args.bemify_url)
+        except ConnectionError as e:
+            print(f"Feil: {e}")
+            sys.exit(1)
+    else:
+        pool_kontekst = ArbeiderPool(args.workers, args.bemify_url, headless=not args.headed)
+
+    with pool_kontekst as pool:
+        result = kjor_compact_batch(
+            pool, sxi_innhold, epw_data, args.timeout * 1000,
+            cache, spec, args.vindu, sweep,
+            args.tidsserier, args.felt, args.dtype,
+        )
 
     tid_brukt = time.time() - start_tid
 
     if result:
-        skriv_resultater(result, args.output)
+        with spenn("write"):
+            skriv_resultater(result, args.output)
 
     print(f"\nTid brukt: {tid_brukt:.1f}s")
+    avslutt_sporing(sporing, args)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+BEMIFY Daemon - Varme nettlesere for runnerne
+
+Holder en ArbeiderPool med innloggede BEMIFY-sider i gang, så runnerne
+slipper å starte Chromium, laste siden og vente på window.bemify for hver
+kjøring. Runnerne kobler til med --daemon og sender oppgavene sine over en
+lokal socket (127.0.0.1, autentisert med nøkkelen i ~/.bemify_daemon.json).
+SXI-en som sist ble parset, ligger også igjen i sidene mellom kjøringene.
+
+Bruk:
+    python bemify_daemon.py start --workers 4     # kjører til Ctrl+C eller stop
+    python bemify_daemon.py status
+    python bemify_daemon.py stop
+
+    python bemify_compact_runner.py bygning.sxi ./klimafiler/ --daemon
+    python bemify_batch_runner.py bygning.sxi ./klimafiler/ -o results.ndjson --daemon
+
+Oppgavene overføres med pickle og kjøres med daemonens versjon av
+scriptene, så daemonen må startes på nytt etter at scriptene er oppdatert.
+"""
+
+import argparse
+import importlib
+import io
+import json
+import os
+import pickle
+import secrets
+import sys
+import threading
+import time
+import types
+from functools import partial
+from multiprocessing.connection import AuthenticationError, Client, Listener
+from pathlib import Path
+
+from bemify_session import ArbeiderPool, hent_auth_sti
+from bemify_trace import Sporet
+
+
+def hent_info_sti() -> Path:
+    """Hent sti til filen med port og nøkkel for den kjørende daemonen."""
+    return Path.home() / ".bemify_daemon.json"
+
+
+# --- Overføring ---
+
+def _hent_objekt(modul: str, navn: str):
+    obj = importlib.import_module(modul)
+    for del_ in navn.split("."):
+        obj = getattr(obj, del_)
+    return obj
+
+
+class _Pickler(pickle.Pickler):
+    """
+    Pickler som refererer funksjoner og klasser i __main__ via scriptets
+    modulnavn, så daemonen kan importere dem (runnerne kjøres som script).
+    """
+
+    def reducer_override(self, obj):
+        if isinstance(obj, (types.FunctionType, type)) and obj.__module__ == "__main__":
+            hoved = sys.modules["__main__"]
+            return _hent_objekt, (Path(hoved.__file__).stem, obj.__qualname__)
+        return NotImplemented
+
+
+def _send(conn, melding) -> None:
+    buf = io.BytesIO()
+    _Pickler(buf, protocol=pickle.HIGHEST_PROTOCOL).dump(melding)
+    conn.send_bytes(buf.getvalue())
+
+
+def _motta(conn):
+    return pickle.loads(conn.recv_bytes())
+
+
+def _samme_url(a: str, b: str) -> bool:
+    return a.rstrip("/") == b.rstrip("/")
+
+
+def _trygg(resultat):
+    """Gjør unntak som ikke kan pickles om til RuntimeError."""
+    if isinstance(resultat, Sporet):
+        resultat.resultat = _trygg(resultat.resultat)
+    elif isinstance(resultat, Exception):
+        try:
+            pickle.dumps(resultat)
+        except Exception:
+            return RuntimeError(f"{type(resultat).__name__}: {resultat}")
+    return resultat
+
+
+# --- Klient ---
+
+class DaemonKlient:
+    """
+    Samme grensesnitt som ArbeiderPool (pa_alle og kjor), men oppgavene
+    kjøres av daemonens arbeidere. bemify_url sendes med hver jobb, og
+    daemonen avviser jobber for en annen URL enn sin egen.
+    """
+
+    def __init__(self, info: dict, bemify_url: str | None = None):
+        self._conn = Client(("127.0.0.1", info["port"]), authkey=bytes.fromhex(info["authkey"]))
+        self.antall = info["workers"]
+        self.bemify_url = bemify_url
+
+    def __enter__(self) -> "DaemonKlient":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._conn.close()
+
+    def _svar(self):
+        melding = _motta(self._conn)
+        if melding[0] == "feil":
+            raise RuntimeError(f"Daemon: {melding[1]}")
+        return melding[1]
+
+    def pa_alle(self, oppgave) -> list:
+        _send(self._conn, ("pa_alle", oppgave, self.bemify_url))
+        return self._svar()
+
+    def kjor(self, oppgaver, ved_ferdig=None, forberedelser=None, vindu: int = 0) -> list:
+        _send(self._conn, ("kjor", oppgaver, forberedelser, vindu, self.bemify_url))
+        resultater: list = [None] * len(oppgaver)
+        while True:
+            melding = _motta(self._conn)
+            if melding[0] == "ferdig":
+                _, i, resultat = melding
+                resultater[i] = resultat
+                if ved_ferdig:
+                    ved_ferdig(i, resultat)
+            elif melding[0] == "feil":
+                raise RuntimeError(f"Daemon: {melding[1]}")
+            else:
+                return resultater
+
+    def status(self) -> dict:
+        _send(self._conn, ("status",))
+        return self._svar()
+
+    def stopp(self) -> None:
+        _send(self._conn, ("stopp",))
+        self._svar()
+
+
+def koble_til(bemify_url: str | None = None) -> DaemonKlient:
+    """
+    Koble til den kjørende daemonen. Gir ConnectionError hvis ingen svarer,
+    eller hvis daemonen kjører mot en annen bemify_url enn den som er bedt om.
+    """
+    try:
+        info = json.loads(hent_info_sti().read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        raise ConnectionError("Ingen daemon kjører. Start med: python bemify_daemon.py start")
+    if bemify_url and not _samme_url(info.get("bemify_url", ""), bemify_url):
+        raise ConnectionError(
+            f"Daemonen kjører mot {info.get('bemify_url')}, ikke {bemify_url}. "
+            f"Start den på nytt med --bemify-url {bemify_url}, eller kjør uten --daemon"
+        )
+    try:
+        return DaemonKlient(info, bemify_url)
+    except (OSError, AuthenticationError) as e:
+        raise ConnectionError(f"Kan ikke koble til daemonen på port {info.get('port')}: {e}")
+
+
+# --- Server ---
+
+def _hvis_ikke_avbrutt(avbrutt: threading.Event, oppgave, page):
+    if avbrutt.is_set():
+        raise RuntimeError("Klienten koblet fra")
+    return oppgave(page)
+
+
+class Daemon:
+    """Tar imot klienter og kjører oppgavene deres på poolen, én jobb om gangen."""
+
+    def __init__(self, pool: ArbeiderPool, port: int = 0):
+        self.pool = pool
+        self.authkey = secrets.token_bytes(32)
+        self.listener = Listener(("127.0.0.1", port), authkey=self.authkey)
+        self.startet = time.strftime("%Y-%m-%dT%H:%M:%S")
+        self.jobber = 0
+        self.aktiv: int | None = None
+        self.stoppet = threading.Event()
+        self._las = threading.Lock()
+
+    def skriv_info(self) -> None:
+        info = {
+            "port": self.listener.address[1],
+            "authkey": self.authkey.hex(),
+            "pid": os.getpid(),
+            "workers": self.pool.antall,
+            "bemify_url": self.pool.bemify_url,
+            "startet": self.startet,
+        }
+        sti = hent_info_sti()
+        fd = os.open(sti, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(info, f, indent=2)
+
+    def serve(self) -> None:
+        while not self.stoppet.is_set():
+            try:
+                conn = self.listener.accept()
+            except (OSError, EOFError, AuthenticationError):
+                continue
+            threading.Thread(target=self._klient, args=(conn,), daemon=True).start()
+
+    def _klient(self, conn) -> None:
+        with conn:
+            while True:
+                try:
+                    melding = _motta(conn)
+                except (EOFError, OSError):
+                    return
+                except Exception as e:
+                    # F.eks. en oppgave fra et script daemonen ikke finner
+                    _send(conn, ("feil", f"Kan ikke lese oppgaven: {e}"))
+                    continue
+
+                kommando = melding[0]
+                if kommando in ("pa_alle", "kjor") and not self._riktig_url(conn, melding[-1]):
+                    continue
+                if kommando == "status":
+                    _send(conn, ("svar", {
+                        "workers": self.pool.antall,
+                        "bemify_url": self.pool.bemify_url,
+                        "pid": os.getpid(),
+                        "startet": self.startet,
+                        "jobber": self.jobber,
+                        "aktiv": self.aktiv,
+                    }))
+                elif kommando == "stopp":
+                    _send(conn, ("svar", None))
+                    self.stoppet.set()
+                    return
+                elif kommando == "pa_alle":
+                    with self._las:
+                        resultater = self.pool.pa_alle(melding[1])
+                    _send(conn, ("svar", [_trygg(r) for r in resultater]))
+                elif kommando == "kjor":
+                    if not self._kjor(conn, *melding[1:-1]):
+                        return
+
+    def _riktig_url(self, conn, bemify_url: str | None) -> bool:
+        """Avvis jobben med en feilmelding hvis klienten ba om en annen BEMIFY-URL."""
+        if bemify_url is None or _samme_url(bemify_url, self.pool.bemify_url):
+            return True
+        _send(conn, ("feil", f"daemonen kjører mot {self.pool.bemify_url}, ikke {bemify_url}"))
+        return False
+
+    def _kjor(self, conn, oppgaver, forberedelser, vindu) -> bool:
+        """Kjør oppgavene og send hvert resultat når det er klart. False hvis klienten forsvant."""
+        avbrutt = threading.Event()
+
+        def ved_ferdig(i: int, resultat) -> None:
+            if avbrutt.is_set():
+                return
+            try:
+                _send(conn, ("ferdig", i, _trygg(resultat)))
+            except OSError:
+                # Resten av oppgavene hoppes over i stedet for å simuleres
+                avbrutt.set()
+
+        vaktet = [partial(_hvis_ikke_avbrutt, avbrutt, oppgave) for oppgave in oppgaver]
+        with self._las:
+            self.aktiv = len(oppgaver)
+            try:
+                self.pool.kjor(vaktet, ved_ferdig, forberedelser, vindu)
+            finally:
+                self.aktiv = None
+                self.jobber += 1
+        if avbrutt.is_set():
+            return False
+        _send(conn, ("svar", None))
+        return True
+
+
+def start(args) -> None:
+    try:
+        with koble_til() as klient:
+            status = klient.status()
+        print(f"Feil: En daemon kjører allerede (pid {status['pid']}, {status['workers']} arbeider(e))")
+        sys.exit(1)
+    except ConnectionError:
+        pass
+
+    auth_sti = hent_auth_sti()
+    if args.relogin and auth_sti.exists():
+        auth_sti.unlink()
+        print("[Daemon] Slettet lagret innlogging")
+
+    start_tid = time.time()
+    with ArbeiderPool(args.workers, args.bemify_url, headless=not args.headed) as pool:
+        daemon = Daemon(pool, args.port)
+        daemon.skriv_info()
+        print(f"[Daemon] Klar på 127.0.0.1:{daemon.listener.address[1]} "
+              f"etter {time.time() - start_tid:.1f}s ({pool.antall} arbeider(e))")
+        print("[Daemon] Stopp med Ctrl+C eller: python bemify_daemon.py stop")
+
+        threading.Thread(target=daemon.serve, daemon=True).start()
+        try:
+            # wait() med timeout slipper Ctrl+C gjennom, også på Windows
+            while not daemon.stoppet.wait(0.5):
+                pass
+        except KeyboardInterrupt:
+            pass
+        finally:
+            hent_info_sti().unlink(missing_ok=True)
+            print("[Daemon] Stopper...")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hold BEMIFY-nettlesere klare for runnerne")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_start = sub.add_parser("start", help="Start daemonen (kjører i forgrunnen)")
+    p_start.add_argument("--workers", type=int, default=1, help="Antall parallelle nettlesere (standard: 1)")
+    p_start.add_argument("--bemify-url", default="https://app.bemify.no", help="BEMIFY URL")
+    p_start.add_argument("--headed", action="store_true", help="Kjør nettlesere synlig")
+    p_start.add_argument("--port", type=int, default=0, help="Lokal port (standard: ledig port)")
+    p_start.add_argument("--relogin", action="store_true", help="Logg inn på nytt")
+
+    sub.add_parser("status", help="Vis status for daemonen")
+    sub.add_parser("stop", help="Stopp daemonen")
+
+    args = parser.parse_args()
+
+    if args.command == "start":
+        start(args)
+        return
+
+    try:
+        klient = koble_til()
+    except ConnectionError as e:
+        print(f"Feil: {e}")
+        sys.exit(1)
+
+    with klient:
+        if args.command == "status":
+            status = klient.status()
+            print(f"Daemon (pid {status['pid']}) startet {status['startet']}")
+            print(f"  BEMIFY URL: {status['bemify_url']}")
+            print(f"  Arbeidere: {status['workers']}")
+            print(f"  Jobber kjørt: {status['jobber']}")
+            if status["aktiv"] is not None:
+                print(f"  Kjører nå: {status['aktiv']} oppgave(r)")
+        elif args.command == "stop":
+            klient.stopp()
+            print("Daemon stoppet")
+
+
+if __name__ == "__main__":
+    main()
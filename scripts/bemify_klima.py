@@ -0,0 +1,420 @@
+"""
+BEMIFY Klima - Lager for ferdig parsede klimadata
+
+parseEpw er deterministisk for samme EPW-innhold og samme BEMIFY-bygg.
+Første gang et klima lastes, pakkes climateData fra siden i et kompakt
+binærformat og legges i resultatcachen (se bemify_cache.py) under
+nøkkelen ("klima", bygg-id, sha256 av EPW-teksten). Senere kjøringer
+henter filen inn i siden og pakker den ut direkte i window._bemifyKlima,
+uten å sende EPW-teksten eller kalle parseEpw.
+
+For å slippe å lese og hashe hele EPW-biblioteket ved hver oppstart har
+cachemappen en EPW-indeks (epw_indeks.json) med sti, størrelse og mtime
+per fil, sammen med hashene og LOCATION-navnet. Bare nye og endrede filer
+leses; for resten er oppstarten én stat per fil. EPW-teksten leses først
+på arbeideren, og bare når klimaet ikke finnes i lageret (EpwFil.les).
+
+Overføringen går som i bemify_binary.py: siden sender og henter via en
+adresse på sin egen origin som Playwright fanger opp (page.route).
+
+Filformat (.bmfk):
+
+    [blokk 0][blokk 1]...[header (JSON, UTF-8)][lengde][b"BMFK"]
+
+Blokkene er rå bytes, hver justert til 8 byte. Headeren har format,
+versjon og et skjelett av climateData der store numeriske data er byttet
+ut med referanser til blokkene:
+
+    {"$ta": type, "o": offset, "n": antall}   typet array (Float64Array osv.)
+    {"$arr": offset, "n": antall}              tallliste, lagret som float64
+    {"$rader": nøkler, "o": offset, "n": antall}
+                                               liste av like objekter med bare
+                                               tall, lagret kolonnevis som float64
+    {"$obj": {...}}                            objekt med egne nøkler som
+                                               begynner med $
+
+Før lagring pakkes dataene ut igjen i siden og sammenlignes med
+originalen. Lar de seg ikke gjenskape nøyaktig (f.eks. klasseinstanser),
+lagres ingenting og klimaet parses som før.
+
+Bruk:
+    from bemify_klima import hent_klima, klima_nokkel, lagre_klima, les_epw_filer
+    epw = les_epw_filer(stier, cache)[0]
+    lagernokkel = klima_nokkel(bygg_id, epw.sha256)
+    if not hent_klima(page, cache, epw.sha256, lagernokkel):
+        ...  # parseEpw(epw.les()), deretter lagre_klima(page, cache, epw.sha256, lagernokkel)
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+from functools import partial
+from pathlib import Path
+
+from bemify_cache import ResultatCache, cache_nokkel, innholds_hash
+from bemify_trace import registrer_kall, spenn
+
+KLIMA_FORMAT = "bemify-klima"
+KLIMA_VERSION = 1
+KLIMA_ENDELSE = ".bmfk"
+
+EPW_INDEKS = "epw_indeks.json"
+EPW_INDEKS_VERSJON = 1
+
+# Forespørslene fanges av page.route og når aldri serveren
+KLIMA_STI = "/__bemify_klima"
+
+# Maks byte per POST, som i bemify_binary.py
+POST_BIT = 8 * 1024 * 1024
+
+# Gjenoppbygger et skjelett med blokkreferanser fra buf (ArrayBuffer)
+_PAKK_UT_JS = """
+function pakkUt(v, buf) {
+    if (v === null || typeof v !== 'object') return v;
+    if (Array.isArray(v)) return v.map((x) => pakkUt(x, buf));
+    if ('$obj' in v) return pakkUtObjekt(v.$obj, buf);
+    if ('$udef' in v) return undefined;
+    if ('$tall' in v) return Number(v.$tall);
+    if ('$dato' in v) return new Date(v.$dato);
+    if ('$ta' in v) {
+        const Type = globalThis[v.$ta];
+        return new Type(buf.slice(v.o, v.o + v.n * Type.BYTES_PER_ELEMENT));
+    }
+    if ('$arr' in v) return Array.from(new Float64Array(buf, v.$arr, v.n));
+    if ('$rader' in v) {
+        const nokler = v.$rader;
+        const kol = new Float64Array(buf, v.o, nokler.length * v.n);
+        const ut = new Array(v.n);
+        for (let i = 0; i < v.n; i++) {
+            const rad = {};
+            for (let k = 0; k < nokler.length; k++) rad[nokler[k]] = kol[k * v.n + i];
+            ut[i] = rad;
+        }
+        return ut;
+    }
+    return pakkUtObjekt(v, buf);
+}
+
+function pakkUtObjekt(v, buf) {
+    const ut = {};
+    for (const [k, x] of Object.entries(v)) ut[k] = pakkUt(x, buf);
+    return ut;
+}
+"""
+
+# Pakker window._bemifyKlima.get(nokkel), kontrollerer og sender i biter
+PAKK_JS = """
+async ({ nokkel, sti, bit, format, versjon }) => {
+    """ + _PAKK_UT_JS.strip() + """
+
+    // Lister kortere enn dette blir stående i skjelettet
+    const MIN = 8;
+    const blokker = [];
+    let offset = 0;
+
+    function blokk(data) {
+        const o = offset;
+        blokker.push(new Uint8Array(data.buffer, data.byteOffset, data.byteLength));
+        offset += data.byteLength;
+        const fyll = (8 - offset % 8) % 8;
+        if (fyll) {
+            blokker.push(new Uint8Array(fyll));
+            offset += fyll;
+        }
+        return o;
+    }
+
+    const vanlig = (v) => v !== null && typeof v === 'object' && Object.getPrototypeOf(v) === Object.prototype;
+
+    function like(rad, nokler) {
+        if (!vanlig(rad)) return false;
+        const k = Object.keys(rad);
+        return k.length === nokler.length && k.every((x, i) => x === nokler[i] && typeof rad[x] === 'number');
+    }
+
+    function pakk(v) {
+        if (v === undefined) return { $udef: 1 };
+        if (typeof v === 'number') {
+            if (Object.is(v, -0)) return { $tall: '-0' };
+            return Number.isFinite(v) ? v : { $tall: String(v) };
+        }
+        if (v === null || typeof v === 'string' || typeof v === 'boolean') return v;
+        if (ArrayBuffer.isView(v) && !(v instanceof DataView)) return { $ta: v.constructor.name, o: blokk(v), n: v.length };
+        if (v instanceof Date) return { $dato: v.getTime() };
+        if (Array.isArray(v) && Object.getPrototypeOf(v) === Array.prototype) {
+            if (v.length >= MIN && v.every((x) => typeof x === 'number')) {
+                return { $arr: blokk(Float64Array.from(v)), n: v.length };
+            }
+            const nokler = v.length >= MIN && vanlig(v[0]) ? Object.keys(v[0]) : null;
+            if (nokler && nokler.length && v.every((r) => like(r, nokler))) {
+                const n = v.length;
+                const kol = new Float64Array(nokler.length * n);
+                for (let k = 0; k < nokler.length; k++) {
+                    for (let i = 0; i < n; i++) kol[k * n + i] = v[i][nokler[k]];
+                }
+                return { $rader: nokler, o: blokk(kol), n };
+            }
+            return v.map(pakk);
+        }
+        if (vanlig(v)) {
+            const ut = {};
+            for (const [k, x] of Object.entries(v)) ut[k] = pakk(x);
+            // Egne nøkler som ligner referansene pakkes inn
+            return Object.keys(ut).some((k) => k.startsWith('$')) ? { $obj: ut } : ut;
+        }
+        throw new Error('kan ikke lagre ' + Object.prototype.toString.call(v));
+    }
+
+    function likt(a, b) {
+        if (Object.is(a, b)) return true;
+        if (a === null || b === null || typeof a !== 'object' || typeof b !== 'object') return false;
+        if (Object.getPrototypeOf(a) !== Object.getPrototypeOf(b)) return false;
+        if (ArrayBuffer.isView(a)) return a.length === b.length && a.every((x, i) => Object.is(x, b[i]));
+        if (a instanceof Date) return Object.is(a.getTime(), b.getTime());
+        if (Array.isArray(a) && a.length !== b.length) return false;
+        const ka = Object.keys(a);
+        const kb = Object.keys(b);
+        return ka.length === kb.length && ka.every((k, i) => k === kb[i] && likt(a[k], b[k]));
+    }
+
+    const data = window._bemifyKlima.get(nokkel);
+    let skjelett;
+    try {
+        skjelett = pakk(data);
+    } catch (err) {
+        return { feil: err.message || String(err) };
+    }
+    const samlet = new Uint8Array(offset);
+    let i = 0;
+    for (const b of blokker) {
+        samlet.set(b, i);
+        i += b.byteLength;
+    }
+    if (!likt(data, pakkUt(skjelett, samlet.buffer))) return { feil: 'gjenskapte data er ulike' };
+
+    const header = { format, version: versjon, skjelett };
+    const tekst = new TextEncoder().encode(JSON.stringify(header));
+    const fil = new Uint8Array(offset + tekst.length + 8);
+    fil.set(samlet);
+    fil.set(tekst, offset);
+    new DataView(fil.buffer).setUint32(offset + tekst.length, tekst.length, true);
+    fil.set([0x42, 0x4d, 0x46, 0x4b], offset + tekst.length + 4);
+
+    const url = location.origin + sti;
+    for (let j = 0; j < fil.byteLength; j += bit) {
+        const svar = await fetch(url, { method: 'POST', body: fil.subarray(j, Math.min(j + bit, fil.byteLength)) });
+        if (!svar.ok) throw new Error('Klimaoverføring feilet: HTTP ' + svar.status);
+    }
+    return { bytes: fil.byteLength };
+}
+"""
+
+# Henter en lagret klimafil og legger dataene i window._bemifyKlima
+HENT_JS = """
+async ({ nokkel, sti, format, versjon }) => {
+    """ + _PAKK_UT_JS.strip() + """
+
+    const svar = await fetch(location.origin + sti);
+    if (!svar.ok) return null;
+    const buf = await svar.arrayBuffer();
+    const start = performance.now();
+    const n = buf.byteLength;
+    if (n < 8) return null;
+    const visning = new DataView(buf);
+    const lengde = visning.getUint32(n - 8, true);
+    const magi = String.fromCharCode(...new Uint8Array(buf, n - 4, 4));
+    if (magi !== 'BMFK' || lengde > n - 8) return null;
+    const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buf, n - 8 - lengde, lengde)));
+    if (header.format !== format || header.version !== versjon) return null;
+    if (!window._bemifyKlima) window._bemifyKlima = new Map();
+    window._bemifyKlima.set(nokkel, pakkUt(header.skjelett, buf));
+    return performance.now() - start;
+}
+"""
+
+_sider: dict = {}
+_advart = False
+
+
+def _rute(page, route) -> None:
+    side = _sider[page]
+    if route.request.method == "POST":
+        side["ut"].write(route.request.post_data_buffer)
+        route.fulfill(status=204)
+        return
+    try:
+        body = side["fil"].read_bytes()
+    except (AttributeError, OSError):
+        route.fulfill(status=404)  # Ryddet bort fra cachen i mellomtiden
+        return
+    route.fulfill(status=200, body=body, content_type="application/octet-stream")
+
+
+def _side(page) -> dict:
+    # En rute registreres én gang per side; filene byttes for hver overføring
+    if page not in _sider:
+        _sider[page] = {"ut": None, "fil": None}
+        page.route(f"**{KLIMA_STI}", partial(_rute, page))
+    return _sider[page]
+
+
+def glem_side(page) -> None:
+    """Glem en side som lukkes."""
+    _sider.pop(page, None)
+
+
+def klima_nokkel(bygg_id: str, nokkel: str) -> str:
+    """Cachenøkkel for parsede klimadata (nokkel er sha256 av EPW-teksten)."""
+    return cache_nokkel("klima", KLIMA_FORMAT, str(KLIMA_VERSION), bygg_id, nokkel)
+
+
+def hent_epw_location(innhold: str) -> str | None:
+    """Hent LOCATION-felt fra EPW-header (første kommaseparerte felt etter 'LOCATION,')."""
+    # Headeren er de første 8 linjene; resten av filen trenger ikke deles opp
+    for line in innhold[:64 * 1024].splitlines()[:8]:
+        if line.startswith("LOCATION,"):
+            parts = line.split(",")
+            if len(parts) >= 2 and parts[1].strip():
+                return parts[1].strip()
+    return None
+
+
+class EpwFil:
+    """
+    En EPW-fil med hashene og LOCATION-navnet fra EPW-indeksen. Teksten
+    leses først med les(), så objektet er lite å sende til arbeiderne.
+    """
+
+    def __init__(self, sti: Path, sha256: str, innholds_hash: str, location: str | None):
+        self.sti = sti
+        self.sha256 = sha256  # Nøkkel i siden og i klimalageret
+        self.innholds_hash = innholds_hash  # Nøkkel i resultatcachen
+        self.location = location
+
+    def les(self) -> str:
+        """Les EPW-teksten. Gir RuntimeError hvis filen er endret siden den ble indeksert."""
+        with spenn("epw_read"):
+            tekst = _les_epw(self.sti)
+        if hashlib.sha256(tekst.encode("utf-8")).hexdigest() != self.sha256:
+            raise RuntimeError(f"EPW-filen er endret under kjøringen: {self.sti}")
+        return tekst
+
+
+def _les_epw(sti: Path) -> str:
+    with open(sti, "r", encoding="utf-8", errors="replace") as f:
+        return f.read()
+
+
+def _les_indeks(sti: Path) -> dict:
+    try:
+        with open(sti, "r", encoding="utf-8") as f:
+            indeks = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(indeks, dict) or indeks.get("version") != EPW_INDEKS_VERSJON:
+        return {}
+    return indeks.get("filer") or {}
+
+
+def _lagre_indeks(sti: Path, filer: dict) -> None:
+    # Atomisk, så en avbrutt kjøring ikke etterlater en halv indeks
+    fd, tmp = tempfile.mkstemp(dir=sti.parent, prefix=sti.name + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"version": EPW_INDEKS_VERSJON, "filer": filer}, f)
+        os.replace(tmp, sti)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def les_epw_filer(stier: list[Path], cache: ResultatCache | None = None) -> list[EpwFil]:
+    """
+    Lag en EpwFil per sti. Med cache brukes EPW-indeksen i cachemappen, og
+    bare filer som er nye eller har endret størrelse eller mtime leses og
+    hashes. Uten cache leses alle filene.
+    """
+    indeks_sti = cache.mappe / EPW_INDEKS if cache else None
+    indeks = _les_indeks(indeks_sti) if indeks_sti else {}
+    endret = False
+    ut = []
+    for sti in stier:
+        sti = sti.resolve()  # Daemonen har en annen arbeidsmappe
+        st = sti.stat()
+        post = indeks.get(str(sti))
+        if not post or post.get("size") != st.st_size or post.get("mtime_ns") != st.st_mtime_ns:
+            with spenn("epw_read"):
+                tekst = _les_epw(sti)
+            post = {
+                "size": st.st_size,
+                "mtime_ns": st.st_mtime_ns,
+                "sha256": hashlib.sha256(tekst.encode("utf-8")).hexdigest(),
+                "innholds_hash": innholds_hash(tekst),
+                "location": hent_epw_location(tekst),
+            }
+            indeks[str(sti)] = post
+            endret = True
+        ut.append(EpwFil(sti, post["sha256"], post["innholds_hash"], post["location"]))
+    if indeks_sti and endret:
+        _lagre_indeks(indeks_sti, indeks)
+    return ut
+
+
+def hent_klima(page, cache: ResultatCache, nokkel: str, lagernokkel: str, navn: str | None = None) -> bool:
+    """
+    Legg lagrede klimadata inn i window._bemifyKlima under nokkel.
+    Returnerer False ved bom (eller en ugyldig fil), så klimaet må parses.
+    """
+    sti = cache.hent(lagernokkel, KLIMA_ENDELSE)
+    if sti is None:
+        return False
+    side = _side(page)
+    side["fil"] = sti
+    start = time.time()
+    t0 = time.perf_counter()
+    try:
+        utpakking_ms = page.evaluate(HENT_JS, {
+            "nokkel": nokkel,
+            "sti": KLIMA_STI,
+            "format": KLIMA_FORMAT,
+            "versjon": KLIMA_VERSION,
+        })
+    finally:
+        side["fil"] = None
+    registrer_kall("klima_transfer", "klima_unpack", start, time.perf_counter() - t0, utpakking_ms, navn)
+    return utpakking_ms is not None
+
+
+def lagre_klima(page, cache: ResultatCache, nokkel: str, lagernokkel: str) -> int | None:
+    """
+    Pakk window._bemifyKlima.get(nokkel) og legg det i cachen. Returnerer
+    antall byte, eller None hvis dataene ikke kan gjenskapes fra formatet.
+    """
+    global _advart
+    side = _side(page)
+    fd, tmp = tempfile.mkstemp(suffix=KLIMA_ENDELSE)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            side["ut"] = f
+            try:
+                svar = page.evaluate(PAKK_JS, {
+                    "nokkel": nokkel,
+                    "sti": KLIMA_STI,
+                    "bit": POST_BIT,
+                    "format": KLIMA_FORMAT,
+                    "versjon": KLIMA_VERSION,
+                })
+            finally:
+                side["ut"] = None
+        if svar.get("feil"):
+            if not _advart:
+                print(f"[Runner] Klimadata lagres ikke ({svar['feil']}), parseEpw brukes hver gang")
+                _advart = True
+            return None
+        cache.lagre_fil(lagernokkel, KLIMA_ENDELSE, Path(tmp))
+        return svar["bytes"]
+    finally:
+        os.unlink(tmp)
+
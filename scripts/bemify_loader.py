@@ -0,0 +1,197 @@
+"""
+BEMIFY Loader - Tidsserier fra resultatfiler til pandas
+
+Leser valgte felt for én simulering rett inn i forhåndsallokerte
+NumPy-arrays og returnerer én DataFrame per sone med tidsindeks. Støtter
+samme format som notebooken: GUI-JSON (liste av soner), CLI-JSON
+(stepResultsPerSone), batchSimulate ({"results": [...]}) og NDJSON, også
+gzip- eller zstd-komprimert.
+
+I NDJSON-filer finnes linjen til simuleringen i byte-indeksen
+(results.ndjson.idx.json, se bemify_ndjson.line_index), og bare den
+linjen leses; de andre simuleringene parses ikke. Tidsstegene
+i sonene som ikke er valgt, hoppes over uten å gås gjennom (unntatt i
+GUI-format, der sone-ID-en står inne i sonen).
+
+Bruk:
+    from bemify_loader import INNEKLIMA_FELT, list_simulations, load_zones
+
+    sims = list_simulations("results.ndjson")
+    soner = load_zones("results.ndjson", "Oslo", INNEKLIMA_FELT)
+    soner["sone_abc123"]["T_operativ"].resample("h").mean()
+"""
+
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+
+from bemify_ndjson import climate_name_from_head, find_line, iter_simulations, line_index, open_result
+
+TIMESTEP_MINUTES = 15
+STEPS_PER_YEAR = 35_040
+
+# Kolonnenavn i notebooken -> feltsti i StepData
+INNEKLIMA_FELT = {
+    "T_luft": "inneklima/luftTemperatur",
+    "T_overflate": "inneklima/overflateTemperatur",
+    "T_masse": "inneklima/masseTemperatur",
+    "T_operativ": "inneklima/operativTemperatur",
+    "T_tilluft": "inneklima/tilluftsTemperatur",
+    "V_tilluft": "inneklima/tilluftsLuftmengde",
+    "CO2": "inneklima/CO2_nivå",
+    "RH": "inneklima/relativ_fuktighet",
+}
+
+
+def detect_format(path: Path | str) -> str:
+    """Formatet fra starten av filen: "ndjson", "gui" (liste) eller "json"."""
+    with open_result(path) as f:
+        head = f.read(4096)
+    if climate_name_from_head(head) is not None:
+        return "ndjson"
+    return "gui" if head.lstrip()[:1] == b"[" else "json"
+
+
+def list_simulations(path: Path | str) -> list[dict]:
+    """
+    List simuleringene i filen som [{"index", "climateName", ...}]. For
+    NDJSON brukes byte-indeksen, og "length" er linjens lengde i byte
+    (ukomprimert); for JSON-formatene gås filen gjennom én gang, og
+    sone-ID-ene tas med under "zones".
+    """
+    path = Path(path)
+    if detect_format(path) == "ndjson":
+        return [{k: v for k, v in sim.items() if k != "offset"} for sim in line_index(path)]
+
+    sims = []
+    with open_result(path) as f:
+        for event, data in iter_simulations(f, default_name=path.stem):
+            if event == "start":
+                sims.append({"index": data, "climateName": path.stem, "zones": []})
+            elif event == "climate":
+                sims[-1]["climateName"] = data
+            elif event == "zone_end":
+                sims[-1]["zones"].append(data[1])
+    return sims
+
+
+def iter_simulation(
+    path: Path | str,
+    simulation: int | str = 0,
+    solar: bool = False,
+    zones: set[str] | None = None,
+) -> Iterator[tuple[str, object]]:
+    """
+    Hendelsene fra iter_simulations for én simulering (indeks eller
+    klimanavn). I NDJSON leses bare linjen til simuleringen; i JSON-formatene
+    strømmes filen til simuleringen er ferdig. zones begrenser tidsstegene
+    som gås gjennom (se iter_simulations). Gir KeyError/IndexError hvis
+    simuleringen ikke finnes.
+    """
+    path = Path(path)
+    if detect_format(path) == "ndjson":
+        sim = find_line(line_index(path), simulation)
+        with open_result(path) as f:
+            f.seek(sim["offset"])
+            for event, data in iter_simulations(f, solar=solar, limit=sim["length"], lines=True, zones=zones):
+                yield (event, sim["index"]) if event in ("start", "end") else (event, data)
+        return
+
+    if isinstance(simulation, int) and simulation < 0:
+        simulation = find_line(list_simulations(path), simulation)["index"]
+    target = simulation if isinstance(simulation, int) else None
+    with open_result(path) as f:
+        current, pending = -1, []
+        for event, data in iter_simulations(f, default_name=path.stem, solar=solar, zones=zones):
+            if event == "start":
+                current, pending = data, [(event, data)]
+                continue
+            if target is None:
+                # Klimanavnet kommer rett etter start; hold igjen til det er kjent
+                if event == "climate" and data == simulation:
+                    target = current
+                    yield from pending
+                    pending = []
+                else:
+                    continue
+            if current == target:
+                yield (event, data)
+                if event == "end":
+                    return
+    if isinstance(simulation, str):
+        raise KeyError(f"Fant ikke simuleringen '{simulation}'")
+    raise IndexError(f"Simulering {simulation} finnes ikke i {path}")
+
+
+class _ZoneArrays:
+    """Forhåndsallokerte arrays (felt, steg) for én sone, som vokser ved behov."""
+
+    def __init__(self, n_fields: int, capacity: int = STEPS_PER_YEAR):
+        self.data = np.full((n_fields, capacity), np.nan)
+        self.n = 0
+
+    def ensure(self, i: int) -> None:
+        if i >= self.data.shape[1]:
+            ny = np.full((self.data.shape[0], max(i + 1, 2 * self.data.shape[1])), np.nan)
+            ny[:, :self.data.shape[1]] = self.data
+            self.data = ny
+        self.n = max(self.n, i + 1)
+
+
+def load_zones(
+    path: Path | str,
+    simulation: int | str = 0,
+    fields: dict[str, str] | list[str] = INNEKLIMA_FELT,
+    zones: list[str] | None = None,
+    start: str = "2025-01-01",
+) -> dict[str, pd.DataFrame]:
+    """
+    Last valgte felt for én simulering (indeks eller klimanavn) som
+    {sone-ID: DataFrame} med 15-minutters tidsindeks fra start.
+
+    fields er {kolonne: feltsti} eller en liste av feltstier (brukes som
+    kolonnenavn). Feltstier skrives som i kolonnelageret, f.eks.
+    "inneklima/luftTemperatur" eller "termiskKildeYtelse/1 Levert
+    elektrisitet/1a Romoppvarming/input_W". Manglende verdier blir NaN.
+    zones begrenser hvilke soner som leses (standard: alle).
+    """
+    path = Path(path)
+    if not isinstance(fields, dict):
+        fields = {f: f for f in fields}
+    columns = list(fields)
+    keys = [tuple(sti.strip("/").split("/")) for sti in fields.values()]
+    # GUI-format har sone-ID-en inne i sone-objektet, så der filtreres det til slutt
+    wanted = set(zones) if zones is not None and detect_format(path) != "gui" else None
+
+    arrays: dict[str, _ZoneArrays] = {}
+    names: dict[str, str] = {}
+
+    def add_step(zone: str, i: int, step: dict) -> None:
+        buf = arrays.get(zone)
+        if buf is None:
+            buf = arrays[zone] = _ZoneArrays(len(keys))
+        buf.ensure(i)
+        col = buf.data
+        for k, key in enumerate(keys):
+            verdi = step
+            for del_ in key:
+                verdi = verdi.get(del_) if isinstance(verdi, dict) else None
+            if isinstance(verdi, (int, float)):
+                col[k, i] = verdi
+
+    for event, data in iter_simulation(path, simulation, zones=wanted):
+        if event == "step":
+            add_step(*data)
+        elif event == "zone_end":
+            names[data[0]] = data[1]
+
+    frames = {}
+    for zone, buf in arrays.items():
+        zone_id = names.get(zone, zone)
+        if zones is not None and zone_id not in zones:
+            continue
+        index = pd.date_range(start, periods=buf.n, freq=f"{TIMESTEP_MINUTES}min")
+        frames[zone_id] = pd.DataFrame(buf.data[:, :buf.n].T, index=index, columns=columns)
+    return frames
@@ -0,0 +1,292 @@
+"""
+BEMIFY Metrics - Deklarative nøkkeltall for kompakt-runneren
+
+En metrikkspesifikasjon (JSON eller YAML) beskriver hvilke nøkkeltall som
+skal beregnes i nettleseren. Spesifikasjonen sendes som data til én
+generisk reduksjon som går gjennom tidsstegene én gang, så bare
+aggregatene krysser grensen mellom side og Python.
+
+Format:
+    metrics:
+      - name: timerOver26                 # kolonnenavn
+        label: "Timer >26°C"              # overskrift i konsollen (valgfri)
+        type: threshold_hours             # threshold_hours | sum_kwh | peak_kw
+        field: inneklima/luftTemperatur   # feltsti, eller liste av feltstier
+        op: ">"                           # kun threshold_hours: > >= < <=
+        value: 26
+        scope: building                   # building (standard) | zone
+        bins: year                        # year (standard) | month
+
+Feltstier skrives som i kolonnelageret, med "/" mellom nøklene, og "*"
+matcher alle nøkler på sitt nivå (f.eks. "termiskKildeYtelse/*/*/input_W").
+Stiene utvides mot første tidssteg i hver sone, og hver sti må treffe
+minst ett tall (eller null) der; ellers feiler simuleringen med stien i
+meldingen, så skrivefeil ikke gir 0. Verdien for et tidssteg er summen av
+alle feltene metrikken peker på. Verdier som mangler eller er null i et
+tidssteg teller 0, mens NaN beholdes.
+
+    threshold_hours  timer der verdien oppfyller op/value
+    sum_kwh          energi [kWh] fra effekt [W]
+    peak_kw          maks effekt [kW]
+
+Med scope: building summeres timer og energi over sonene, og maks effekt
+tas av byggets samlede effekt per tidssteg. Med scope: zone gis én verdi
+per sone-ID. bins: month gir 12 verdier (år uten skuddag, fra 1. januar).
+"""
+
+import json
+from pathlib import Path
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+METRIKK_TYPER = ("threshold_hours", "sum_kwh", "peak_kw")
+OPERATORER = (">", ">=", "<", "<=")
+
+# Gjengir de tre faste nøkkeltallene runneren alltid har levert
+STANDARD_SPESIFIKASJON = {
+    "metrics": [
+        {
+            "name": "timerOver26",
+            "label": "Timer >26°C",
+            "type": "threshold_hours",
+            "field": "inneklima/luftTemperatur",
+            "op": ">",
+            "value": 26,
+        },
+        {
+            "name": "varmeenergi_kWh",
+            "label": "Varme [kWh]",
+            "type": "sum_kwh",
+            "field": ["effektBehov/1a Romoppvarming", "effektBehov/1b Ventilasjonsvarme"],
+        },
+        {
+            "name": "kjoleenergi_kWh",
+            "label": "Kjøle [kWh]",
+            "type": "sum_kwh",
+            "field": ["effektBehov/3a Romkjøling", "effektBehov/3b Ventilasjonskjøling"],
+        },
+    ]
+}
+
+# Generisk reduksjon: (result, spec) => { navn: aggregat, ... }
+REDUSER_JS = """
+(result, spec) => {
+    const MND_START = [0, 31, 59, 90, 120, 151, 181, 212, 243, 273, 304, 334];
+    const soner = Object.entries(result.stepResultsPerSone);
+    const nSteg = soner.reduce((n, [, steg]) => Math.max(n, steg.length), 0);
+
+    // Månedsindeks per tidssteg (96 tidssteg per døgn)
+    const mnd = new Uint8Array(nSteg);
+    for (let m = 1; m < 12; m++) mnd.fill(m, Math.min(MND_START[m] * 96, nSteg));
+
+    // Utvid "*" i en feltsti mot et konkret tidssteg
+    function utvid(steg, sti) {
+        let stier = [[]];
+        for (const del of sti) {
+            const neste = [];
+            for (const s of stier) {
+                if (del !== '*') {
+                    neste.push([...s, del]);
+                    continue;
+                }
+                const v = s.reduce((o, k) => o?.[k], steg);
+                if (v && typeof v === 'object') {
+                    for (const k of Object.keys(v)) neste.push([...s, k]);
+                }
+            }
+            stier = neste;
+        }
+        return stier;
+    }
+
+    const hent = (s, k) => { let v = s; for (const x of k) v = v?.[x]; return v; };
+
+    // Numeriske blader (tall eller null) for hver feltsti i et tidssteg.
+    // En sti uten blader er en skrivefeil og gir feil, ikke 0.
+    function blader(m, steg, soneId) {
+        return m.fields.flatMap((sti) => {
+            const funnet = utvid(steg, sti).filter((k) => {
+                const v = hent(steg, k);
+                return v === null || typeof v === 'number';
+            });
+            if (!funnet.length) {
+                throw new Error(`${m.name}: feltet ${sti.join('/')} finnes ikke eller er ikke et tall (sone ${soneId})`);
+            }
+            return funnet;
+        });
+    }
+
+    // Leser som summerer alle feltene for et tidssteg; manglende verdier teller 0
+    function leser(stier) {
+        const les = stier.map((k) => k.length === 2
+            ? (s) => { const v = s[k[0]]?.[k[1]]; return typeof v === 'number' ? v : 0; }
+            : (s) => { const v = hent(s, k); return typeof v === 'number' ? v : 0; });
+        if (les.length === 1) return les[0];
+        return (s) => { let sum = 0; for (const f of les) sum += f(s); return sum; };
+    }
+
+    const SAMMENLIGN = {
+        '>': (a, b) => a > b, '>=': (a, b) => a >= b,
+        '<': (a, b) => a < b, '<=': (a, b) => a <= b,
+    };
+    const nyAcc = (m) => new Float64Array(m.bins === 'month' ? 12 : 1).fill(m.type === 'peak_kw' ? -Infinity : 0);
+    const tilstand = spec.metrics.map((m) => ({
+        m,
+        bygg: nyAcc(m),
+        total: m.type === 'peak_kw' && m.scope === 'building' ? new Float64Array(nSteg) : null,
+        soner: {},
+    }));
+
+    for (const [soneId, steg] of soner) {
+        if (!steg.length) continue;
+        const oppdater = tilstand.map((t) => {
+            const { m } = t;
+            const les = leser(blader(m, steg[0], soneId));
+            const acc = m.scope === 'zone' ? (t.soner[soneId] = nyAcc(m)) : t.bygg;
+            const grense = m.value;
+            const cmp = SAMMENLIGN[m.op];
+            if (t.total) return (s, i) => { t.total[i] += les(s); };
+            if (m.bins === 'month') {
+                if (m.type === 'threshold_hours') return (s, i) => { if (cmp(les(s), grense)) acc[mnd[i]] += 1; };
+                if (m.type === 'sum_kwh') return (s, i) => { acc[mnd[i]] += les(s); };
+                return (s, i) => { const v = les(s); if (v > acc[mnd[i]]) acc[mnd[i]] = v; };
+            }
+            if (m.type === 'threshold_hours') return (s) => { if (cmp(les(s), grense)) acc[0] += 1; };
+            if (m.type === 'sum_kwh') return (s) => { acc[0] += les(s); };
+            return (s) => { const v = les(s); if (v > acc[0]) acc[0] = v; };
+        });
+        // Én gjennomgang av tidsstegene for alle metrikkene
+        for (let i = 0; i < steg.length; i++) {
+            const s = steg[i];
+            for (const f of oppdater) f(s, i);
+        }
+    }
+
+    const ut = {};
+    for (const t of tilstand) {
+        const { m } = t;
+        if (t.total) {
+            for (let i = 0; i < nSteg; i++) {
+                const b = m.bins === 'month' ? mnd[i] : 0;
+                if (t.total[i] > t.bygg[b]) t.bygg[b] = t.total[i];
+            }
+        }
+        const skaler = m.type === 'threshold_hours' ? (x) => x * 0.25
+            : m.type === 'sum_kwh' ? (x) => x * 0.25 / 1000
+            : (x) => x / 1000;
+        const verdi = (acc) => {
+            const v = Array.from(acc, (x) => Number.isFinite(x) ? skaler(x) : null);
+            return m.bins === 'month' ? v : v[0];
+        };
+        ut[m.name] = m.scope === 'zone'
+            ? Object.fromEntries(Object.entries(t.soner).map(([id, acc]) => [id, verdi(acc)]))
+            : verdi(t.bygg);
+    }
+    return ut;
+}
+"""
+
+
+def les_json_eller_yaml(sti: Path):
+    """Les en JSON- eller YAML-fil (etter filendelse). Syntaksfeil gir ValueError."""
+    with open(sti, "r", encoding="utf-8") as f:
+        if sti.suffix.lower() in (".yaml", ".yml"):
+            if yaml is None:
+                raise ValueError("PyYAML er ikke installert (pip install pyyaml), bruk JSON eller installer PyYAML")
+            try:
+                return yaml.safe_load(f)
+            except yaml.YAMLError as e:
+                raise ValueError(str(e)) from e
+        return json.load(f)
+
+
+def les_spesifikasjon(sti: Path) -> dict:
+    """Les og valider en metrikkspesifikasjon fra JSON- eller YAML-fil."""
+    return normaliser_spesifikasjon(les_json_eller_yaml(sti))
+
+
+def normaliser_spesifikasjon(spec) -> dict:
+    """Valider spesifikasjonen og fyll inn standardverdier. Feil gir ValueError."""
+    metrikker = spec.get("metrics") if isinstance(spec, dict) else spec
+    if not isinstance(metrikker, list) or not metrikker:
+        raise ValueError("Spesifikasjonen må ha en ikke-tom liste 'metrics'")
+
+    ut = []
+    navn_brukt = {"climateName"}
+    for nr, m in enumerate(metrikker, 1):
+        if not isinstance(m, dict):
+            raise ValueError(f"Metrikk {nr}: må være et objekt")
+        navn = m.get("name")
+        if not isinstance(navn, str) or not navn:
+            raise ValueError(f"Metrikk {nr}: mangler 'name'")
+        if navn in navn_brukt:
+            raise ValueError(f"Metrikk {nr}: navnet '{navn}' er allerede brukt")
+        navn_brukt.add(navn)
+
+        def feil(tekst: str) -> ValueError:
+            return ValueError(f"Metrikk {nr} ({navn}): {tekst}")
+
+        type_ = m.get("type")
+        if type_ not in METRIKK_TYPER:
+            raise feil(f"'type' må være en av {', '.join(METRIKK_TYPER)}")
+
+        felt = m.get("field")
+        felt = [felt] if isinstance(felt, str) else felt
+        if not isinstance(felt, list) or not felt or not all(isinstance(f, str) and f for f in felt):
+            raise feil("'field' må være en feltsti eller en liste av feltstier")
+        stier = [f.strip("/").split("/") for f in felt]
+
+        norm = {
+            "name": navn,
+            "label": str(m.get("label", navn)),
+            "type": type_,
+            "fields": stier,
+            "scope": m.get("scope", "building"),
+            "bins": m.get("bins", "year"),
+        }
+        if norm["scope"] not in ("building", "zone"):
+            raise feil("'scope' må være building eller zone")
+        if norm["bins"] not in ("year", "month"):
+            raise feil("'bins' må være year eller month")
+        if type_ == "threshold_hours":
+            if m.get("op") not in OPERATORER:
+                raise feil(f"'op' må være en av {' '.join(OPERATORER)}")
+            verdi = m.get("value")
+            if isinstance(verdi, bool) or not isinstance(verdi, (int, float)):
+                raise feil("'value' må være et tall")
+            norm["op"] = m["op"]
+            norm["value"] = verdi
+        ut.append(norm)
+
+    return {"metrics": ut}
+
+
+def er_skalar(m: dict) -> bool:
+    """Én verdi per klimasted (byggnivå, helår)."""
+    return m["scope"] == "building" and m["bins"] == "year"
+
+
+def flat_rad(resultat: dict, spec: dict) -> dict:
+    """
+    Flat ut ett klimasteds resultat til CSV-kolonner. Sonevise verdier får
+    kolonnen 'navn[sone-ID]', og månedsverdier får suffiks _01 til _12.
+    Resultater fra en sweep får variantnummer og parameterverdier først.
+    """
+    rad = {"climateName": resultat["climateName"]}
+    if "parameters" in resultat:
+        rad["variant"] = resultat.get("variant")
+        rad.update(resultat["parameters"])
+    for m in spec["metrics"]:
+        verdi = resultat.get(m["name"])
+        deler = (verdi or {}).items() if m["scope"] == "zone" else [(None, verdi)]
+        for sone, v in deler:
+            kolonne = m["name"] if sone is None else f"{m['name']}[{sone}]"
+            if m["bins"] == "month":
+                for k, x in enumerate(v or [None] * 12, 1):
+                    rad[f"{kolonne}_{k:02d}"] = x
+            else:
+                rad[kolonne] = v
+    return rad
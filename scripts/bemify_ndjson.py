@@ -0,0 +1,705 @@
+"""
+BEMIFY NDJSON - Strømmende leser for store resultatfiler
+
+Leser BEMIFY-resultater (NDJSON, CLI-JSON og GUI-JSON) som en strøm av
+hendelser i stedet for å bygge hele objekttreet med json.loads. Kun
+verdiene på stier som skal gås gjennom brytes opp; alt annet dekodes
+eller hoppes over. Minnebruken begrenses dermed av ett tidssteg, ikke
+av én hel simulering.
+
+Bruk:
+    from bemify_ndjson import iter_events, STEG_STI
+
+    with open("results.ndjson", "rb") as f:
+        for hendelse, sti, verdi in iter_events(f, walk=[STEG_STI]):
+            ...
+
+Hendelser (hendelse, sti, verdi):
+    start_map / end_map       Objekt som gås gjennom nøkkel for nøkkel
+    start_array / end_array   Liste som gås gjennom element for element
+    value                     Ferdig dekodet verdi på stien
+    skip                      Verdi som er hoppet over uten å lagres
+
+Stien er en tuple av nøkler (str) og listeindekser (int). En post starter
+med start_map på stien () og slutter med end_map på stien ().
+
+Komprimerte filer (gzip, eller zstd med pakken zstandard) åpnes med
+open_result, som dekomprimerer strømmende. Formatet gjenkjennes fra de
+første bytene, ikke fra filendelsen.
+"""
+
+import codecs
+import gzip
+import json
+import os
+import re
+import tempfile
+import zlib
+from contextlib import nullcontext
+from pathlib import Path
+from typing import BinaryIO, Iterator
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CHUNK_SIZE = 1 << 20
+
+# Stimønstre: "*" matcher alle nøkler og listeindekser, int matcher
+# kun listeindekser, og et konkret tall matcher én bestemt indeks
+STEG_STI = ("result", "stepResultsPerSone", "*", "*")
+SOLCELLE_STI = ("result", "solcelleProduction")
+
+# Tidssteg i alle formatene notebooken støtter
+STEG_STIER = [
+    STEG_STI,                                                     # NDJSON-linje
+    ("stepResultsPerSone", "*", "*"),                             # CLI-format
+    ("results", int, "result", "stepResultsPerSone", "*", "*"),   # batchSimulate
+    (int, "stepResults", "*"),                                    # GUI-format
+]
+SOLCELLE_STIER = [
+    SOLCELLE_STI + ("*",),
+    ("solcelleProduction", "*"),
+    ("results", int, "result", "solcelleProduction", "*"),
+]
+
+# Nøkler på toppnivå i en NDJSON-linje eller et CLI-resultat
+_RECORD_KEYS = {
+    "climateName", "result", "stepResultsPerSone", "varmetapstallPerSone",
+    "solcelleProduction", "warnings", "metadata",
+}
+
+_WALK, _SKIP, _DECODE = 0, 1, 2
+
+_WS = re.compile(r"[ \t\n\r]*")
+
+
+class JsonEventReader:
+    """
+    Inkrementell JSON-leser som gir hendelser for valgte stier. Med
+    lines=True er strømmen NDJSON, der ingen verdi går over flere linjer.
+    En sti som et walk-mønster går gjennom, hoppes ikke over selv om et
+    skip-mønster også matcher; ("a", "*") i skip med ("a", "x", "*") i walk
+    hopper over alle verdier under a unntatt x.
+    """
+
+    def __init__(
+        self,
+        raw: BinaryIO,
+        walk: list[tuple] = (),
+        skip: list[tuple] = (),
+        limit: int | None = None,
+        chunk_size: int = CHUNK_SIZE,
+        lines: bool = False,
+    ):
+        self._raw = raw
+        self._lines = lines
+        self._walk = [tuple(p) for p in walk]
+        self._skip = [tuple(p) for p in skip]
+        self._by_index = any(type(e) is int for p in self._walk + self._skip for e in p)
+        self._remaining = limit
+        self._chunk_size = chunk_size
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+
+    def __iter__(self) -> Iterator[tuple[str, tuple, object]]:
+        while self._peek():
+            yield from self._parse(())
+
+    # --- Buffer ---
+
+    def _fill(self) -> bool:
+        """Les mer tekst inn i bufferen. Returnerer False ved filslutt."""
+        if self._eof:
+            return False
+        # Doble lesestørrelsen for verdier som ikke får plass, så
+        # gjentatte dekodingsforsøk blir lineære i verdiens lengde
+        size = max(self._chunk_size, len(self._buf) - self._pos)
+        if self._remaining is not None:
+            size = min(size, self._remaining)
+        data = self._raw.read(size) if size > 0 else b""
+        if self._remaining is not None:
+            self._remaining -= len(data)
+        text = self._utf8.decode(data, final=not data)
+        if not data:
+            self._eof = True
+        self._buf = self._buf[self._pos:] + text
+        self._pos = 0
+        return bool(data) or bool(text)
+
+    def _peek(self) -> str:
+        """Hopp over mellomrom og returner neste tegn ('' ved filslutt)."""
+        while True:
+            self._pos = _WS.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return ""
+
+    def _expect(self, tegn: str) -> None:
+        if self._peek() != tegn:
+            raise ValueError(f"Ugyldig JSON: forventet '{tegn}' ved tegn {self._pos}")
+        self._pos += 1
+
+    def _decode(self):
+        """Dekod én hel verdi fra bufferen, og les mer ved behov."""
+        while True:
+            try:
+                value, end = self._json.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError as e:
+                # En avkortet verdi feiler i slutten av bufferen. Står det et
+                # linjeskift etter feilen (i NDJSON: etter verdiens start),
+                # hjelper det ikke å lese mer, og resten av filen leses ikke inn
+                if self._buf.find("\n", self._pos if self._lines else e.pos) >= 0 or not self._fill():
+                    raise ValueError(f"Ugyldig JSON: {e.msg}") from e
+                continue
+            # Et tall helt i slutten av bufferen kan være avkortet
+            if end == len(self._buf) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    # --- Struktur ---
+
+    def _kind(self, path: tuple) -> int:
+        for pattern in self._walk:
+            if len(pattern) > len(path) and _matches(pattern, path):
+                return _WALK
+        for pattern in self._skip:
+            if len(pattern) == len(path) and _matches(pattern, path):
+                return _SKIP
+        return _DECODE
+
+    def _parse(self, path: tuple) -> Iterator[tuple[str, tuple, object]]:
+        kind = self._kind(path)
+        tegn = self._peek()
+        if kind == _SKIP:
+            self._skip_value()
+            yield ("skip", path, None)
+        elif kind == _WALK and tegn == "{":
+            yield from self._walk_object(path)
+        elif kind == _WALK and tegn == "[":
+            yield from self._walk_array(path)
+        else:
+            yield ("value", path, self._decode())
+
+    def _walk_object(self, path: tuple) -> Iterator[tuple[str, tuple, object]]:
+        self._expect("{")
+        yield ("start_map", path, None)
+        if self._peek() == "}":
+            self._pos += 1
+        else:
+            while True:
+                if self._peek() != '"':
+                    raise ValueError(f"Ugyldig JSON: forventet nøkkel ved tegn {self._pos}")
+                key = self._decode()
+                self._expect(":")
+                yield from self._parse(path + (key,))
+                if self._peek() == ",":
+                    self._pos += 1
+                    continue
+                self._expect("}")
+                break
+        yield ("end_map", path, None)
+
+    def _walk_array(self, path: tuple) -> Iterator[tuple[str, tuple, object]]:
+        self._expect("[")
+        yield ("start_array", path, None)
+        # Uten konkrete indekser i mønstrene behandles alle elementene likt
+        kind = self._kind(path + (0,))
+        i = 0
+        if self._peek() == "]":
+            self._pos += 1
+        else:
+            while True:
+                if self._by_index:
+                    kind = self._kind(path + (i,))
+                if kind == _DECODE:
+                    self._peek()
+                    yield ("value", path + (i,), self._decode())
+                else:
+                    yield from self._parse(path + (i,))
+                i += 1
+                if self._peek() == ",":
+                    self._pos += 1
+                    continue
+                self._expect("]")
+                break
+        yield ("end_array", path, None)
+
+    def _skip_value(self) -> None:
+        """Hopp over en verdi. Lister dekodes element for element og kastes."""
+        tegn = self._peek()
+        if tegn == "{":
+            self._pos += 1
+            if self._peek() == "}":
+                self._pos += 1
+                return
+            while True:
+                self._peek()
+                self._decode()
+                self._expect(":")
+                self._skip_value()
+                if self._peek() == ",":
+                    self._pos += 1
+                    continue
+                self._expect("}")
+                return
+        elif tegn == "[":
+            self._pos += 1
+            if self._peek() == "]":
+                self._pos += 1
+                return
+            while True:
+                self._peek()
+                self._decode()
+                if self._peek() == ",":
+                    self._pos += 1
+                    continue
+                self._expect("]")
+                return
+        else:
+            self._decode()
+
+
+def _matches(pattern: tuple, path: tuple) -> bool:
+    for p, k in zip(pattern, path):
+        if p == "*" or (p is int and type(k) is int):
+            continue
+        if p != k or type(p) is not type(k):
+            return False
+    return True
+
+
+def iter_events(
+    raw: BinaryIO,
+    walk: list[tuple] = (),
+    skip: list[tuple] = (),
+    limit: int | None = None,
+    lines: bool = False,
+) -> Iterator[tuple[str, tuple, object]]:
+    """Strøm hendelser fra en binær filstrøm (se modul-docstring). lines=True for NDJSON."""
+    return iter(JsonEventReader(raw, walk=walk, skip=skip, limit=limit, lines=lines))
+
+
+# --- Rask skanning ---
+
+_SKANN_BIT = 8 * CHUNK_SIZE
+_KOLON = re.compile(r"[ \t\r]*(:)?[ \t\r]*")
+
+
+def scan_records(raw: BinaryIO, keys: list[str], limit: int | None = None) -> Iterator[dict]:
+    """
+    Hent verdiene til keys fra hver NDJSON-linje uten å parse resten av
+    linjen, og gi én ordbok per linje. Nøklene finnes med bytes.find, så
+    tidsseriene hoppes over omtrent like fort som filen leses.
+
+    Et nøkkelnavn i anførselstegn fulgt av ':' kan ikke stå inne i en
+    JSON-streng, der anførselstegn er escapet, så hvert treff er en nøkkel.
+    Nøklene må derfor være unike i hele posten, som climateName, metadata,
+    warnings og varmetapstallPerSone i et BEMIFY-resultat. Første
+    forekomst i en linje brukes.
+    """
+    mønstre = {json.dumps(k, ensure_ascii=False).encode("utf-8"): k for k in keys}
+    lengst = max(map(len, mønstre))
+    decoder = json.JSONDecoder()
+    buf, base, eof = b"", 0, False
+    pos = linje_start = 0   # Absolutte posisjoner; buf[0] er base
+    neste: dict = {}        # Neste treff per mønster, gyldig så lenge det er >= pos
+    record: dict = {}
+
+    def fyll() -> bool:
+        nonlocal buf, base, eof
+        size = _SKANN_BIT if limit is None else min(_SKANN_BIT, limit - (base + len(buf)))
+        data = raw.read(size) if size > 0 and not eof else b""
+        if not data:
+            eof = True
+            return False
+        buf = buf[pos - base:] + data
+        base = pos
+        for m in [m for m, i in neste.items() if i is None]:
+            del neste[m]
+        return True
+
+    while True:
+        for m in (b"\n", *mønstre):
+            if m not in neste or neste[m] is not None and neste[m] < pos:
+                i = buf.find(m, pos - base)
+                neste[m] = base + i if i >= 0 else None
+        treff = [(i, m) for m, i in neste.items() if i is not None]
+        if not treff:
+            # Et mønster kan være delt mellom bufferen og neste bit
+            pos = max(pos, base + len(buf) - lengst + 1)
+            if not fyll():
+                break
+            continue
+
+        i, m = min(treff)
+        if m == b"\n":
+            if record or i - linje_start > 2:
+                yield record
+            record = {}
+            pos = linje_start = i + 1
+            continue
+
+        # Verdien etter nøkkelen; les mer så lenge den er ufullstendig
+        pos = i
+        while True:
+            tekst = buf[i + len(m) - base:].decode("utf-8", errors="replace")
+            kolon = _KOLON.match(tekst)
+            if kolon.end() == len(tekst):
+                verdi = slutt = None
+            elif kolon.group(1) is None:
+                break  # En strengverdi, ikke en nøkkel
+            else:
+                try:
+                    verdi, slutt = decoder.raw_decode(tekst, kolon.end())
+                except json.JSONDecodeError:
+                    verdi = slutt = None
+            # Et tall helt i slutten av bufferen kan være avkortet
+            if (slutt is None or slutt == len(tekst)) and fyll():
+                continue
+            if slutt is not None and mønstre[m] not in record:
+                record[mønstre[m]] = verdi
+            break
+        pos = i + len(m)
+        if kolon.group(1) is not None and slutt is not None:
+            pos += len(tekst[:slutt].encode("utf-8"))
+
+    if record or base + len(buf) - linje_start > 2:
+        yield record
+
+
+# --- Komprimering ---
+
+_MAGI = {b"\x1f\x8b": "gzip", b"\x28\xb5\x2f\xfd": "zstd"}
+_ENDELSER = {".gz": "gzip", ".zst": "zstd"}
+
+
+def detect_compression(filepath: Path) -> str | None:
+    """"gzip", "zstd" eller None (ukomprimert), fra de første bytene i filen."""
+    with open(filepath, "rb") as f:
+        start = f.read(4)
+    for magi, codec in _MAGI.items():
+        if start.startswith(magi):
+            return codec
+    return None
+
+
+def compression_for_suffix(filepath: Path) -> str | None:
+    """Komprimeringen en ny fil skal skrives med, fra endelsen (.gz, .zst)."""
+    return _ENDELSER.get(Path(filepath).suffix.lower())
+
+
+def _zstd():
+    if zstandard is None:
+        raise RuntimeError("zstandard ikke installert. Kjør: pip install zstandard")
+    return zstandard
+
+
+def open_result(filepath: Path) -> BinaryIO:
+    """
+    Åpne en resultatfil for lesing som binær strøm. gzip og zstd
+    dekomprimeres strømmende; seek fremover dekomprimerer og kaster det
+    som hoppes over, så posisjoner er alltid i den ukomprimerte teksten.
+    """
+    codec = detect_compression(filepath)
+    if codec == "gzip":
+        return gzip.open(filepath, "rb")
+    if codec == "zstd":
+        return _zstd().ZstdDecompressor().stream_reader(open(filepath, "rb"), read_across_frames=True)
+    return open(filepath, "rb")
+
+
+def member_writer(ut: BinaryIO, codec: str | None, level: int | None = None):
+    """
+    Kontekst som skriver ett gzip-medlem eller én zstd-ramme til ut (eller
+    rett til ut uten komprimering). ut lukkes ikke. Flere medlemmer etter
+    hverandre leses som én strøm av open_result.
+    """
+    if codec == "gzip":
+        return gzip.GzipFile(fileobj=ut, mode="wb", compresslevel=level or 6, mtime=0)
+    if codec == "zstd":
+        return _zstd().ZstdCompressor(level=level or 3).stream_writer(ut, closefd=False)
+    return nullcontext(ut)
+
+
+def iter_members(filepath: Path, codec: str) -> Iterator[tuple[int, list[bytes], bool]]:
+    """
+    Gå gjennom gzip-medlemmene eller zstd-rammene i en komprimert fil. Gir
+    (slutt, hoder, åpen): posisjonen i filen der medlemmet slutter, de
+    første 4096 bytene av hver linje som avsluttes i medlemmet, og om en
+    linje fortsatt er åpen. Et ufullstendig siste medlem (avbrutt skriving)
+    tas ikke med.
+    """
+    pos = 0
+    head, i_linje = b"", False
+    with open(filepath, "rb") as f:
+        data = f.read(CHUNK_SIZE)
+        while data:
+            d = zlib.decompressobj(31) if codec == "gzip" else _zstd().ZstdDecompressor().decompressobj()
+            hoder = []
+            while True:
+                try:
+                    tekst = d.decompress(data)
+                except (zlib.error, ValueError, getattr(zstandard, "ZstdError", ValueError)):
+                    return
+                for k, del_ in enumerate(tekst.split(b"\n")):
+                    if k:
+                        hoder.append(head)
+                        head, i_linje = b"", False
+                    if del_:
+                        head += del_[:4096 - len(head)]
+                        i_linje = True
+                if d.eof:
+                    rest = d.unused_data
+                    pos += len(data) - len(rest)
+                    data = rest or f.read(CHUNK_SIZE)
+                    yield (pos, hoder, i_linje)
+                    break
+                pos += len(data)
+                data = f.read(CHUNK_SIZE)
+                if not data:
+                    return
+
+
+def find_line_start(raw: BinaryIO, offset: int) -> int:
+    """Finn første linjestart på eller etter offset (uten å lese hele linjer)."""
+    if offset <= 0:
+        return 0
+    raw.seek(offset - 1)
+    pos = offset - 1
+    while True:
+        block = raw.read(CHUNK_SIZE)
+        if not block:
+            return pos
+        i = block.find(b"\n")
+        if i >= 0:
+            return pos + i + 1
+        pos += len(block)
+
+
+def split_line_ranges(filepath: Path, parts: int) -> list[tuple[int, int]]:
+    """Del filen i omtrent like store byte-områder som følger linjeskift."""
+    size = filepath.stat().st_size
+    bounds = [0]
+    with open(filepath, "rb") as f:
+        for k in range(1, parts):
+            start = find_line_start(f, max(size * k // parts, bounds[-1]))
+            if start > bounds[-1]:
+                bounds.append(start)
+    if size > bounds[-1]:
+        bounds.append(size)
+    return list(zip(bounds, bounds[1:]))
+
+
+# Starten av en NDJSON-linje fra runnerne: {"climateName":"...",
+_HODE_KLIMA = re.compile(rb'\s*\{\s*"climateName"\s*:\s*("(?:[^"\\]|\\.)*")')
+
+
+def iter_lines(raw: BinaryIO, head_size: int = 4096) -> Iterator[tuple[int, int, bytes, bool]]:
+    """
+    Gå gjennom linjene i en fil uten å lese hele linjer inn i minnet.
+    Gir (offset, lengde, hode, komplett) der hode er de første head_size
+    bytene og komplett er False for en siste linje uten linjeskift.
+    """
+    offset = raw.tell()
+    start = offset
+    head = b""
+    while True:
+        block = raw.read(CHUNK_SIZE)
+        if not block:
+            break
+        i = 0
+        while True:
+            j = block.find(b"\n", i)
+            if len(head) < head_size:
+                stopp = len(block) if j < 0 else j
+                head += block[i:min(stopp, i + head_size - len(head))]
+            if j < 0:
+                break
+            end = offset + j + 1
+            yield (start, end - start, head, True)
+            start, head, i = end, b"", j + 1
+        offset += len(block)
+    if offset > start:
+        yield (start, offset - start, head, False)
+
+
+def climate_name_from_head(head: bytes) -> str | None:
+    """Les climateName fra starten av en NDJSON-linje (None hvis den mangler)."""
+    m = _HODE_KLIMA.match(head)
+    if not m:
+        return None
+    try:
+        return json.loads(m.group(1))
+    except ValueError:
+        return None
+
+
+INDEX_FORMAT = "bemify-ndjson-index"
+INDEX_VERSION = 1
+
+
+def index_path(filepath: Path) -> Path:
+    """Indeksfilen ved siden av NDJSON-filen: results.ndjson -> results.ndjson.idx.json."""
+    return filepath.with_name(filepath.name + ".idx.json")
+
+
+def build_line_index(filepath: Path) -> list[dict]:
+    """
+    Finn alle linjene i én gjennomgang uten JSON-parsing. Gir
+    [{"index", "climateName", "offset", "length"}]; tomme linjer telles ikke.
+    """
+    with open_result(filepath) as f:
+        linjer = [(offset, lengde, hode) for offset, lengde, hode, _ in iter_lines(f) if hode.strip()]
+    return [
+        {"index": i, "climateName": climate_name_from_head(hode), "offset": offset, "length": lengde}
+        for i, (offset, lengde, hode) in enumerate(linjer)
+    ]
+
+
+def line_index(filepath: Path, save: bool = True) -> list[dict]:
+    """
+    Byte-indeks for linjene i en NDJSON-fil (se build_line_index). Leses fra
+    <fil>.idx.json når størrelse og mtime stemmer med filen; ellers bygges
+    den på nytt og lagres (hvis mappen er skrivbar).
+    """
+    filepath = Path(filepath)
+    stat = filepath.stat()
+    sti = index_path(filepath)
+    try:
+        with open(sti, "r", encoding="utf-8") as f:
+            indeks = json.load(f)
+        if (indeks.get("format") == INDEX_FORMAT and indeks.get("version") == INDEX_VERSION
+                and indeks["source"]["size"] == stat.st_size and indeks["source"]["mtime"] == stat.st_mtime):
+            return indeks["lines"]
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    linjer = build_line_index(filepath)
+    if save:
+        indeks = {
+            "format": INDEX_FORMAT,
+            "version": INDEX_VERSION,
+            "source": {"size": stat.st_size, "mtime": stat.st_mtime},
+            "lines": linjer,
+        }
+        try:
+            fd, tmp = tempfile.mkstemp(dir=sti.parent, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(indeks, f, ensure_ascii=False)
+            os.replace(tmp, sti)
+        except OSError:
+            pass
+    return linjer
+
+
+def find_line(lines: list[dict], simulation: int | str) -> dict:
+    """Finn linjen for en simulering etter indeks (negativ teller bakfra) eller klimanavn."""
+    if isinstance(simulation, str):
+        for line in lines:
+            if line["climateName"] == simulation:
+                return line
+        raise KeyError(f"Fant ikke simuleringen '{simulation}'")
+    if not -len(lines) <= simulation < len(lines):
+        raise IndexError(f"Simulering {simulation} finnes ikke ({len(lines)} i filen)")
+    return lines[simulation]
+
+
+def iter_simulations(
+    raw: BinaryIO,
+    default_name: str = "Ukjent",
+    solar: bool = False,
+    limit: int | None = None,
+    lines: bool = False,
+    zones: set[str] | None = None,
+) -> Iterator[tuple[str, object]]:
+    """
+    Normaliser NDJSON, CLI-, batch- og GUI-format til hendelser per simulering.
+    limit begrenser lesingen til så mange bytes fra gjeldende posisjon
+    (f.eks. én NDJSON-linje). lines=True når strømmen er NDJSON. Med zones
+    hoppes tidsstegene i de andre sonene over (ikke i GUI-format, der
+    sone-ID-en står inne i sonen), og de gir ingen step- eller zone_end-hendelser.
+
+    Hendelser (hendelse, data):
+        start     indeks for simuleringen i filen
+        climate   klimanavn (default_name for CLI- og GUI-format)
+        step      (sone, tidssteg, StepData)
+        zone_end  (sone, sone-ID) - sone-ID kan avvike fra sone i GUI-format
+        solar     (tidssteg, element i solcelleProduction), kun med solar=True
+        value     (nøkkel, verdi) for øvrige felt i resultatet
+        end       indeks for simuleringen
+    """
+    walk = STEG_STIER + (SOLCELLE_STIER if solar else [])
+    skip = [] if solar else [SOLCELLE_STI, ("solcelleProduction",), ("results", int, "result", "solcelleProduction")]
+    if zones is not None:
+        # Stiene med sone-ID før tidssteget: NDJSON, CLI og batchSimulate
+        per_sone = STEG_STIER[:3]
+        walk = [p[:-2] + (zone, "*") for p in per_sone for zone in zones] + walk[3:]
+        skip = skip + [p[:-1] for p in per_sone]
+    index = -1
+    open_sim = False
+    zone_ids = {}
+
+    for event, path, value in iter_events(raw, walk=walk, skip=skip, limit=limit, lines=lines):
+        if not path:
+            if event in ("end_map", "end_array") and open_sim:
+                open_sim = False
+                yield ("end", index)
+            continue
+
+        # Finn stien relativt til resultatobjektet for formatet
+        if path[0] == "results":
+            if len(path) <= 2:
+                if event == "end_map" and open_sim:
+                    open_sim = False
+                    yield ("end", index)
+                continue
+            rest = path[2:]
+        elif type(path[0]) is int:
+            rest = None  # GUI-format: én sone per listeelement
+        elif path[0] in _RECORD_KEYS:
+            rest = path
+        else:
+            continue
+
+        if not open_sim:
+            open_sim = True
+            index += 1
+            zone_ids = {}
+            yield ("start", index)
+            if rest is None or rest[0] != "climateName" and rest[0] != "result":
+                yield ("climate", default_name)
+
+        if rest is None:
+            zone = f"sone_{path[0]}"
+            if len(path) == 2 and path[1] == "id" and event == "value":
+                zone_ids[zone] = value
+            elif len(path) == 3 and event == "value":
+                yield ("step", (zone, path[2], value))
+            elif len(path) == 1 and event == "end_map":
+                yield ("zone_end", (zone, zone_ids.get(zone, zone)))
+            continue
+
+        if rest == ("climateName",):
+            yield ("climate", value)
+            continue
+        if rest[0] == "result":
+            rest = rest[1:]
+            if not rest:
+                continue
+        if rest[0] == "stepResultsPerSone":
+            if len(rest) == 3 and event == "value":
+                yield ("step", (rest[1], rest[2], value))
+            elif len(rest) == 2 and event == "end_array":
+                yield ("zone_end", (rest[1], rest[1]))
+        elif rest[0] == "solcelleProduction":
+            if len(rest) == 2 and event == "value":
+                yield ("solar", (rest[1], value))
+        elif len(rest) == 1 and event == "value":
+            yield ("value", (rest[0], value))
@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""
+BEMIFY Result Store - Kolonnelager for simuleringsresultater
+
+Konverterer BEMIFY-resultater (NDJSON fra batchSimulateToNdjson, samt CLI-
+og GUI-JSON) til et kolonnelager: én .npy-fil per (klimasted, sone) med én
+sammenhengende rad per feltsti, og en liten manifest.json. Filene kan
+åpnes med numpy.load(..., mmap_mode="r"), så senere spørringer leser kun
+kolonnene de trenger.
+
+Kommandoen rewrite skriver en resultatfil på nytt, komprimert (gzip eller
+zstd, etter endelsen på den nye filen) og eventuelt kvantisert. Tallene
+byttes ut direkte i JSON-teksten, så filen leses og skrives strømmende.
+Bare desimaltall endres; heltall og strenger blir som før.
+
+    --decimals N  rund til N desimaler; absolutt feil <= 0.5 * 10^-N
+    --float32     korteste tekst som gir samme float32; relativ feil
+                  <= 2^-23 (ca. 1.2e-7) for |x| > 1.2e-38
+
+Bruk:
+    python bemify_result_store.py convert results.ndjson
+    python bemify_result_store.py convert results.ndjson -o results.bemstore --dtype float64
+    python bemify_result_store.py rewrite results.ndjson results.ndjson.zst --decimals 3
+
+    from bemify_result_store import ResultStore
+    store = ResultStore("results.bemstore")
+    t = store.column("Oslo", "sone_abc123", "inneklima/luftTemperatur")
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+import sys
+import time
+from contextlib import ExitStack
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:
+    print("Feil: numpy ikke installert. Kjør: pip install numpy")
+    sys.exit(1)
+
+from bemify_ndjson import CHUNK_SIZE, compression_for_suffix, iter_simulations, member_writer, open_result
+
+STORE_FORMAT = "bemify-columnar"
+STORE_VERSION = 1
+
+# Grupper i StepData som lagres som kolonner
+STEG_GRUPPER = ["effektBehov", "inneklima", "ventilasjon", "termiskKildeYtelse"]
+
+
+def flatten(verdi, prefix: str, navn: list, verdier: list) -> None:
+    """Flat ut numeriske blader til feltstier som 'gruppe/nøkkel/nøkkel'."""
+    if isinstance(verdi, dict):
+        for key, child in verdi.items():
+            flatten(child, f"{prefix}/{key}", navn, verdier)
+    elif verdi is None or (isinstance(verdi, (int, float)) and not isinstance(verdi, bool)):
+        navn.append(prefix)
+        verdier.append(verdi)
+
+
+class ColumnBuffer:
+    """Samler rader med flatede felt for én sone og bygger en (felt, steg)-array."""
+
+    def __init__(self, grupper: list[str] | None):
+        self.grupper = grupper
+        self.fields: list[str] = []
+        self._index: dict[str, int] = {}
+        self._rows: list[list] = []
+
+    def add(self, step: dict) -> None:
+        navn, verdier = [], []
+        if self.grupper is None:
+            for key, child in step.items():
+                flatten(child, key, navn, verdier)
+        else:
+            for gruppe in self.grupper:
+                if gruppe in step:
+                    flatten(step[gruppe], gruppe, navn, verdier)
+
+        if navn == self.fields:
+            self._rows.append(verdier)
+            return
+
+        # Nye eller manglende felt: nye felt legges til bakerst
+        for name in navn:
+            if name not in self._index:
+                self._index[name] = len(self.fields)
+                self.fields.append(name)
+        row = [None] * len(self.fields)
+        for name, v in zip(navn, verdier):
+            row[self._index[name]] = v
+        self._rows.append(row)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def to_array(self, dtype) -> np.ndarray:
+        """Returner array med shape (felt, tidssteg); manglende verdier blir NaN."""
+        n = len(self.fields)
+        rows = [r if len(r) == n else r + [None] * (n - len(r)) for r in self._rows]
+        data = np.array(rows, dtype=np.float64).reshape(len(rows), n)
+        return np.ascontiguousarray(data.T, dtype=dtype)
+
+
+def convert(source: Path, store_dir: Path, dtype: str = "float32", grupper: list[str] = STEG_GRUPPER) -> dict:
+    """Konverter en resultatfil til kolonnelager og returner manifestet."""
+    data_dir = store_dir / "data"
+    data_dir.mkdir(parents=True, exist_ok=True)
+    stat = source.stat()
+
+    simulations = []
+    sim = zones = solar = None
+
+    with open_result(source) as f:
+        for event, data in iter_simulations(f, default_name=source.stem, solar=True):
+            if event == "start":
+                sim = {"index": data, "climateName": None, "zones": []}
+                zones = {}
+                solar = ColumnBuffer(None)
+            elif event == "climate":
+                sim["climateName"] = data
+            elif event == "step":
+                zone, _, step = data
+                buf = zones.get(zone)
+                if buf is None:
+                    buf = zones[zone] = ColumnBuffer(grupper)
+                buf.add(step)
+            elif event == "zone_end":
+                zone, zone_id = data
+                buf = zones.pop(zone, None) or ColumnBuffer(grupper)
+                sim["zones"].append(_write_array(data_dir, sim, len(sim["zones"]), buf, dtype, zone_id))
+            elif event == "solar":
+                solar.add(data[1])
+            elif event == "value":
+                key, value = data
+                if key == "warnings":
+                    sim["n_warnings"] = len(value or [])
+                elif key in ("metadata", "varmetapstallPerSone"):
+                    sim[key] = value
+            elif event == "end":
+                if len(solar):
+                    sim["solcelleProduction"] = _write_array(data_dir, sim, "solcelle", solar, dtype)
+                simulations.append(sim)
+                print(f"  {sim['climateName']}: {len(sim['zones'])} sone(r)")
+
+    manifest = {
+        "format": STORE_FORMAT,
+        "version": STORE_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "source": {"path": str(source), "size": stat.st_size, "mtime": stat.st_mtime},
+        "dtype": dtype,
+        "layout": "(felt, tidssteg), C-ordnet .npy",
+        "simulations": simulations,
+    }
+    # Manifestet skrives sist, så et lager uten manifest er ufullstendig
+    with open(store_dir / "manifest.json", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    return manifest
+
+
+def _write_array(data_dir: Path, sim: dict, part, buf: ColumnBuffer, dtype: str, zone_id: str | None = None) -> dict:
+    name = f"{sim['index']:04d}_{part:03d}.npy" if isinstance(part, int) else f"{sim['index']:04d}_{part}.npy"
+    array = buf.to_array(dtype)
+    np.save(data_dir / name, array)
+    entry = {"file": f"data/{name}", "steps": array.shape[1], "fields": buf.fields}
+    if zone_id is not None:
+        entry = {"id": zone_id, **entry}
+    return entry
+
+
+class ResultStore:
+    """Leser for kolonnelager. Kolonner returneres som memmap-visninger."""
+
+    def __init__(self, store_dir: Path | str):
+        self.path = Path(store_dir)
+        with open(self.path / "manifest.json", "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("format") != STORE_FORMAT:
+            raise ValueError(f"Ikke et BEMIFY-kolonnelager: {self.path}")
+        self.simulations = self.manifest["simulations"]
+
+    def is_current(self, source: Path) -> bool:
+        """Sjekk om lageret er bygget fra nåværende versjon av kildefilen."""
+        src = self.manifest["source"]
+        if src is None:
+            return False  # Skrevet av en runner, ikke konvertert fra en fil
+        stat = source.stat()
+        return src["size"] == stat.st_size and src["mtime"] == stat.st_mtime
+
+    def simulation(self, sim: int | str) -> dict:
+        """Finn simulering etter indeks eller klimanavn."""
+        if isinstance(sim, int):
+            return self.simulations[sim]
+        for s in self.simulations:
+            if s["climateName"] == sim:
+                return s
+        raise KeyError(f"Finner ikke simulering: {sim}")
+
+    def zone(self, sim: int | str, zone_id: str) -> dict:
+        for z in self.simulation(sim)["zones"]:
+            if z["id"] == zone_id:
+                return z
+        raise KeyError(f"Finner ikke sone: {zone_id}")
+
+    def array(self, entry: dict) -> np.ndarray:
+        """Åpne hele (felt, tidssteg)-arrayen for en sone som memmap."""
+        return np.load(self.path / entry["file"], mmap_mode="r")
+
+    def column(self, sim: int | str, zone_id: str, field: str) -> np.ndarray:
+        """Returner én kolonne (tidsserie) uten å lese resten av filen."""
+        entry = self.zone(sim, zone_id)
+        return self.array(entry)[entry["fields"].index(field)]
+
+
+# En JSON-streng (gruppe 1 er tom hvis den ikke er avsluttet) eller et tall
+_STRENG_ELLER_TALL = re.compile(rb'"(?:[^"\\]|\\.)*(?:(")|\\?\Z)|\d+(?:\.\d+)?(?:[eE][+-]?\d+)?')
+# Tegn på slutten av en bit som kan være starten av et tall som fortsetter i neste bit
+_TALLHALE = re.compile(rb"[0-9.eE+-]*\Z")
+
+
+def _desimaler(n: int):
+    def fmt(tekst: bytes) -> bytes:
+        verdi = float(tekst)
+        if abs(verdi) >= 1e15:
+            return tekst  # Store tall skrevet med eksponent beholdes
+        ut = f"{verdi:.{n}f}"
+        if "." in ut:
+            ut = ut.rstrip("0").rstrip(".")
+        return ut.encode("ascii")
+    return fmt
+
+
+def _float32(tekst: bytes) -> bytes:
+    with np.errstate(over="ignore"):  # Utenfor float32 beholdes teksten
+        verdi = np.float32(float(tekst))
+    return str(verdi).encode("ascii") if math.isfinite(verdi) else tekst
+
+
+class _Kvantiserer:
+    """Bytter ut desimaltall i JSON-tekst bit for bit; et tall eller en streng som deles mellom bitene holdes igjen."""
+
+    def __init__(self, fmt):
+        self.fmt = fmt
+        self.rest = b""
+
+    def __call__(self, data: bytes, slutt: bool) -> bytes:
+        buf = self.rest + data
+        kutt = len(buf) if slutt else _TALLHALE.search(buf, max(0, len(buf) - 64)).start()
+        self.rest = buf[kutt:]
+
+        def erstatt(m: re.Match) -> bytes:
+            tekst = m.group()
+            if tekst[:1] == b'"':
+                if m.group(1) is None and not slutt:
+                    # Strengen fortsetter i neste bit
+                    self.rest = buf[m.start():]
+                    return b""
+                return tekst
+            if b"." in tekst or b"e" in tekst or b"E" in tekst:
+                return self.fmt(tekst)
+            return tekst
+
+        return _STRENG_ELLER_TALL.sub(erstatt, buf[:kutt])
+
+
+def rewrite(
+    source: Path,
+    target: Path,
+    decimals: int | None = None,
+    float32: bool = False,
+    level: int | None = None,
+) -> dict:
+    """
+    Skriv en NDJSON-fil på nytt strømmende. target.gz/.zst gir komprimering
+    med ett medlem (ramme) per linje; decimals/float32 gir kvantisering
+    (se modul-docstring). Returnerer antall linjer og størrelser i bytes.
+    """
+    codec = compression_for_suffix(target)
+    fmt = _desimaler(decimals) if decimals is not None else _float32 if float32 else None
+    tmp = target.with_name(target.name + ".tmp")
+    linjer = 0
+    try:
+        with open_result(source) as src, open(tmp, "wb") as ut, ExitStack() as linje:
+            w = None
+            kvant = _Kvantiserer(fmt) if fmt else None
+            while True:
+                bit = src.read(CHUNK_SIZE)
+                if not bit:
+                    break
+                deler = bit.split(b"\n")
+                for k, del_ in enumerate(deler):
+                    ny_linje = k < len(deler) - 1
+                    if w is None and (del_ or ny_linje):
+                        w = linje.enter_context(member_writer(ut, codec, level))
+                    if kvant:
+                        del_ = kvant(del_, ny_linje)
+                    if del_:
+                        w.write(del_)
+                    if ny_linje:
+                        w.write(b"\n")
+                        linje.close()
+                        w = None
+                        linjer += 1
+            if w is not None:
+                if kvant:
+                    w.write(kvant(b"", True))
+                linjer += 1
+        os.replace(tmp, target)
+    finally:
+        tmp.unlink(missing_ok=True)
+    return {"lines": linjer, "bytes_in": source.stat().st_size, "bytes_out": target.stat().st_size}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kolonnelager for BEMIFY-resultater")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_convert = sub.add_parser("convert", help="Konverter NDJSON/JSON til kolonnelager")
+    p_convert.add_argument("source", type=Path, help="Resultatfil (.ndjson eller .json)")
+    p_convert.add_argument("-o", "--output", type=Path, help="Mappe for lageret (standard: <fil>.bemstore)")
+    p_convert.add_argument("--dtype", choices=["float32", "float64"], default="float32",
+                           help="Datatype for kolonnene (standard: float32)")
+
+    p_rewrite = sub.add_parser("rewrite", help="Skriv NDJSON på nytt, komprimert og/eller kvantisert")
+    p_rewrite.add_argument("source", type=Path, help="Resultatfil (.ndjson, .ndjson.gz eller .ndjson.zst)")
+    p_rewrite.add_argument("output", type=Path, help="Ny fil; endelsen .gz eller .zst gir komprimering")
+    kvant = p_rewrite.add_mutually_exclusive_group()
+    kvant.add_argument("--decimals", type=int, metavar="N",
+                       help="Rund desimaltall til N desimaler (absolutt feil <= 0.5 * 10^-N)")
+    kvant.add_argument("--float32", action="store_true",
+                       help="Skriv desimaltall med float32-presisjon (relativ feil <= 2^-23)")
+    p_rewrite.add_argument("--level", type=int,
+                           help="Komprimeringsnivå (gzip 1-9, standard 6; zstd 1-22, standard 3)")
+
+    args = parser.parse_args()
+
+    if args.command == "rewrite":
+        if not args.source.exists():
+            print(f"Feil: Finner ikke {args.source}")
+            sys.exit(1)
+        if args.output.resolve() == args.source.resolve():
+            print("Feil: Ny fil må ha et annet navn enn kildefilen")
+            sys.exit(1)
+        if args.decimals is not None and args.decimals < 0:
+            print("Feil: --decimals må være 0 eller mer")
+            sys.exit(1)
+        print(f"Skriver {args.source} -> {args.output}")
+        start_tid = time.time()
+        try:
+            stats = rewrite(args.source, args.output, args.decimals, args.float32, args.level)
+        except RuntimeError as e:
+            print(f"Feil: {e}")
+            sys.exit(1)
+        print(f"\n{stats['lines']} linje(r), {stats['bytes_in'] / 1e6:.1f} MB -> {stats['bytes_out'] / 1e6:.1f} MB "
+              f"({stats['bytes_in'] / max(stats['bytes_out'], 1):.1f}x)")
+        print(f"Tid brukt: {time.time() - start_tid:.1f}s")
+
+    elif args.command == "convert":
+        if not args.source.exists():
+            print(f"Feil: Finner ikke {args.source}")
+            sys.exit(1)
+        store_dir = args.output or args.source.with_suffix(".bemstore")
+        print(f"Konverterer {args.source} -> {store_dir}")
+        start_tid = time.time()
+        manifest = convert(args.source, store_dir, args.dtype)
+        print(f"\n{len(manifest['simulations'])} simulering(er) lagret ({args.dtype})")
+        print(f"Tid brukt: {time.time() - start_tid:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,88 +5,1034 @@ BEMIFY Results Analyzer - Kompakt versjon
 Bruk:
     python bemify_results_analyzer.py results.ndjson
     python bemify_results_analyzer.py results.ndjson -o summary.csv
+    python bemify_results_analyzer.py results.ndjson --engine python
+    python bemify_results_analyzer.py results.ndjson --workers 8
+    python bemify_results_analyzer.py results.ndjson --rollup off
+    python bemify_results_analyzer.py results.ndjson --klima Bergen --klima Oslo
+    python bemify_results_analyzer.py results.bemstore
+    python bemify_results_analyzer.py results.ndjson --summary-only -o qa.csv
+    python bemify_results_analyzer.py results.ndjson --levert
+    python bemify_results_analyzer.py results.ndjson --last --topp 20 --varighet 101 -o summary.csv
+    python bemify_results_analyzer.py results.ndjson --follow -o summary.csv
+
+Med --summary-only leses bare climateName, metadata, warnings og
+varmetapstallPerSone; tidsseriene hoppes over uten å parses.
+
+Med --levert summeres også termiskKildeYtelse (beregningspunkt B/C) i
+samme gjennomgang: tilført, levert og tap per energibærer og kategori,
+og effektiv COP (levert/tilført) per energibærer.
+
+Med --last beregnes maks effekt, de høyeste timene og varighetskurver for
+samlet elektrisitetsbehov per klimasted og sone i samme gjennomgang, med
+fast minnebruk per serie (LoadProfile).
 """
 
 import argparse
-import json
+import heapq
+import math
+import operator
+import os
 import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import BinaryIO, Iterator
 
 try:
+    import numpy as np
     import pandas as pd
 except ImportError:
     print("Feil: pandas ikke installert. Kjør: pip install pandas")
     sys.exit(1)
 
-ENERGI_POSTER = [
-    "1a Romoppvarming", "1b Ventilasjonsvarme", "2 Varmtvann",
-    "3a Romkjøling", "3b Ventilasjonskjøling",
-    "4a Vifter", "4b Pumper", "5 Belysning", "6 Teknisk utstyr",
-]
+from bemify_ndjson import (
+    CHUNK_SIZE, SOLCELLE_STI, STEG_STI, detect_compression, find_line, iter_events, line_index, open_result, scan_records,
+    split_line_ranges,
+)
+from bemify_result_store import ResultStore
+from bemify_rollup import BYGG, BYGG_TOTAL, ENERGI_POSTER, START, Rollups
 
 TIMESTEP_HOURS = 0.25
+STEPS_PER_HOUR = round(1 / TIMESTEP_HOURS)
+KILDE_YTELSE = "termiskKildeYtelse"
+
+# Elektrisitet = tilført el til termiske kategorier + el-spesifikke poster
+EL_BÆRER = "1 Levert elektrisitet"
+EL_POSTER = ["4a Vifter", "4b Pumper", "5 Belysning", "6 Teknisk utstyr"]
+_EL_INDEKS = [ENERGI_POSTER.index(post) for post in EL_POSTER]
+
+# Varighet [timer] som vises i effekttabellen
+VARIGHET_TIMER = (100, 1000, 4380)
+
+SUMMARY_KEYS = ["climateName", "metadata", "warnings", "varmetapstallPerSone"]
+SUMMARY_COLUMNS = [
+    "Klimasted", "Simuleringstid [s]", "Tidssteg", "Advarsler", "Areal [m²]", "Varmetapstall [W/(m²K)]",
+]
+
+
+def _getter(keys: list[str]):
+    if len(keys) == 1:
+        key = keys[0]
+        return lambda d: (d[key],)
+    return operator.itemgetter(*keys)
+
+
+def _leaf(kilde: dict, path: tuple[str, str, str]) -> float:
+    value = kilde
+    for key in path:
+        value = value.get(key) if isinstance(value, dict) else None
+    return value if isinstance(value, (int, float)) else 0.0
+
+
+class LoadProfile:
+    """
+    Maks effekt, de top_n høyeste timene og varighetskurve for én
+    effektserie med fast minnebruk: en min-heap med top_n timesmiddel og et
+    logaritmisk histogram (som DDSketch) der hver bøtte har relativ bredde
+    2 * accuracy. Serien mates i biter med add og avsluttes med finish.
+    """
+
+    def __init__(self, top_n: int = 10, accuracy: float = 0.005):
+        self.top_n = top_n
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins = np.zeros(0, dtype=np.int64)
+        self.offset = 0     # Bøtteindeks for bins[0]
+        self.zero = 0       # Tidssteg med effekt <= 0
+        self.count = 0
+        self.peak_w = 0.0
+        self.peak_step = None
+        self.heap: list[tuple[float, int]] = []  # (timesmiddel [W], time)
+        self._carry = np.zeros(0)                # Tidssteg i en påbegynt time
+
+    def add(self, values_w) -> None:
+        values = np.nan_to_num(np.asarray(values_w, dtype=np.float64))
+        if not len(values):
+            return
+        i = int(values.argmax())
+        if self.peak_step is None or values[i] > self.peak_w:
+            self.peak_w, self.peak_step = float(values[i]), self.count + i
+        self._add_hours(values)
+        self._add_bins(values)
+        self.count += len(values)
+
+    def finish(self) -> "LoadProfile":
+        """Ta med en ufullstendig siste time."""
+        if len(self._carry):
+            self._push_hours(np.array([self._carry.mean()]), (self.count - len(self._carry)) // STEPS_PER_HOUR)
+            self._carry = np.zeros(0)
+        return self
+
+    def _add_hours(self, values: np.ndarray) -> None:
+        first_hour = (self.count - len(self._carry)) // STEPS_PER_HOUR
+        data = np.concatenate([self._carry, values])
+        full = len(data) - len(data) % STEPS_PER_HOUR
+        self._carry = data[full:]
+        self._push_hours(data[:full].reshape(-1, STEPS_PER_HOUR).mean(axis=1), first_hour)
+
+    def _push_hours(self, hours: np.ndarray, first_hour: int) -> None:
+        if self.top_n <= 0:
+            return
+        # Bare de top_n høyeste i biten kan komme inn i heapen
+        candidates = np.argpartition(hours, -self.top_n)[-self.top_n:] if len(hours) > self.top_n else range(len(hours))
+        for i in candidates:
+            item = (float(hours[i]), first_hour + int(i))
+            if len(self.heap) < self.top_n:
+                heapq.heappush(self.heap, item)
+            elif item > self.heap[0]:
+                heapq.heapreplace(self.heap, item)
+
+    def _add_bins(self, values: np.ndarray) -> None:
+        positive = values[values > 0]
+        self.zero += len(values) - len(positive)
+        if not len(positive):
+            return
+        k = np.ceil(np.log(positive) / self._log_gamma).astype(np.int64)
+        if not len(self.bins):
+            self.offset = int(k.min())
+        lo = min(int(k.min()), self.offset)
+        hi = max(int(k.max()), self.offset + len(self.bins) - 1)
+        if lo < self.offset or hi >= self.offset + len(self.bins):
+            bins = np.zeros(hi - lo + 1, dtype=np.int64)
+            bins[self.offset - lo:self.offset - lo + len(self.bins)] = self.bins
+            self.bins, self.offset = bins, lo
+        self.bins += np.bincount(k - self.offset, minlength=len(self.bins))
+
+    def quantile(self, q: float) -> float:
+        """Effekten [W] som andelen q av tidsstegene ligger under (relativ feil <= accuracy)."""
+        if not self.count:
+            return math.nan
+        rank = q * (self.count - 1)
+        if rank < self.zero:
+            return 0.0
+        k = int(np.searchsorted(np.cumsum(self.bins), rank - self.zero, side="right"))
+        k = min(k, len(self.bins) - 1)
+        return 2 * self.gamma ** (self.offset + k) / (self.gamma + 1)
+
+    def exceeded(self, hours: float) -> float:
+        """Effekten [W] som overskrides i hours timer av perioden."""
+        if hours <= 0 or not self.count:
+            return self.peak_w
+        return self.quantile(max(0.0, 1 - hours / (self.count * TIMESTEP_HOURS)))
+
+    def duration(self, points: int) -> tuple[np.ndarray, np.ndarray]:
+        """Varighetskurve med points punkter: timer fra 0 til hele perioden og effekt [W], synkende."""
+        hours = np.linspace(0, self.count * TIMESTEP_HOURS, points)
+        return hours, np.array([self.exceeded(h) for h in hours])
+
+    def top_hours(self) -> list[tuple[int, float]]:
+        """(time i året, timesmiddel [W]) for de høyeste timene, synkende."""
+        return [(hour, w) for w, hour in sorted(self.heap, reverse=True)]
+
+
+def _load_profiles(el_total, zones: dict, top_n: int) -> dict:
+    """LoadProfile for bygget (BYGG, sum over sonene per tidssteg) og hver sone."""
+    building = LoadProfile(top_n)
+    building.add(el_total)
+    return {BYGG: building.finish(), **zones}
+
+
+class CarrierSchema:
+    """
+    Fast kolonnerekkefølge for termiskKildeYtelse (energibærer/kategori/
+    størrelse), funnet fra tidsstegene og delt av alle simuleringene i en
+    fil. Nye stier legges til bakerst, så rader fra før bare mangler de
+    siste kolonnene.
+    """
+
+    def __init__(self):
+        self.fields: list[str] = []
+        self._paths: list[tuple[str, str, str]] = []
+        self._known: set = set()
+        self._segments: list = []   # (energibærer, kategori, getter) i kolonnerekkefølge
+        self._n_carriers = 0
+        self._n_categories: list = []
+        self._n_quantities: list = []
+
+    def flatten(self, kilde: dict) -> list:
+        """Verdiene i ett tidssteg i kolonnerekkefølge (nye stier oppdages underveis)."""
+        try:
+            # Samme antall nøkler på hvert nivå og ingen KeyError = samme skjema
+            if (len(kilde) == self._n_carriers
+                    and all(len(kilde[c]) == n for c, n in self._n_categories)
+                    and all(len(kilde[c][k]) == n for (c, k), n in self._n_quantities)):
+                values = []
+                for carrier, category, get in self._segments:
+                    values.extend(get(kilde[carrier][category]))
+                return values
+        except (KeyError, TypeError):
+            pass
+        return self._extend(kilde)
+
+    def _extend(self, kilde: dict) -> list:
+        changed = False
+        for carrier, categories in kilde.items():
+            for category, quantities in (categories.items() if isinstance(categories, dict) else ()):
+                for quantity in (quantities if isinstance(quantities, dict) else ()):
+                    path = (carrier, category, quantity)
+                    if path not in self._known:
+                        self._known.add(path)
+                        self._paths.append(path)
+                        self.fields.append("/".join(path))
+                        changed = True
+        if changed:
+            self._build()
+        return [_leaf(kilde, path) for path in self._paths]
+
+    def _build(self) -> None:
+        runs = []
+        for carrier, category, quantity in self._paths:
+            if runs and runs[-1][:2] == (carrier, category):
+                runs[-1][2].append(quantity)
+            else:
+                runs.append((carrier, category, [quantity]))
+        self._segments = [(c, k, _getter(q)) for c, k, q in runs]
+        categories, quantities = {}, Counter()
+        for carrier, category, _ in self._paths:
+            categories.setdefault(carrier, set()).add(category)
+            quantities[carrier, category] += 1
+        self._n_carriers = len(categories)
+        self._n_categories = [(c, len(k)) for c, k in categories.items()]
+        self._n_quantities = list(quantities.items())
+
+    def indices(self, carrier: str, quantity: str) -> list[int]:
+        """Kolonnene for én størrelse hos én energibærer, over alle kategorier."""
+        return [i for i, (c, _, q) in enumerate(self._paths) if c == carrier and q == quantity]
+
+
+class PythonAccumulator:
+    """Summerer effektBehov med rene Python-løkker (referansemotor)."""
+
+    def __init__(self, schema: CarrierSchema | None = None, top_n: int = 0):
+        self.sum_w = {post: 0.0 for post in ENERGI_POSTER}
+        self.total_w = []  # Sum av alle poster og soner per tidssteg
+        self.kilde_w = {}  # Går gjennom dictene direkte; schema brukes ikke
+        self.top_n = top_n
+        self.el_total = []
+        self.load = {}
+        self._zone_el = []
+
+    def add_step(self, i: int, effekt: dict) -> None:
+        total = 0.0
+        for post in ENERGI_POSTER:
+            power_w = effekt.get(post, 0.0)
+            self.sum_w[post] += power_w
+            total += power_w
+        if i < len(self.total_w):
+            self.total_w[i] += total
+        else:
+            self.total_w.append(total)
+        if self.top_n:
+            self._zone_el.append(sum(effekt.get(post, 0.0) for post in EL_POSTER))
+
+    def add_kilde(self, kilde: dict) -> None:
+        for carrier, categories in kilde.items():
+            for category, quantities in categories.items():
+                for quantity, power_w in quantities.items():
+                    field = f"{carrier}/{category}/{quantity}"
+                    self.kilde_w[field] = self.kilde_w.get(field, 0.0) + (power_w or 0.0)
+                    if self.top_n and carrier == EL_BÆRER and quantity == "input_W":
+                        self._zone_el[-1] += power_w or 0.0
+
+    def end_zone(self, zone: str | None = None) -> None:
+        if not self.top_n:
+            return
+        profile = LoadProfile(self.top_n)
+        profile.add(self._zone_el)
+        self.load[zone] = profile.finish()
+        for i, power_w in enumerate(self._zone_el):
+            if i < len(self.el_total):
+                self.el_total[i] += power_w
+            else:
+                self.el_total.append(power_w)
+        self._zone_el = []
+
+    def result(self) -> tuple[dict, float]:
+        """Returner årlig energi per post [kWh] og maks samlet effekt [kW]."""
+        energy_kwh = {post: w * TIMESTEP_HOURS / 1000 for post, w in self.sum_w.items()}
+        return energy_kwh, max(self.total_w, default=0.0) / 1000
+
+    def delivered(self) -> dict:
+        """Årlig energi per energibærer/kategori/størrelse i termiskKildeYtelse [kWh]."""
+        return {field: w * TIMESTEP_HOURS / 1000 for field, w in self.kilde_w.items()}
+
+    def load_profiles(self) -> dict:
+        return _load_profiles(self.el_total, self.load, self.top_n)
+
+
+class NumpyAccumulator:
+    """
+    Samler effektBehov per sone i float64-arrays og reduserer med NumPy.
+    termiskKildeYtelse flates ut etter et felles CarrierSchema og reduseres
+    på samme måte.
+    """
+
+    _get_posts = operator.itemgetter(*ENERGI_POSTER)
+
+    def __init__(self, schema: CarrierSchema | None = None, top_n: int = 0):
+        self.sum_w = np.zeros(len(ENERGI_POSTER))
+        self.total_w = np.zeros(0)
+        self._rows = []
+        self.schema = schema or CarrierSchema()
+        self.kilde_w = np.zeros(0)
+        self._kilde_rows = []
+        self.top_n = top_n
+        self.el_total = np.zeros(0)
+        self.load = {}
+
+    def add_step(self, i: int, effekt: dict) -> None:
+        try:
+            self._rows.append(self._get_posts(effekt))
+        except KeyError:
+            self._rows.append(tuple(effekt.get(post, 0.0) for post in ENERGI_POSTER))
+
+    def add_kilde(self, kilde: dict) -> None:
+        self._kilde_rows.append(self.schema.flatten(kilde))
+
+    def end_zone(self, zone: str | None = None) -> None:
+        kilde = self._end_kilde() if self._kilde_rows else None
+        if not self._rows:
+            return
+        # Én sammenhengende float64-array per post: shape (poster, tidssteg)
+        columns = np.ascontiguousarray(np.array(self._rows, dtype=np.float64).T)
+        self._rows = []
+        self.sum_w += columns.sum(axis=1)
+        zone_total = columns.sum(axis=0)
+        if len(zone_total) > len(self.total_w):
+            self.total_w = np.pad(self.total_w, (0, len(zone_total) - len(self.total_w)))
+        self.total_w[:len(zone_total)] += zone_total
+
+        if self.top_n:
+            el = columns[_EL_INDEKS].sum(axis=0)
+            if kilde is not None:
+                el += kilde[:, self.schema.indices(EL_BÆRER, "input_W")].sum(axis=1)
+            profile = LoadProfile(self.top_n)
+            profile.add(el)
+            self.load[zone] = profile.finish()
+            if len(el) > len(self.el_total):
+                self.el_total = np.pad(self.el_total, (0, len(el) - len(self.el_total)))
+            self.el_total[:len(el)] += el
+
+    def _end_kilde(self) -> np.ndarray:
+        rows, self._kilde_rows = self._kilde_rows, []
+        n = len(self.schema.fields)
+        if len(rows[0]) < n:
+            # Skjemaet vokste i denne sonen; eldre rader mangler kolonnene bakerst
+            rows = [row + [0.0] * (n - len(row)) for row in rows]
+        # Shape (tidssteg, felt); null/None blir NaN og teller som 0
+        data = np.nan_to_num(np.array(rows, dtype=np.float64).reshape(len(rows), n), copy=False)
+        if n > len(self.kilde_w):
+            self.kilde_w = np.pad(self.kilde_w, (0, n - len(self.kilde_w)))
+        self.kilde_w[:n] += data.sum(axis=0)
+        return data
+
+    def result(self) -> tuple[dict, float]:
+        """Returner årlig energi per post [kWh] og maks samlet effekt [kW]."""
+        energy_kwh = {post: float(w) * TIMESTEP_HOURS / 1000 for post, w in zip(ENERGI_POSTER, self.sum_w)}
+        peak_w = float(self.total_w.max()) if len(self.total_w) else 0.0
+        return energy_kwh, peak_w / 1000
+
+    def delivered(self) -> dict:
+        """Årlig energi per energibærer/kategori/størrelse i termiskKildeYtelse [kWh]."""
+        return {field: float(w) * TIMESTEP_HOURS / 1000 for field, w in zip(self.schema.fields, self.kilde_w)}
+
+    def load_profiles(self) -> dict:
+        return _load_profiles(self.el_total, self.load, self.top_n)
+
+
+ENGINES = {"numpy": NumpyAccumulator, "python": PythonAccumulator}
+
+
+def iter_rows(
+    raw: BinaryIO,
+    engine: str = "numpy",
+    limit: int | None = None,
+    delivered: bool = False,
+    top_n: int = 0,
+) -> Iterator[dict]:
+    """
+    Strøm én oppsummeringsrad per simulering fra en binær NDJSON-strøm. Med
+    delivered får raden også kolonnene fra delivered_columns, og med top_n
+    en "Last"-kolonne med LoadProfile for bygget og hver sone.
+    """
+    schema = CarrierSchema()
+    kilde = delivered or top_n > 0
+    accumulator = None
+    for event, path, value in iter_events(raw, walk=[STEG_STI], skip=[SOLCELLE_STI], limit=limit, lines=True):
+        # Tidssteg og soneslutt (stier under stepResultsPerSone) krever en påbegynt simulering
+        if accumulator is None and len(path) >= 3 and event in ("value", "end_array"):
+            raise ValueError(f"Ugyldig NDJSON: {'/'.join(map(str, path[:3]))} før starten av en simulering")
+        if event == "value":
+            if len(path) == 4:
+                # Ett tidssteg i stepResultsPerSone
+                accumulator.add_step(path[3], value.get("effektBehov", {}))
+                if kilde:
+                    accumulator.add_kilde(value.get(KILDE_YTELSE) or {})
+            elif path == ("climateName",):
+                climate_name = value
+            elif path == ("result", "varmetapstallPerSone"):
+                areal = sum(z.get("areal", 0) for z in value)
+        elif event == "end_array" and len(path) == 3:
+            accumulator.end_zone(path[2])
+        elif event == "start_map" and not path:
+            climate_name = "Ukjent"
+            accumulator = ENGINES[engine](schema, top_n)
+            areal = 0
+        elif event == "end_map" and not path:
+            energy_kwh, peak_kw = accumulator.result()
+            row = build_row(climate_name, energy_kwh, peak_kw, areal)
+            if delivered:
+                row.update(delivered_columns(accumulator.delivered()))
+            if top_n:
+                row["Last"] = accumulator.load_profiles()
+            yield row
+
+
+def build_row(climate_name: str, energy_kwh: dict, peak_kw: float, areal: float) -> dict:
+    """Bygg kompakt rad fra årlig energi per post."""
+    total = sum(energy_kwh.values())
+    return {
+        "Klimasted": climate_name,
+        "Areal [m²]": areal,
+        "Oppvarming": energy_kwh["1a Romoppvarming"] + energy_kwh["1b Ventilasjonsvarme"],
+        "Varmtvann": energy_kwh["2 Varmtvann"],
+        "Kjøling": energy_kwh["3a Romkjøling"] + energy_kwh["3b Ventilasjonskjøling"],
+        "El-spesifikt": sum(energy_kwh[p] for p in EL_POSTER),
+        "Sum [kWh]": total,
+        "Sum [kWh/m²]": total / areal if areal > 0 else None,
+        "Maks [kW]": peak_kw,
+    }
+
+
+def delivered_columns(energy_kwh: dict) -> dict:
+    """
+    Flate kolonner for levert energi, f.eks. "termiskKildeYtelse/1 Levert
+    elektrisitet/2 Varmtvann/input [kWh]", fra årlig energi per sti.
+    """
+    return {
+        f"{KILDE_YTELSE}/{field.removesuffix('_W')} [kWh]": kwh
+        for field, kwh in energy_kwh.items()
+    }
+
+
+def is_delivered_column(column: str) -> bool:
+    return column.startswith(KILDE_YTELSE + "/")
+
 
+def delivered_table(df: pd.DataFrame) -> pd.DataFrame:
+    """Tilført, levert og tap per klimasted og energibærer, med COP = levert/tilført."""
+    columns = [c for c in df.columns if is_delivered_column(c)]
+    if not columns:
+        return pd.DataFrame(columns=["Klimasted", "Energibærer"])
+    long = df.melt(id_vars="Klimasted", value_vars=columns, var_name="Felt", value_name="kWh")
+    parts = long["Felt"].str.slice(len(KILDE_YTELSE) + 1, -len(" [kWh]")).str.rsplit("/", n=2, expand=True)
+    long["Energibærer"], long["Størrelse"] = parts[0], parts[2]
+    table = long.pivot_table(
+        index=["Klimasted", "Energibærer"], columns="Størrelse", values="kWh", aggfunc="sum", fill_value=0.0,
+    )
+    table.columns.name = None
+    table = table.rename(columns={"input": "Tilført [kWh]", "output": "Levert [kWh]", "tap": "Tap [kWh]"})
+    if "Tilført [kWh]" in table and "Levert [kWh]" in table:
+        tilført = table["Tilført [kWh]"]
+        table["COP"] = (table["Levert [kWh]"] / tilført).where(tilført > 0)
+    return table.reset_index()
 
-def process_ndjson(filepath: Path) -> pd.DataFrame:
-    """Les NDJSON og returner kompakt oppsummering."""
+
+def process_range(
+    filepath: Path, start: int, end: int, engine: str, delivered: bool = False, top_n: int = 0,
+) -> list[dict]:
+    """Oppsummer simuleringene i byte-området [start, end) (kjøres i egen prosess)."""
+    with open_result(filepath) as f:
+        f.seek(start)
+        return list(iter_rows(f, engine, limit=end - start, delivered=delivered, top_n=top_n))
+
+
+def rows_from_rollups(
+    rollups: Rollups,
+    workers: int = 1,
+    simulations: list[int] | None = None,
+    delivered: bool = False,
+) -> list[dict]:
+    """
+    Oppsummer fra månedssummene i byggsonen i rollup-sidefilen. Levert
+    energi summeres fra månedssummene i hver sone.
+    """
     rows = []
+    for entry in rollups.ensure(simulations, workers=workers):
+        energy_kwh = {post: 0.0 for post in ENERGI_POSTER}
+        peak_kw = 0.0
+        if "bygg" in entry:
+            sums = rollups.frame(entry["index"], BYGG, "month", "sum")
+            for post in ENERGI_POSTER:
+                if f"effektBehov/{post}" in sums:
+                    energy_kwh[post] = float(sums[f"effektBehov/{post}"].sum()) * TIMESTEP_HOURS / 1000
+            peak_kw = float(rollups.frame(entry["index"], BYGG, "month", "max")[BYGG_TOTAL].max()) / 1000
+        row = build_row(entry["climateName"], energy_kwh, peak_kw, entry["areal"])
+        if delivered:
+            sum_w = {}
+            for zone in rollups.zones(entry["index"]):
+                sums = rollups.frame(entry["index"], zone, "month", "sum")
+                for field in sums.columns:
+                    if field.startswith(KILDE_YTELSE + "/"):
+                        key = field[len(KILDE_YTELSE) + 1:]
+                        sum_w[key] = sum_w.get(key, 0.0) + float(np.nansum(sums[field]))
+            row.update(delivered_columns({k: w * TIMESTEP_HOURS / 1000 for k, w in sum_w.items()}))
+        rows.append(row)
+    return rows
+
+
+def rows_from_store(
+    store: ResultStore,
+    climates: list[str] | None = None,
+    delivered: bool = False,
+    top_n: int = 0,
+) -> list[dict]:
+    """
+    Oppsummer fra effektBehov-kolonnene i et kolonnelager (KeyError for
+    ukjente klimanavn), og fra termiskKildeYtelse-kolonnene med delivered.
+    """
+    el_input = (f"{KILDE_YTELSE}/{EL_BÆRER}/", "/input_W")
+    rows = []
+    for sim in [store.simulation(name) for name in climates] if climates else store.simulations:
+        sum_w = np.zeros(len(ENERGI_POSTER))
+        total_w = np.zeros(0)
+        kilde_w = {}
+        el_total = np.zeros(0)
+        load = {}
+        for zone in sim["zones"]:
+            fields = {name: i for i, name in enumerate(zone["fields"])}
+            array = store.array(zone)
+            if delivered:
+                for field, i in fields.items():
+                    if field.startswith(KILDE_YTELSE + "/"):
+                        key = field[len(KILDE_YTELSE) + 1:]
+                        kilde_w[key] = kilde_w.get(key, 0.0) + float(np.nansum(array[i], dtype=np.float64))
+            # Poster som mangler i sonen teller som 0, som i NDJSON-motorene
+            columns = np.zeros((len(ENERGI_POSTER), zone["steps"]))
+            for p, post in enumerate(ENERGI_POSTER):
+                if f"effektBehov/{post}" in fields:
+                    columns[p] = array[fields[f"effektBehov/{post}"]]
+            np.nan_to_num(columns, copy=False)
+            sum_w += columns.sum(axis=1)
+            zone_total = columns.sum(axis=0)
+            if len(zone_total) > len(total_w):
+                total_w = np.pad(total_w, (0, len(zone_total) - len(total_w)))
+            total_w[:len(zone_total)] += zone_total
+            if top_n:
+                el = columns[_EL_INDEKS].sum(axis=0)
+                for field, i in fields.items():
+                    if field.startswith(el_input[0]) and field.endswith(el_input[1]):
+                        el += np.nan_to_num(array[i].astype(np.float64))
+                profile = LoadProfile(top_n)
+                profile.add(el)
+                load[zone["id"]] = profile.finish()
+                if len(el) > len(el_total):
+                    el_total = np.pad(el_total, (0, len(el) - len(el_total)))
+                el_total[:len(el)] += el
+        energy_kwh = {post: float(w) * TIMESTEP_HOURS / 1000 for post, w in zip(ENERGI_POSTER, sum_w)}
+        peak_kw = float(total_w.max()) / 1000 if len(total_w) else 0.0
+        areal = sum(z.get("areal", 0) for z in sim.get("varmetapstallPerSone") or [])
+        row = build_row(sim["climateName"], energy_kwh, peak_kw, areal)
+        if delivered:
+            row.update(delivered_columns({k: w * TIMESTEP_HOURS / 1000 for k, w in kilde_w.items()}))
+        if top_n:
+            row["Last"] = _load_profiles(el_total, load, top_n)
+        rows.append(row)
+    return rows
+
+
+def summary_frame(rows: list[dict]) -> pd.DataFrame:
+    """Rader som DataFrame sortert på klimasted; manglende levert-kolonner er 0."""
+    df = pd.DataFrame(rows)
+    if df.empty:
+        return df
+    delivered = [c for c in df.columns if is_delivered_column(c)]
+    df[delivered] = df[delivered].fillna(0.0)
+    return df.sort_values("Klimasted", kind="stable").reset_index(drop=True)
+
+
+def process_store(
+    store_dir: Path, climates: list[str] | None = None, delivered: bool = False, top_n: int = 0,
+) -> pd.DataFrame:
+    """Les et kolonnelager (fra convert eller binær overføring) og returner kompakt oppsummering."""
+    return summary_frame(rows_from_store(ResultStore(store_dir), climates, delivered, top_n))
+
+
+def process_ndjson(
+    filepath: Path,
+    engine: str = "numpy",
+    workers: int = 1,
+    rollup: str = "off",
+    climates: list[str] | None = None,
+    delivered: bool = False,
+    top_n: int = 0,
+) -> pd.DataFrame:
+    """
+    Les NDJSON og returner kompakt oppsummering. rollup="auto" og "build"
+    bygger det som mangler i rollup-sidefilen (en utdatert sidefil bygges
+    på nytt og byttes inn atomisk) og bruker den. Kan sidefilen ikke
+    skrives, leser "auto" hele filen i stedet, mens "build" gir feil. Med climates leses bare linjene til de
+    klimastedene, funnet via byte-indeksen (KeyError for ukjente navn).
+    Med delivered summeres termiskKildeYtelse i samme gjennomgang. Med
+    top_n får radene LoadProfile-objekter; rollups brukes ikke da, siden de
+    ikke har elektrisitet per tidssteg.
+    """
+    selected = None
+    if climates:
+        lines = line_index(filepath)
+        selected = [find_line(lines, name) for name in climates]
+
+    if top_n:
+        rollup = "off"
+    rollups = Rollups(filepath) if rollup in ("auto", "build") else None
+    if rollups is not None and rollup == "auto":
+        try:
+            rollups.ensure([line["index"] for line in selected] if selected else None, workers=workers)
+        except OSError as e:
+            print(f"[Analyzer] Kan ikke bygge rollup-sidefilen ({e}), leser hele filen")
+            rollups = None
+
+    if rollups is not None:
+        rows = rows_from_rollups(rollups, workers, [line["index"] for line in selected] if selected else None, delivered)
+    elif selected:
+        ranges = [(line["offset"], line["offset"] + line["length"]) for line in selected]
+        if workers > 1 and len(ranges) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                chunks = list(pool.map(
+                    process_range, [filepath] * len(ranges), *zip(*ranges),
+                    [engine] * len(ranges), [delivered] * len(ranges), [top_n] * len(ranges),
+                ))
+        else:
+            chunks = [process_range(filepath, start, end, engine, delivered, top_n) for start, end in ranges]
+        rows = [row for chunk in chunks for row in chunk]
+    elif workers > 1 and detect_compression(filepath) is None:
+        # Hver linje er en uavhengig simulering. Flere områder enn prosesser
+        # jevner ut lasten; map() bevarer filrekkefølgen før sortering.
+        ranges = split_line_ranges(filepath, workers * 4)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunks = pool.map(
+                process_range,
+                [filepath] * len(ranges),
+                [start for start, _ in ranges],
+                [end for _, end in ranges],
+                [engine] * len(ranges),
+                [delivered] * len(ranges),
+                [top_n] * len(ranges),
+            )
+            rows = [row for chunk in chunks for row in chunk]
+    else:
+        with open_result(filepath) as f:
+            rows = list(iter_rows(f, engine, delivered=delivered, top_n=top_n))
     
-    with open(filepath, "r", encoding="utf-8") as f:
-        for line in f:
-            if not line.strip():
+    return summary_frame(rows)
+
+
+def _tidspunkt(hours: float | None) -> pd.Timestamp | None:
+    return None if hours is None else pd.Timestamp(START) + pd.Timedelta(hours=hours)
+
+
+def _kw(df: pd.DataFrame) -> dict:
+    return {c: 1 for c in df.columns if c.endswith("[kW]")}
+
+
+def load_tables(df: pd.DataFrame, points: int = 101) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    Effekttabell, høyeste timer og varighetskurver (points punkter) for
+    elektrisitet fra "Last"-kolonnen, per klimasted og sone. Bygget har
+    sonenavnet BYGG.
+    """
+    peaks, tops, curves = [], [], []
+    for climate, profiles in zip(df["Klimasted"], df["Last"]):
+        for zone, profile in profiles.items():
+            peak_step = profile.peak_step
+            row = {
+                "Klimasted": climate,
+                "Sone": zone,
+                "Maks [kW]": profile.peak_w / 1000,
+                "Tidspunkt": _tidspunkt(None if peak_step is None else peak_step * TIMESTEP_HOURS),
+            }
+            for hours in VARIGHET_TIMER:
+                row[f"{hours} t [kW]"] = profile.exceeded(hours) / 1000
+            peaks.append(row)
+            for rank, (hour, power_w) in enumerate(profile.top_hours(), 1):
+                tops.append({
+                    "Klimasted": climate, "Sone": zone, "Rang": rank,
+                    "Tidspunkt": _tidspunkt(hour), "Effekt [kW]": power_w / 1000,
+                })
+            for hours, power_w in zip(*profile.duration(points)):
+                curves.append({"Klimasted": climate, "Sone": zone, "Timer": hours, "Effekt [kW]": power_w / 1000})
+    return pd.DataFrame(peaks), pd.DataFrame(tops), pd.DataFrame(curves)
+
+
+def summary_row(record: dict) -> tuple[dict, list[dict]]:
+    """
+    Bygg QA-rad og advarsler gruppert på (type_, zoneId, method) fra
+    metadata, warnings og varmetapstallPerSone. Varmetapstallene
+    arealveies over sonene.
+    """
+    climate_name = record.get("climateName") or "Ukjent"
+    metadata = record.get("metadata") or {}
+    warnings = record.get("warnings") or []
+    soner = record.get("varmetapstallPerSone") or []
+
+    areal = sum(z.get("areal", 0) for z in soner)
+    komponenter = {}
+    for z in soner:
+        for navn, verdi in (z.get("varmetapstall") or {}).items():
+            komponenter[navn] = komponenter.get(navn, 0.0) + verdi * z.get("areal", 0)
+
+    sim_ms = metadata.get("simulationTime")
+    row = {
+        "Klimasted": climate_name,
+        "Simuleringstid [s]": sim_ms / 1000 if sim_ms is not None else None,
+        "Tidssteg": metadata.get("totalSteps"),
+        "Advarsler": len(warnings),
+        "Areal [m²]": areal,
+        "Varmetapstall [W/(m²K)]": sum(komponenter.values()) / areal if areal > 0 else None,
+    }
+    for navn, h in komponenter.items():
+        row[f"{navn} [W/(m²K)]"] = h / areal if areal > 0 else None
+
+    grupper = Counter((w.get("type_"), w.get("zoneId"), w.get("method")) for w in warnings)
+    advarsler = [
+        {"Klimasted": climate_name, "Type": type_, "Sone": zone_id, "Metode": method, "Antall": n}
+        for (type_, zone_id, method), n in grupper.items()
+    ]
+    return row, advarsler
+
+
+def summary_range(filepath: Path, start: int, end: int | None) -> list[tuple[dict, list[dict]]]:
+    """Skann byte-området [start, end) etter metadata (kjøres i egen prosess)."""
+    with open_result(filepath) as f:
+        f.seek(start)
+        return [summary_row(r) for r in scan_records(f, SUMMARY_KEYS, limit=None if end is None else end - start)]
+
+
+def process_summary(
+    filepath: Path,
+    workers: int = 1,
+    climates: list[str] | None = None,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Rask QA uten tidsseriene: returner én rad per klimasted og advarslene
+    gruppert per klimasted. For et kolonnelager brukes manifestet, som bare
+    har antall advarsler.
+    """
+    if filepath.is_dir():
+        store = ResultStore(filepath)
+        results = []
+        for sim in [store.simulation(name) for name in climates] if climates else store.simulations:
+            row, _ = summary_row(sim)
+            row["Advarsler"] = sim.get("n_warnings", 0)
+            results.append((row, []))
+    else:
+        if climates:
+            lines = line_index(filepath)
+            ranges = [(line["offset"], line["offset"] + line["length"])
+                      for line in (find_line(lines, name) for name in climates)]
+        elif workers > 1 and detect_compression(filepath) is None:
+            ranges = split_line_ranges(filepath, workers * 4)
+        else:
+            ranges = [(0, None)]
+        if workers > 1 and len(ranges) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                chunks = list(pool.map(summary_range, [filepath] * len(ranges), *zip(*ranges)))
+        else:
+            chunks = [summary_range(filepath, start, end) for start, end in ranges]
+        results = [result for chunk in chunks for result in chunk]
+
+    df = pd.DataFrame([row for row, _ in results], columns=SUMMARY_COLUMNS if not results else None)
+    advarsler = pd.DataFrame(
+        [a for _, gruppe in results for a in gruppe],
+        columns=["Klimasted", "Type", "Sone", "Metode", "Antall"],
+    )
+    if not df.empty:
+        df = df.sort_values("Klimasted", kind="stable").reset_index(drop=True)
+    return df, advarsler
+
+
+def print_summary(df: pd.DataFrame, advarsler: pd.DataFrame) -> None:
+    print(f"\nSimuleringstid, advarsler og varmetapstall per klimasted")
+    print("=" * 80)
+    print(df[[c for c in SUMMARY_COLUMNS if c in df.columns]].round(3).to_string(index=False))
+
+    if advarsler.empty:
+        return
+    gruppert = (
+        advarsler.fillna("-")
+        .groupby(["Type", "Sone", "Metode"], sort=False)
+        .agg(Antall=("Antall", "sum"), Klimasteder=("Klimasted", "nunique"))
+        .reset_index()
+        .sort_values("Antall", ascending=False, kind="stable")
+    )
+    print(f"\nAdvarsler gruppert på type_, zoneId og method")
+    print("=" * 80)
+    print(gruppert.to_string(index=False))
+
+
+def report_tables(df: pd.DataFrame, delivered: bool = False, points: int = 101) -> dict[str, pd.DataFrame]:
+    """
+    Tabellene i rapporten, med CSV-suffiks som nøkkel: "" (oppsummering),
+    "levert" med delivered, og "effekt", "topptimer" og "varighet" hvis df
+    har en Last-kolonne.
+    """
+    tables = {"": df.drop(columns="Last", errors="ignore")}
+    if delivered:
+        tables["levert"] = delivered_table(tables[""])
+    if "Last" in df:
+        tables.update(zip(("effekt", "topptimer", "varighet"), load_tables(df, points)))
+    return tables
+
+
+def print_report(tables: dict[str, pd.DataFrame]) -> None:
+    df = tables[""]
+    print(f"\nEnergibehov per klimasted [kWh]")
+    print("=" * 80)
+    print(df[[c for c in df.columns if not is_delivered_column(c)]].round(1).to_string(index=False))
+
+    levert = tables.get("levert")
+    if levert is not None:
+        print(f"\nLevert energi per energibærer [kWh] (beregningspunkt B/C)")
+        print("=" * 80)
+        if levert.empty:
+            print("Ingen termiskKildeYtelse i resultatene")
+        else:
+            print(levert.round({c: 2 if c == "COP" else 1 for c in levert.columns[2:]}).to_string(index=False))
+
+    if "effekt" in tables:
+        peaks, tops = tables["effekt"], tables["topptimer"]
+        print(f"\nElektrisitet for bygget [kW]: maks og effekt som overskrides i N timer")
+        print("=" * 80)
+        print(peaks[peaks["Sone"] == BYGG].drop(columns="Sone").round(_kw(peaks)).to_string(index=False))
+        print(f"\nHøyeste timer for bygget (timesmiddel) [kW]")
+        print("=" * 80)
+        print(tops[tops["Sone"] == BYGG].drop(columns="Sone").round(_kw(tops)).to_string(index=False))
+
+
+def save_report(tables: dict[str, pd.DataFrame], output: Path, quiet: bool = False) -> None:
+    """Skriv oppsummeringen til output og de andre tabellene til output_<navn>.csv (atomisk)."""
+    for navn, tabell in tables.items():
+        if navn and tabell.empty:
+            continue
+        sti = output.with_name(f"{output.stem}_{navn}.csv") if navn else output
+        tmp = sti.with_name(sti.name + ".tmp")
+        tabell.to_csv(tmp, index=False)
+        os.replace(tmp, sti)
+        if not quiet:
+            print(f"Lagret til: {sti}" if navn else f"\nLagret til: {sti}")
+
+
+def iter_new_rows(
+    filepath: Path,
+    engine: str = "numpy",
+    delivered: bool = False,
+    top_n: int = 0,
+    interval: float = 5.0,
+) -> Iterator[list[dict]]:
+    """
+    Følg en NDJSON-fil mens runneren skriver til den, og gi radene for hver
+    ny bunke fullførte linjer. Posisjonen huskes, så ingen byte leses to
+    ganger; en påbegynt linje venter til linjeskiftet er skrevet. Går til
+    den avbrytes (KeyboardInterrupt). ValueError hvis filen blir kortere
+    eller byttes ut.
+    """
+    pos = scanned = 0   # Analysert til pos; ingen linjeskift i [pos, scanned)
+    with open(filepath, "rb") as f:
+        inode = os.fstat(f.fileno()).st_ino
+        while True:
+            size = os.fstat(f.fileno()).st_size
+            if size < scanned or os.stat(filepath).st_ino != inode:
+                raise ValueError(f"{filepath} ble skrevet på nytt mens den ble fulgt")
+            end = pos
+            f.seek(scanned)
+            while scanned < size:
+                chunk = f.read(min(CHUNK_SIZE, size - scanned))
+                if not chunk:
+                    break
+                i = chunk.rfind(b"\n")
+                if i >= 0:
+                    end = scanned + i + 1
+                scanned += len(chunk)
+            if end > pos:
+                f.seek(pos)
+                rows = list(iter_rows(f, engine, limit=end - pos, delivered=delivered, top_n=top_n))
+                pos = end
+                yield rows
+            else:
+                time.sleep(interval)
+
+
+def follow(args, top_n: int) -> None:
+    """--follow: analyser nye linjer fortløpende og oppdater CSV-filene etter hver bunke."""
+    if not args.ndjson_file.exists():
+        print(f"Venter på {args.ndjson_file} ...")
+        while not args.ndjson_file.exists():
+            time.sleep(args.intervall)
+    if args.summary_only or args.klima or args.ndjson_file.is_dir() or detect_compression(args.ndjson_file):
+        print("Feil: --follow gjelder en ukomprimert NDJSON-fil og kan ikke kombineres med --summary-only eller --klima")
+        sys.exit(1)
+
+    print(f"Følger {args.ndjson_file} (Ctrl+C for å avslutte)")
+    rows = []
+    try:
+        for new in iter_new_rows(args.ndjson_file, args.engine, args.levert, top_n, args.intervall):
+            if not new:
                 continue
-            
-            entry = json.loads(line)
-            climate_name = entry.get("climateName", "Ukjent")
-            result = entry.get("result", {})
-            
-            # Summer energi per post over alle soner og tidssteg
-            energy_kwh = {post: 0.0 for post in ENERGI_POSTER}
-            
-            for step_list in result.get("stepResultsPerSone", {}).values():
-                for step in step_list:
-                    for post in ENERGI_POSTER:
-                        power_w = step.get("effektBehov", {}).get(post, 0.0)
-                        energy_kwh[post] += power_w * TIMESTEP_HOURS / 1000
-            
-            # Hent areal
-            areal = sum(z.get("areal", 0) for z in result.get("varmetapstallPerSone", []))
-            
-            # Bygg kompakt rad
-            total = sum(energy_kwh.values())
-            rows.append({
-                "Klimasted": climate_name,
-                "Areal [m²]": areal,
-                "Oppvarming": energy_kwh["1a Romoppvarming"] + energy_kwh["1b Ventilasjonsvarme"],
-                "Varmtvann": energy_kwh["2 Varmtvann"],
-                "Kjøling": energy_kwh["3a Romkjøling"] + energy_kwh["3b Ventilasjonskjøling"],
-                "El-spesifikt": sum(energy_kwh[p] for p in ["4a Vifter", "4b Pumper", "5 Belysning", "6 Teknisk utstyr"]),
-                "Sum [kWh]": total,
-                "Sum [kWh/m²]": total / areal if areal > 0 else None,
-            })
-    
-    return pd.DataFrame(rows).sort_values("Klimasted").reset_index(drop=True)
+            rows.extend(new)
+            nye = pd.DataFrame(new)
+            print(f"\n[{time.strftime('%H:%M:%S')}] {len(new)} ny(e), {len(rows)} klimasted(er) totalt")
+            print(nye[[c for c in nye.columns if c != "Last" and not is_delivered_column(c)]]
+                  .round(1).to_string(index=False))
+            if args.output:
+                save_report(report_tables(summary_frame(rows), args.levert, args.varighet), args.output, quiet=True)
+    except KeyboardInterrupt:
+        pass
+    except ValueError as e:
+        print(f"Feil: {e}")
+        sys.exit(1)
+
+    if not rows:
+        print("\nIngen fullførte linjer")
+        return
+    tables = report_tables(summary_frame(rows), args.levert, args.varighet)
+    print_report(tables)
+    if args.output:
+        save_report(tables, args.output)
 
 
 def main():
     parser = argparse.ArgumentParser(description="Analyser BEMIFY batch-resultater")
-    parser.add_argument("ndjson_file", type=Path)
+    parser.add_argument("ndjson_file", type=Path, help="Resultatfil (.ndjson[.gz|.zst]) eller kolonnelager (.bemstore)")
     parser.add_argument("-o", "--output", type=Path, help="Lagre til CSV")
+    parser.add_argument("--engine", choices=sorted(ENGINES), default="numpy",
+                        help="Beregningsmotor for summering (standard: numpy)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Antall prosesser (0 = alle kjerner, standard: 1)")
+    parser.add_argument("--rollup", choices=["auto", "build", "off"], default="auto",
+                        help="Bygg det som mangler i rollup-sidefilen og bruk den: auto = les hele filen hvis "
+                             "sidefilen ikke kan skrives, build = feil da, off = les alltid hele filen (standard: auto)")
+    parser.add_argument("--klima", action="append", metavar="NAVN",
+                        help="Analyser bare dette klimastedet (kan gjentas); leser bare linjen via byte-indeksen")
+    parser.add_argument("--summary-only", action="store_true",
+                        help="Bare simuleringstid, advarsler og varmetapstall; hopper over tidsseriene")
+    parser.add_argument("--levert", action="store_true",
+                        help="Levert energi per energibærer (beregningspunkt B/C) fra termiskKildeYtelse")
+    parser.add_argument("--last", action="store_true",
+                        help="Maks effekt, høyeste timer og varighetskurver for elektrisitet per klimasted og sone")
+    parser.add_argument("--topp", type=int, default=10, metavar="N",
+                        help="Antall høyeste timer med --last (standard: 10)")
+    parser.add_argument("--varighet", type=int, default=101, metavar="PUNKTER",
+                        help="Antall punkter i varighetskurvene med --last (standard: 101)")
+    parser.add_argument("--follow", action="store_true",
+                        help="Følg filen mens runneren skriver og analyser nye linjer fortløpende")
+    parser.add_argument("--intervall", type=float, default=5.0, metavar="SEK",
+                        help="Sekunder mellom hver sjekk med --follow (standard: 5)")
     args = parser.parse_args()
     
+    # LoadProfile trenger minst én plass i heapen for å følge timene
+    top_n = max(args.topp, 1) if args.last else 0
+    if args.follow:
+        follow(args, top_n)
+        return
+
     if not args.ndjson_file.exists():
         print(f"Feil: Finner ikke {args.ndjson_file}")
         sys.exit(1)
+    if args.ndjson_file.is_dir() and not (args.ndjson_file / "manifest.json").exists():
+        print(f"Feil: {args.ndjson_file} er ikke et kolonnelager (mangler manifest.json)")
+        sys.exit(1)
     
-    df = process_ndjson(args.ndjson_file)
-    
-    print(f"\nEnergibehov per klimasted [kWh]")
-    print("=" * 80)
-    print(df.round(1).to_string(index=False))
+    workers = args.workers or os.cpu_count() or 1
+    try:
+        if args.summary_only:
+            df, advarsler = process_summary(args.ndjson_file, workers, args.klima)
+        elif args.ndjson_file.is_dir():
+            df = process_store(args.ndjson_file, args.klima, args.levert, top_n)
+        else:
+            df = process_ndjson(args.ndjson_file, args.engine, workers, args.rollup, args.klima, args.levert, top_n)
+    except KeyError as e:
+        print(f"Feil: {e.args[0]}")
+        sys.exit(1)
+    except ValueError as e:
+        print(f"Feil: {e}")
+        sys.exit(1)
+
+    if args.summary_only:
+        print_summary(df, advarsler)
+        if args.output:
+            df.to_csv(args.output, index=False)
+            print(f"\nLagret til: {args.output}")
+            if not advarsler.empty:
+                advarsler_csv = args.output.with_name(f"{args.output.stem}_advarsler.csv")
+                advarsler.to_csv(advarsler_csv, index=False)
+                print(f"Advarsler lagret til: {advarsler_csv}")
+        return
     
+    tables = report_tables(df, args.levert, args.varighet)
+    print_report(tables)
     if args.output:
-        df.to_csv(args.output, index=False)
-        print(f"\nLagret til: {args.output}")
+        save_report(tables, args.output)
 
 
 if __name__ == "__main__":
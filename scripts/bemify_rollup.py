@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+"""
+BEMIFY Rollup - Forhåndsberegnede time-, døgn- og månedsverdier
+
+Lager en sidefil ved siden av resultatfilen (results.ndjson ->
+results.ndjson.rollup/) med mean/min/max/sum per time, døgn og måned for hvert
+felt i hver sone, og sorterte varighetskurver (synkende, full oppløsning).
+I tillegg lagres en byggsone "_bygg" med effektBehov summert over alle
+soner, og "effektBehov/total" for postene i ENERGI_POSTER per tidssteg.
+
+Sidefilen bygges første gang en simulering leses og brukes igjen så lenge
+kildefilen har samme størrelse og mtime; ellers bygges den på nytt. I
+NDJSON bygges én simulering om gangen, i JSON-formatene alle på én gang.
+
+Lagring: én .npz per simulering. Timeverdier og varighetskurver lagres som
+float32, døgn- og månedsverdier som float64 (summene brukes til årlig
+energi). NaN-verdier hoppes over, som i pandas.
+
+Bruk:
+    python bemify_rollup.py build results.ndjson --workers 4
+
+    from bemify_rollup import Rollups
+    rollup = Rollups("results.ndjson")
+    rollup.frame("Oslo", "sone_abc123", "hour", "mean", ["inneklima/operativTemperatur"])
+    rollup.duration("Oslo", "sone_abc123", ["inneklima/operativTemperatur"])
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+try:
+    import numpy as np
+    import pandas as pd
+except ImportError:
+    print("Feil: pandas ikke installert. Kjør: pip install pandas")
+    sys.exit(1)
+
+from bemify_loader import TIMESTEP_MINUTES, detect_format, iter_simulation, list_simulations
+from bemify_ndjson import find_line, iter_simulations, open_result
+from bemify_result_store import STEG_GRUPPER, ColumnBuffer
+
+ROLLUP_FORMAT = "bemify-rollup"
+ROLLUP_VERSION = 1
+START = "2025-01-01"
+
+ENERGI_POSTER = [
+    "1a Romoppvarming", "1b Ventilasjonsvarme", "2 Varmtvann",
+    "3a Romkjøling", "3b Ventilasjonskjøling",
+    "4a Vifter", "4b Pumper", "5 Belysning", "6 Teknisk utstyr",
+]
+
+BYGG = "_bygg"
+BYGG_TOTAL = "effektBehov/total"
+
+# Periode -> (pandas-frekvens for gruppering, dtype i sidefilen)
+PERIODER = {"hour": ("h", np.float32), "day": ("D", np.float64), "month": ("M", np.float64)}
+STATISTIKK = ("mean", "min", "max", "sum")
+
+
+def rollup_path(source: Path | str) -> Path:
+    # Hele filnavnet beholdes (som .idx.json), så results.json, results.ndjson
+    # og results.ndjson.zst får hver sin sidefil
+    source = Path(source)
+    return source.with_name(source.name + ".rollup")
+
+
+def _periodestarter(steps: int, start: str) -> dict[str, np.ndarray]:
+    """Første tidssteg i hver time, hvert døgn og hver måned."""
+    index = pd.date_range(start, periods=steps, freq=f"{TIMESTEP_MINUTES}min")
+    starter = {}
+    for periode, (freq, _) in PERIODER.items():
+        nokkel = index.to_period(freq).asi8
+        starter[periode] = np.flatnonzero(np.r_[True, nokkel[1:] != nokkel[:-1]])
+    return starter
+
+
+def _rull_opp(data: np.ndarray, starter: dict[str, np.ndarray]) -> dict[str, np.ndarray]:
+    """Beregn (statistikk, felt, perioder) per periode og varighetskurver for en (felt, steg)-array."""
+    gyldig = ~np.isnan(data)
+    fylt = np.where(gyldig, data, 0.0)
+    ut = {}
+    for periode, (_, dtype) in PERIODER.items():
+        idx = starter[periode]
+        summer = np.add.reduceat(fylt, idx, axis=1)
+        antall = np.add.reduceat(gyldig, idx, axis=1, dtype=np.int64)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            snitt = np.where(antall > 0, summer / antall, np.nan)
+        with np.errstate(invalid="ignore"):
+            minst = np.fmin.reduceat(data, idx, axis=1)
+            storst = np.fmax.reduceat(data, idx, axis=1)
+        ut[periode] = np.stack([snitt, minst, storst, summer]).astype(dtype)
+    # Synkende varighetskurve; NaN havner bakerst
+    ut["duration"] = (-np.sort(-data, axis=1)).astype(np.float32)
+    return ut
+
+
+class _SimuleringsBygger:
+    """Samler tidsstegene for én simulering og skriver sidefilen for den."""
+
+    def __init__(self, index: int, start: str):
+        self.entry = {"index": index, "climateName": None, "zones": [], "areal": 0.0}
+        self.start = start
+        self.soner: dict[str, ColumnBuffer] = {}
+        self.arrays: dict[str, np.ndarray] = {}
+        self.bygg: dict[str, np.ndarray] = {}
+        self._starter: dict[int, dict] = {}
+
+    def feed(self, event: str, data) -> None:
+        if event == "climate":
+            self.entry["climateName"] = data
+        elif event == "step":
+            zone, _, step = data
+            buf = self.soner.get(zone)
+            if buf is None:
+                buf = self.soner[zone] = ColumnBuffer(STEG_GRUPPER)
+            buf.add(step)
+        elif event == "zone_end":
+            zone, zone_id = data
+            buf = self.soner.pop(zone, None) or ColumnBuffer(STEG_GRUPPER)
+            self._legg_til_sone(zone_id, buf)
+        elif event == "value" and data[0] == "varmetapstallPerSone":
+            self.entry["areal"] = sum(z.get("areal", 0) for z in data[1] or [])
+
+    def _starter_for(self, steps: int) -> dict:
+        if steps not in self._starter:
+            self._starter[steps] = _periodestarter(steps, self.start)
+        return self._starter[steps]
+
+    def _legg_til_sone(self, zone_id: str, buf: ColumnBuffer) -> None:
+        data = buf.to_array(np.float64)
+        nr = len(self.entry["zones"])
+        self.entry["zones"].append({"id": zone_id, "steps": data.shape[1], "fields": buf.fields})
+        if data.shape[1]:
+            for navn, verdier in _rull_opp(data, self._starter_for(data.shape[1])).items():
+                self.arrays[f"{nr}_{navn}"] = verdier
+
+        # Byggsummer: manglende verdier regnes som 0, som i analyzeren
+        fylt = np.nan_to_num(data)
+        rader = {felt: fylt[k] for k, felt in enumerate(buf.fields) if felt.startswith("effektBehov/")}
+        total = sum((rader[f"effektBehov/{post}"] for post in ENERGI_POSTER if f"effektBehov/{post}" in rader),
+                    np.zeros(data.shape[1]))
+        for felt, rad in [*rader.items(), (BYGG_TOTAL, total)]:
+            gammel = self.bygg.get(felt, np.zeros(0))
+            if len(rad) > len(gammel):
+                gammel = np.pad(gammel, (0, len(rad) - len(gammel)))
+            gammel[:len(rad)] += rad
+            self.bygg[felt] = gammel
+
+    def lagre(self, mappe: Path) -> dict:
+        """Skriv .npz-filen og returner manifestoppføringen."""
+        if self.bygg:
+            felt = [f for f in self.bygg if f != BYGG_TOTAL] + [BYGG_TOTAL]
+            steps = max(len(v) for v in self.bygg.values())
+            data = np.zeros((len(felt), steps))
+            for k, f in enumerate(felt):
+                data[k, :len(self.bygg[f])] = self.bygg[f]
+            self.entry["bygg"] = {"steps": steps, "fields": felt}
+            for navn, verdier in _rull_opp(data, self._starter_for(steps)).items():
+                self.arrays[f"{BYGG}_{navn}"] = verdier
+
+        navn = f"{self.entry['index']:04d}.npz"
+        fd, tmp = tempfile.mkstemp(dir=mappe, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, **self.arrays)
+        os.replace(tmp, mappe / navn)
+        self.entry["file"] = navn
+        return self.entry
+
+
+def _bygg_en(source: Path, index: int, mappe: Path, start: str) -> dict:
+    """Bygg sidefilen for én NDJSON-simulering (kjøres også i egen prosess)."""
+    bygger = _SimuleringsBygger(index, start)
+    for event, data in iter_simulation(source, index):
+        bygger.feed(event, data)
+    return bygger.lagre(mappe)
+
+
+class Rollups:
+    """
+    Leser (og bygger ved behov) sidefilen med rollups for en resultatfil.
+
+    Å åpne sidefilen endrer ingenting på disk. gjeldende sier om den finnes
+    og hører til kildefilen slik den er nå. Er den utdatert (eller mangler),
+    bygger ensure() en ny i en midlertidig mappe og bytter den inn når den
+    er ferdig, så en avbrutt bygging aldri etterlater en halv sidefil.
+    """
+
+    def __init__(self, source: Path | str, start: str = START):
+        self.source = Path(source)
+        self.path = rollup_path(self.source)
+        self.start = start
+        self._npz: dict[int, np.lib.npyio.NpzFile] = {}
+        self.manifest = self._les_manifest()
+        self.gjeldende = self.manifest is not None
+        if self.manifest is None:
+            stat = self.source.stat()
+            self.manifest = {
+                "format": ROLLUP_FORMAT,
+                "version": ROLLUP_VERSION,
+                "source": {"path": str(self.source), "size": stat.st_size, "mtime": stat.st_mtime},
+                "start": start,
+                "simulations": {},
+            }
+
+    def _les_manifest(self) -> dict | None:
+        try:
+            with open(self.path / "manifest.json", "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        stat = self.source.stat()
+        src = manifest.get("source", {})
+        if (manifest.get("format") != ROLLUP_FORMAT or manifest.get("version") != ROLLUP_VERSION
+                or manifest.get("start") != self.start
+                or src.get("size") != stat.st_size or src.get("mtime") != stat.st_mtime):
+            return None
+        return manifest
+
+    @staticmethod
+    def _lagre_manifest(mappe: Path, manifest: dict) -> None:
+        fd, tmp = tempfile.mkstemp(dir=mappe, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, mappe / "manifest.json")
+
+    def _bytt_inn(self, ny: Path) -> None:
+        """Erstatt sidefilen (hvis den finnes) med den ferdig bygde mappen ny."""
+        gammel = self.path.with_name(f"{self.path.name}.{os.getpid()}.gammel")
+        if self.path.exists():
+            os.replace(self.path, gammel)
+        os.replace(ny, self.path)
+        shutil.rmtree(gammel, ignore_errors=True)
+
+    def simulations(self) -> list[dict]:
+        """[{"index", "climateName"}] for alle simuleringene i kildefilen."""
+        if "list" not in self.manifest:
+            self.manifest["list"] = [
+                {"index": s["index"], "climateName": s["climateName"]} for s in list_simulations(self.source)
+            ]
+        return self.manifest["list"]
+
+    def _indeks(self, simulation: int | str) -> int:
+        return find_line(self.simulations(), simulation)["index"]
+
+    def ensure(self, simulations: list[int | str] | None = None, workers: int = 1) -> list[dict]:
+        """Bygg det som mangler for simuleringene (standard: alle) og returner oppføringene."""
+        indekser = [self._indeks(s) for s in simulations] if simulations is not None else \
+            [s["index"] for s in self.simulations()]
+        mangler = [i for i in indekser if str(i) not in self.manifest["simulations"]]
+        if not mangler:
+            return [self.manifest["simulations"][str(i)] for i in indekser]
+
+        # En gjeldende sidefil utvides på stedet (hver fil skrives atomisk);
+        # ellers bygges en ny ved siden av og byttes inn til slutt
+        if self.gjeldende:
+            mappe = self.path
+        else:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            mappe = Path(tempfile.mkdtemp(dir=self.path.parent, prefix=self.path.name + ".", suffix=".tmp"))
+        try:
+            if detect_format(self.source) == "ndjson":
+                if workers > 1 and len(mangler) > 1:
+                    with ProcessPoolExecutor(max_workers=workers) as pool:
+                        nye = list(pool.map(_bygg_en, [self.source] * len(mangler), mangler,
+                                            [mappe] * len(mangler), [self.start] * len(mangler)))
+                else:
+                    nye = [_bygg_en(self.source, i, mappe, self.start) for i in mangler]
+            else:
+                # JSON-formatene må uansett strømmes fra starten: bygg alle i samme gjennomgang
+                nye = []
+                bygger = None
+                with open_result(self.source) as f:
+                    for event, data in iter_simulations(f, default_name=self.source.stem):
+                        if event == "start":
+                            bygger = _SimuleringsBygger(data, self.start) \
+                                if str(data) not in self.manifest["simulations"] else None
+                        elif bygger is not None:
+                            if event == "end":
+                                nye.append(bygger.lagre(mappe))
+                                bygger = None
+                            else:
+                                bygger.feed(event, data)
+            simuleringer = {**self.manifest["simulations"], **{str(e["index"]): e for e in nye}}
+            self._lagre_manifest(mappe, {**self.manifest, "simulations": simuleringer})
+            if not self.gjeldende:
+                self._bytt_inn(mappe)
+        except BaseException:
+            if not self.gjeldende:
+                shutil.rmtree(mappe, ignore_errors=True)
+            raise
+        self.manifest["simulations"] = simuleringer
+        self.gjeldende = True
+        return [self.manifest["simulations"][str(i)] for i in indekser]
+
+    def simulation(self, simulation: int | str) -> dict:
+        """Manifestoppføringen for én simulering (bygges hvis den mangler)."""
+        return self.ensure([simulation])[0]
+
+    def _sone(self, entry: dict, zone: str) -> tuple[str, dict]:
+        if zone == BYGG:
+            if "bygg" not in entry:
+                raise KeyError(f"Simuleringen '{entry['climateName']}' har ingen effektBehov")
+            return BYGG, entry["bygg"]
+        for nr, z in enumerate(entry["zones"]):
+            if z["id"] == zone:
+                return str(nr), z
+        raise KeyError(f"Finner ikke sone: {zone}")
+
+    def _array(self, entry: dict, navn: str) -> np.ndarray:
+        npz = self._npz.get(entry["index"])
+        if npz is None:
+            npz = self._npz[entry["index"]] = np.load(self.path / entry["file"])
+        return npz[navn]
+
+    @staticmethod
+    def _kolonner(fields, alle: list[str]) -> dict[str, int | None]:
+        if fields is None:
+            return {f: k for k, f in enumerate(alle)}
+        if not isinstance(fields, dict):
+            fields = {f: f for f in fields}
+        posisjon = {f: k for k, f in enumerate(alle)}
+        return {kolonne: posisjon.get(sti.strip("/")) for kolonne, sti in fields.items()}
+
+    @staticmethod
+    def _velg(data: np.ndarray, kolonner: dict) -> np.ndarray:
+        ut = np.full((len(kolonner), data.shape[-1]), np.nan)
+        for k, rad in enumerate(kolonner.values()):
+            if rad is not None:
+                ut[k] = data[rad]
+        return ut
+
+    def zones(self, simulation: int | str) -> list[str]:
+        return [z["id"] for z in self.simulation(simulation)["zones"]]
+
+    def frame(
+        self,
+        simulation: int | str,
+        zone: str,
+        period: str = "hour",
+        stat: str | list[str] = "mean",
+        fields: dict[str, str] | list[str] | None = None,
+    ) -> pd.DataFrame:
+        """
+        Rollup for én sone (eller BYGG) som DataFrame med periodens start som
+        indeks. fields er {kolonne: feltsti}, en liste av feltstier eller None
+        (alle). Med en liste av statistikker blir kolonnene (felt, statistikk),
+        som df.resample(...).agg([...]).
+        """
+        if period not in PERIODER:
+            raise ValueError(f"period må være en av {', '.join(PERIODER)}")
+        entry = self.simulation(simulation)
+        nokkel, sone = self._sone(entry, zone)
+        kolonner = self._kolonner(fields, sone["fields"])
+        starter = _periodestarter(sone["steps"], self.start)[period]
+        index = pd.date_range(self.start, periods=sone["steps"], freq=f"{TIMESTEP_MINUTES}min")[starter]
+        data = self._array(entry, f"{nokkel}_{period}") if sone["steps"] else np.zeros((4, 0, 0))
+
+        stats = [stat] if isinstance(stat, str) else list(stat)
+        deler = {}
+        for s in stats:
+            if s not in STATISTIKK:
+                raise ValueError(f"stat må være en av {', '.join(STATISTIKK)}")
+            deler[s] = pd.DataFrame(self._velg(data[STATISTIKK.index(s)], kolonner).T,
+                                    index=index, columns=list(kolonner))
+        if isinstance(stat, str):
+            return deler[stat]
+        df = pd.concat(deler, axis=1).swaplevel(axis=1)
+        return df[[(k, s) for k in kolonner for s in stats]]
+
+    def duration(
+        self,
+        simulation: int | str,
+        zone: str,
+        fields: dict[str, str] | list[str] | None = None,
+    ) -> pd.DataFrame:
+        """Sorterte varighetskurver (synkende), én kolonne per felt."""
+        entry = self.simulation(simulation)
+        nokkel, sone = self._sone(entry, zone)
+        kolonner = self._kolonner(fields, sone["fields"])
+        if not sone["steps"]:
+            return pd.DataFrame(columns=list(kolonner))
+        data = self._array(entry, f"{nokkel}_duration")
+        return pd.DataFrame(self._velg(data, kolonner).T, columns=list(kolonner))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rollups (time/døgn/måned) for BEMIFY-resultater")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_build = sub.add_parser("build", help="Bygg sidefilen for alle simuleringene")
+    p_build.add_argument("source", type=Path, help="Resultatfil (.ndjson eller .json)")
+    p_build.add_argument("--workers", type=int, default=1,
+                         help="Antall prosesser for NDJSON (0 = alle kjerner, standard: 1)")
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        if not args.source.exists():
+            print(f"Feil: Finner ikke {args.source}")
+            sys.exit(1)
+        start_tid = time.time()
+        rollup = Rollups(args.source)
+        entries = rollup.ensure(workers=args.workers or os.cpu_count() or 1)
+        for entry in entries:
+            print(f"  {entry['climateName']}: {len(entry['zones'])} sone(r)")
+        print(f"\nRollups lagret: {rollup.path}")
+        print(f"Tid brukt: {time.time() - start_tid:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,425 @@
+"""
+BEMIFY Session - Felles Playwright-oppsett for runnerne
+
+Innlogging, oppstart av BEMIFY-sider og en pool av arbeidere som kjører
+simuleringer parallelt. Hver arbeider har sin egen tråd, sin egen
+Playwright-instans og sin egen nettleser (Playwright er ikke trådsikkert),
+men alle deler den lagrede innloggingen i ~/.bemify_auth_state.json.
+
+Klimadata lastes inn i et lite vindu i siden (window._bemifyKlima) og
+slippes så snart simuleringen har startet. Med vindu > 0 i kjor() lastes
+neste klima mens forrige simulering regner, så minnebruken i nettleseren
+er uavhengig av antall klimafiler. Med en cache hentes ferdig parsede
+klimadata fra klimalageret (se bemify_klima.py) i stedet for å parse EPW.
+
+Bruk:
+    with ArbeiderPool(4, "https://app.bemify.no") as pool:
+        resultater = pool.kjor([lambda page: ..., lambda page: ...])
+"""
+
+import hashlib
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Callable
+from urllib.parse import urlparse
+
+try:
+    from playwright.sync_api import sync_playwright, Page
+except ImportError:
+    print("Feil: playwright er ikke installert. Kjør:")
+    print("  pip install playwright")
+    print("  playwright install chromium")
+    sys.exit(1)
+
+from bemify_cache import ResultatCache
+from bemify_klima import EpwFil, glem_side, hent_klima, klima_nokkel, lagre_klima
+from bemify_trace import registrer_kall, spenn
+
+
+_lokal = threading.local()
+_lastede_klima: dict = {}
+_bygg_ider: dict = {}
+
+# Forespørsler som ikke trengs for å simulere, og som bare forsinker oppstarten
+BLOKKERTE_TYPER = {"image", "font", "media"}
+BLOKKERTE_VERTER = (
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net",
+    "hotjar.com", "clarity.ms", "segment.io", "plausible.io",
+)
+
+
+class InnloggingKreves(Exception):
+    """BEMIFY sendte nettleseren til innloggingssiden."""
+
+
+def hent_auth_sti() -> Path:
+    """Hent sti til lagret autentiseringstilstand."""
+    return Path.home() / ".bemify_auth_state.json"
+
+
+def logg_inn_og_lagre(playwright, bemify_url: str) -> Path:
+    """Åpne nettleser for manuell innlogging, lagre autentiseringstilstand."""
+    auth_sti = hent_auth_sti()
+
+    print("\n" + "=" * 60)
+    print("INNLOGGING KREVES")
+    print("=" * 60)
+    print("En nettleser åpnes nå. Vennligst logg inn på BEMIFY.")
+    print("Når du er logget inn, trykk ENTER her for å fortsette...")
+    print("=" * 60 + "\n")
+
+    browser = playwright.chromium.launch(headless=False)
+    context = browser.new_context()
+    page = context.new_page()
+    page.goto(bemify_url, wait_until="networkidle", timeout=60000)
+
+    input("Trykk ENTER når du er logget inn...")
+
+    context.storage_state(path=str(auth_sti))
+    print("[Runner] Autentisering lagret")
+    browser.close()
+    return auth_sti
+
+
+def _filtrer_foresporsel(route) -> None:
+    """Avbryt bilder, fonter, media og analyse; slipp gjennom resten."""
+    request = route.request
+    vert = urlparse(request.url).hostname or ""
+    if request.resource_type in BLOKKERTE_TYPER or any(vert == v or vert.endswith("." + v) for v in BLOKKERTE_VERTER):
+        route.abort()
+    else:
+        route.continue_()
+
+
+def apne_bemify(playwright, bemify_url: str, headless: bool, auth_sti: Path | None):
+    """
+    Start nettleser med lagret innlogging og vent til bemify-API-et er klart.
+    auth_sti=None åpner siden uten innlogging (f.eks. en lokal testside).
+    """
+    browser = playwright.chromium.launch(headless=headless)
+    context = browser.new_context(storage_state=str(auth_sti) if auth_sti else None)
+    context.route("**/*", _filtrer_foresporsel)
+    page = context.new_page()
+    page.goto(bemify_url, wait_until="domcontentloaded", timeout=60000)
+
+    # Vent på API-et eller en omdirigering til innlogging, ikke på networkidle
+    page.wait_for_function(
+        "typeof window.bemify !== 'undefined' || /login|auth/i.test(location.href)",
+        timeout=60000,
+    )
+    if "login" in page.url.lower() or "auth" in page.url.lower():
+        browser.close()
+        raise InnloggingKreves(page.url)
+
+    return browser, page
+
+
+def hent_bygg_id(page: Page) -> str:
+    """
+    Identifiser BEMIFY-bygget som er lastet i siden: versjonsfeltet i
+    window.bemify hvis det finnes, ellers script-URL-ene (byggede bundler
+    har innholdshash i filnavnet). Tom streng hvis ingen av delene finnes.
+    """
+    return page.evaluate("""
+        () => {
+            const b = window.bemify || {};
+            const versjon = b.version || b.VERSION || b.buildId;
+            if (versjon) return 'versjon:' + String(versjon);
+            const kilder = Array.from(document.querySelectorAll('script[src]'), s => s.src).sort();
+            return kilder.length ? 'skript:' + kilder.join('|') : '';
+        }
+    """)
+
+
+def sikre_prosjekt(page: Page, sxi_innhold: str) -> dict:
+    """Parse SXI i siden hvis den ikke allerede er lastet. Returnerer prosjektinfo."""
+    nokkel = hashlib.sha256(sxi_innhold.encode("utf-8")).hexdigest()
+    info = page.evaluate(
+        "(nokkel) => window._bemifyProjectKey === nokkel ? window._bemifyProjectInfo : null",
+        nokkel,
+    )
+    if info:
+        return info
+
+    # Innholdet sendes som data (evaluate-argument), ikke som JavaScript-kode
+    with spenn("sxi_parse"):
+        return page.evaluate("""
+            async ({ sxiContent, nokkel }) => {
+                const projectNode = await window.bemify.parseSxi(sxiContent);
+                window._bemifyProject = projectNode;
+                window._bemifyProjectKey = nokkel;
+                window._bemifyProjectInfo = {
+                    name: projectNode.data.navn,
+                    category: projectNode.data.bygningskategori,
+                    zones: projectNode.children?.filter(c => c.type === 'sone')?.length || 0
+                };
+                return window._bemifyProjectInfo;
+            }
+        """, {"sxiContent": sxi_innhold, "nokkel": nokkel})
+
+
+def last_klima(page: Page, epw: EpwFil, cache: ResultatCache | None = None, navn: str | None = None) -> str:
+    """
+    Legg EPW inn i sidens klimavindu hvis den ikke allerede er lastet.
+    Med cache hentes parsede klimadata fra klimalageret, og klima som
+    parses legges i lageret til neste gang. EPW-teksten leses bare når
+    klimaet må parses. Returnerer nøkkelen.
+    """
+    nokkel = epw.sha256
+    lastet = _lastede_klima.setdefault(page, set())
+    if nokkel in lastet:
+        return nokkel
+
+    lagernokkel = None
+    if cache:
+        if page not in _bygg_ider:
+            _bygg_ider[page] = hent_bygg_id(page)
+        # Uten bygg-id kan lagrede data stamme fra en annen parseEpw
+        if _bygg_ider[page]:
+            lagernokkel = klima_nokkel(_bygg_ider[page], nokkel)
+    if not (lagernokkel and hent_klima(page, cache, nokkel, lagernokkel, navn)):
+        epw_innhold = epw.les()
+        start = time.time()
+        t0 = time.perf_counter()
+        parse_ms = page.evaluate("""
+            ({ epwContent, nokkel }) => {
+                const start = performance.now();
+                if (!window._bemifyKlima) window._bemifyKlima = new Map();
+                window._bemifyKlima.set(nokkel, window.bemify.parseEpw(epwContent).climateData);
+                return performance.now() - start;
+            }
+        """, {"epwContent": epw_innhold, "nokkel": nokkel})
+        registrer_kall("epw_transfer", "parse_epw", start, time.perf_counter() - t0, parse_ms, navn)
+        if lagernokkel:
+            with spenn("klima_store", navn):
+                lagre_klima(page, cache, nokkel, lagernokkel)
+    lastet.add(nokkel)
+    return nokkel
+
+
+def slipp_klima(page: Page, nokler: list[str]) -> None:
+    """Fjern klima lastet med last_klima fra vinduet."""
+    _lastede_klima.get(page, set()).difference_update(nokler)
+    page.evaluate("(nokler) => nokler.forEach((k) => window._bemifyKlima?.delete(k))", nokler)
+
+
+def start_simulering(page: Page, epw: EpwFil, cache: ResultatCache | None = None) -> None:
+    """
+    Start simulering av ett klima uten å vente på den. Klimaet fjernes fra
+    vinduet med en gang, og promiset ligger i window._bemifySim som
+    { result, ms } eller { error }, der ms er simuleringstiden målt i siden.
+    Med cache brukes klimalageret (se last_klima).
+    """
+    nokkel = last_klima(page, epw, cache)
+    _lastede_klima[page].discard(nokkel)
+    page.evaluate("""
+        (nokkel) => {
+            const climateData = window._bemifyKlima.get(nokkel);
+            window._bemifyKlima.delete(nokkel);
+            let start;
+            window._bemifySim = Promise.resolve()
+                .then(() => {
+                    start = performance.now();
+                    return window.bemify.simulate(window._bemifyProject, climateData);
+                })
+                .then(
+                    (result) => ({ result, ms: performance.now() - start }),
+                    (err) => ({ error: err.message || String(err) }),
+                );
+        }
+    """, nokkel)
+
+
+def forbered_neste(page: Page) -> None:
+    """
+    Kjør forberedelsen (f.eks. last_klima) for oppgavene som står i kø hos
+    denne arbeideren. Kalles fra en oppgave etter start_simulering, så
+    lastingen overlapper med simuleringen. Feil ignoreres her; oppgaven
+    laster selv og rapporterer feilen når den kjøres.
+    """
+    innboks = getattr(_lokal, "innboks", None)
+    if innboks is None:
+        return
+    with innboks.mutex:
+        ko = [jobb for jobb in innboks.queue if jobb is not None][:_lokal.pool._vindu]
+    for i, _, forbered in ko:
+        if forbered and i not in _lokal.forberedt:
+            _lokal.forberedt.add(i)
+            try:
+                forbered(page)
+            except Exception:
+                pass
+
+
+class ArbeiderPool:
+    """
+    N uavhengige BEMIFY-sider, hver i sin egen tråd.
+
+    kjor() deler ut oppgaver fra en felles kø: den arbeideren som blir
+    ledig først, får neste oppgave. En oppgave er en funksjon som tar
+    arbeiderens Page og returnerer et resultat. Feil returneres som
+    unntaksobjekter på oppgavens plass, så én feilet simulering ikke
+    stopper resten.
+
+    Med vindu > 0 får hver arbeider vindu + 1 oppgaver i kø i tillegg til
+    den som kjøres, og forberedelsen for de vindu første køede oppgavene
+    kan kjøres mens siden regner (se forbered_neste). Den ekstra plassen i
+    køen gjør at neste oppgave står klar før poolen rekker å fylle på. En
+    køet oppgave kan ikke tas av en annen arbeider, så mot slutten kan
+    arbeidere stå ledige mens andre fullfører køen sin.
+    """
+
+    def __init__(self, antall: int, bemify_url: str, headless: bool = True, innlogging: bool = True):
+        self.antall = max(1, antall)
+        self.bemify_url = bemify_url
+        self.headless = headless
+        self.innlogging = innlogging
+        self._svar: queue.Queue = queue.Queue()
+        self._innbokser: list[queue.Queue] = []
+        self._traader: list[threading.Thread] = []
+        self._vindu = 0
+
+    def __enter__(self) -> "ArbeiderPool":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stopp()
+
+    def start(self) -> None:
+        """Start arbeiderne. Ber om ny innlogging hvis sesjonen mangler eller har utløpt."""
+        if not self.innlogging:
+            self._start_arbeidere()
+            return
+        auth_sti = hent_auth_sti()
+        if not auth_sti.exists():
+            self._logg_inn()
+        try:
+            self._start_arbeidere()
+        except InnloggingKreves:
+            print("[Runner] Sesjonen har utløpt...")
+            self.stopp()
+            auth_sti.unlink(missing_ok=True)
+            self._logg_inn()
+            self._start_arbeidere()
+
+    def _logg_inn(self) -> None:
+        with sync_playwright() as p:
+            logg_inn_og_lagre(p, self.bemify_url)
+
+    def _start_arbeidere(self) -> None:
+        print(f"[Runner] Starter {self.antall} arbeider(e) mot {self.bemify_url}...")
+        self._innbokser = [queue.Queue() for _ in range(self.antall)]
+        self._traader = [
+            threading.Thread(target=self._arbeider, args=(nr,), name=f"arbeider-{nr}", daemon=True)
+            for nr in range(self.antall)
+        ]
+        for t in self._traader:
+            t.start()
+
+        feil = []
+        for _ in range(self.antall):
+            _, nr, f = self._svar.get()
+            if f is not None:
+                feil.append(f)
+        if feil:
+            self.stopp()
+            raise next((f for f in feil if isinstance(f, InnloggingKreves)), feil[0])
+        print("[Runner] BEMIFY lastet")
+
+    def _arbeider(self, nr: int) -> None:
+        innboks = self._innbokser[nr]
+        _lokal.innboks = innboks
+        _lokal.pool = self
+        _lokal.forberedt = set()
+        klar = False
+        try:
+            with sync_playwright() as p:
+                auth_sti = hent_auth_sti() if self.innlogging else None
+                browser, page = apne_bemify(p, self.bemify_url, self.headless, auth_sti)
+                klar = True
+                self._svar.put(("klar", nr, None))
+
+                while True:
+                    jobb = innboks.get()
+                    if jobb is None:
+                        break
+                    i, oppgave, _ = jobb
+                    _lokal.forberedt.discard(i)
+                    try:
+                        resultat = oppgave(page)
+                    except Exception as e:
+                        resultat = e
+                    self._svar.put(("ferdig", nr, (i, resultat)))
+
+                _lastede_klima.pop(page, None)
+                _bygg_ider.pop(page, None)
+                glem_side(page)
+                browser.close()
+        except Exception as e:
+            if not klar:
+                self._svar.put(("klar", nr, e))
+
+    def kjor(
+        self,
+        oppgaver: list[Callable[[Page], Any]],
+        ved_ferdig: Callable[[int, Any], None] | None = None,
+        forberedelser: list[Callable[[Page], Any] | None] | None = None,
+        vindu: int = 0,
+    ) -> list:
+        """
+        Kjør oppgavene fordelt på arbeiderne. Resultatene returneres i
+        oppgaverekkefølge. forberedelser[i] kjøres på forhånd for oppgave i
+        når den står i kø (vindu > 0) og en oppgave kaller forbered_neste.
+        """
+        resultater: list = [None] * len(oppgaver)
+        ventende = deque(enumerate(oppgaver))
+        utestaende = [0] * len(self._innbokser)
+        self._vindu = max(0, vindu)
+        maks = 1 + (self._vindu + 1 if self._vindu else 0)
+
+        def del_ut(nr: int) -> None:
+            i, oppgave = ventende.popleft()
+            forbered = forberedelser[i] if forberedelser else None
+            self._innbokser[nr].put((i, oppgave, forbered))
+            utestaende[nr] += 1
+
+        # Én oppgave til hver arbeider først, deretter fylles køene
+        for _ in range(maks):
+            for nr in range(len(self._innbokser)):
+                if ventende:
+                    del_ut(nr)
+
+        while any(utestaende):
+            _, nr, (i, resultat) = self._svar.get()
+            utestaende[nr] -= 1
+            resultater[i] = resultat
+            if ved_ferdig:
+                ved_ferdig(i, resultat)
+            while ventende and utestaende[nr] < maks:
+                del_ut(nr)
+
+        return resultater
+
+    def pa_alle(self, oppgave: Callable[[Page], Any]) -> list:
+        """Kjør samme oppgave én gang på hver arbeider (f.eks. parse SXI)."""
+        for nr, innboks in enumerate(self._innbokser):
+            innboks.put((nr, oppgave, None))
+        resultater: list = [None] * len(self._innbokser)
+        for _ in self._innbokser:
+            _, _, (nr, resultat) = self._svar.get()
+            resultater[nr] = resultat
+        return resultater
+
+    def stopp(self) -> None:
+        """Be alle arbeidere avslutte og lukke nettleseren."""
+        for innboks in self._innbokser:
+            innboks.put(None)
+        for t in self._traader:
+            t.join(timeout=30)
+        self._innbokser = []
+        self._traader = []
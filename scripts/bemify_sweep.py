@@ -0,0 +1,256 @@
+"""
+BEMIFY Sweep - Parameterstudier over SXI-parametre × klima
+
+En sweep-spesifikasjon (JSON eller YAML) beskriver parametre som skal
+varieres i prosjektet som er parset fra SXI-filen. SXI-en parses én gang
+per arbeider; for hver variant settes verdiene rett i prosjektnoden i
+siden, simuleringen startes, og de opprinnelige verdiene settes tilbake
+når simuleringen er ferdig.
+
+Format:
+    design: cartesian                   # cartesian (standard) | lhs
+    samples: 20                         # kun lhs: antall varianter
+    seed: 1                             # kun lhs (standard: 0)
+    parameters:
+      - name: settpunkt                 # kolonnenavn i resultatene
+        path: children/*[type=sone]/data/settpunktVarme
+        values: [19, 20, 21, 22]
+      - name: u_faktor
+        path:                           # én sti, eller liste av stier
+          - children/*[type=sone]/data/yttervegg/uVerdi
+          - children/*[type=sone]/data/tak/uVerdi
+        op: scale                       # set (standard) | scale | add
+        range: [0.8, 1.2]               # lhs: kontinuerlig intervall
+        steps: 5                        # cartesian: jevnt fordelte verdier i range
+
+Stier skrives med "/" mellom nøklene fra prosjektnoden (window._bemifyProject),
+og "*" matcher alle nøkler eller listeelementer på sitt nivå. Et ledd kan
+ha et filter, f.eks. "*[type=sone]" eller "*[navn=Kontor]", som bare
+beholder objekter der feltet har den verdien. Feltnavnene avhenger av
+BEMIFY-modellen; se på window._bemifyProject i nettleserkonsollen. En
+parameter som ikke treffer noe felt gir feil, så skrivefeil i stier
+oppdages før resultatene brukes.
+
+    set    feltet får verdien
+    scale  feltet ganges med verdien
+    add    verdien legges til feltet
+
+cartesian gir alle kombinasjoner av verdiene. lhs (Latin hypercube) gir
+samples varianter der hver parameters intervall (eller verdiliste) er
+delt i samples like store lag, og hvert lag brukes nøyaktig én gang.
+"""
+
+import itertools
+import random
+import re
+from pathlib import Path
+
+from bemify_metrics import les_json_eller_yaml
+
+DESIGN = ("cartesian", "lhs")
+OPERASJONER = ("set", "scale", "add")
+RESERVERTE_NAVN = {"climateName", "variant"}
+
+_LEDD = re.compile(r"^([^\[\]]+)(?:\[([^=\]]+)=([^\]]*)\])?$")
+
+# Setter parameterverdiene i prosjektnoden og husker de gamle verdiene.
+# Returnerer antall felt hver parameter traff.
+ANVEND_JS = """
+(overstyringer) => {
+    function nokler(node, ledd) {
+        if (!node || typeof node !== 'object') return [];
+        const alle = ledd.key === '*' ? Object.keys(node) : (ledd.key in node ? [ledd.key] : []);
+        if (!ledd.filter) return alle;
+        const [felt, verdi] = ledd.filter;
+        return alle.filter((k) => node[k] && typeof node[k] === 'object' && String(node[k][felt]) === verdi);
+    }
+
+    const gamle = [];
+    const treff = {};
+    try {
+        for (const o of overstyringer) {
+            treff[o.name] = 0;
+            for (const sti of o.paths) {
+                let noder = [window._bemifyProject];
+                for (const ledd of sti.slice(0, -1)) {
+                    noder = noder.flatMap((n) => nokler(n, ledd).map((k) => n[k]));
+                }
+                const siste = sti[sti.length - 1];
+                for (const node of noder) {
+                    for (const k of nokler(node, siste)) {
+                        const gammel = node[k];
+                        if (o.op !== 'set' && typeof gammel !== 'number') {
+                            throw new Error(`${o.name}: feltet ${k} er ikke et tall`);
+                        }
+                        gamle.push([node, k, gammel]);
+                        node[k] = o.op === 'scale' ? gammel * o.value : o.op === 'add' ? gammel + o.value : o.value;
+                        treff[o.name]++;
+                    }
+                }
+            }
+        }
+    } finally {
+        window._bemifyGjenopprett = gamle;
+    }
+    return treff;
+}
+"""
+
+# Setter tilbake verdiene fra ANVEND_JS (baklengs, så overlappende stier blir riktige)
+GJENOPPRETT_JS = """
+() => {
+    const gamle = window._bemifyGjenopprett || [];
+    for (let i = gamle.length - 1; i >= 0; i--) {
+        const [node, k, verdi] = gamle[i];
+        node[k] = verdi;
+    }
+    delete window._bemifyGjenopprett;
+}
+"""
+
+
+def les_sweep(sti: Path) -> dict:
+    """Les og valider en sweep-spesifikasjon fra JSON- eller YAML-fil."""
+    return normaliser_sweep(les_json_eller_yaml(sti))
+
+
+def _tolk_sti(tekst: str) -> list[dict]:
+    ledd = []
+    for del_ in tekst.strip("/").split("/"):
+        treff = _LEDD.match(del_)
+        if not treff:
+            raise ValueError(f"ugyldig ledd '{del_}' i stien '{tekst}'")
+        nokkel, felt, verdi = treff.groups()
+        ledd.append({"key": nokkel, "filter": [felt, verdi] if felt else None})
+    return ledd
+
+
+def _er_tall(x) -> bool:
+    return isinstance(x, (int, float)) and not isinstance(x, bool)
+
+
+def normaliser_sweep(spec) -> dict:
+    """Valider sweep-spesifikasjonen og fyll inn standardverdier. Feil gir ValueError."""
+    if not isinstance(spec, dict):
+        raise ValueError("Sweep-spesifikasjonen må være et objekt")
+    design = spec.get("design", "cartesian")
+    if design not in DESIGN:
+        raise ValueError(f"'design' må være en av {', '.join(DESIGN)}")
+    parametre = spec.get("parameters")
+    if not isinstance(parametre, list) or not parametre:
+        raise ValueError("Spesifikasjonen må ha en ikke-tom liste 'parameters'")
+
+    ut = {"design": design, "parameters": []}
+    if design == "lhs":
+        samples = spec.get("samples")
+        if not isinstance(samples, int) or isinstance(samples, bool) or samples < 1:
+            raise ValueError("'samples' må være et positivt heltall for design: lhs")
+        seed = spec.get("seed", 0)
+        if not isinstance(seed, int) or isinstance(seed, bool):
+            raise ValueError("'seed' må være et heltall")
+        ut["samples"] = samples
+        ut["seed"] = seed
+
+    navn_brukt = set()
+    for nr, p in enumerate(parametre, 1):
+        if not isinstance(p, dict):
+            raise ValueError(f"Parameter {nr}: må være et objekt")
+        navn = p.get("name")
+        if not isinstance(navn, str) or not navn:
+            raise ValueError(f"Parameter {nr}: mangler 'name'")
+        if navn in RESERVERTE_NAVN:
+            raise ValueError(f"Parameter {nr}: navnet '{navn}' er reservert")
+        if navn in navn_brukt:
+            raise ValueError(f"Parameter {nr}: navnet '{navn}' er allerede brukt")
+        navn_brukt.add(navn)
+
+        def feil(tekst: str) -> ValueError:
+            return ValueError(f"Parameter {nr} ({navn}): {tekst}")
+
+        stier = p.get("path")
+        stier = [stier] if isinstance(stier, str) else stier
+        if not isinstance(stier, list) or not stier or not all(isinstance(s, str) and s.strip("/") for s in stier):
+            raise feil("'path' må være en sti eller en liste av stier")
+        try:
+            tolket = [_tolk_sti(s) for s in stier]
+        except ValueError as e:
+            raise feil(str(e))
+
+        op = p.get("op", "set")
+        if op not in OPERASJONER:
+            raise feil(f"'op' må være en av {', '.join(OPERASJONER)}")
+
+        norm = {"name": navn, "paths": tolket, "op": op}
+        if "values" in p:
+            verdier = p["values"]
+            if not isinstance(verdier, list) or not verdier:
+                raise feil("'values' må være en ikke-tom liste")
+            if op != "set" and not all(_er_tall(v) for v in verdier):
+                raise feil(f"'values' må være tall for op: {op}")
+            norm["values"] = verdier
+        elif "range" in p:
+            intervall = p["range"]
+            if not (isinstance(intervall, list) and len(intervall) == 2 and all(_er_tall(v) for v in intervall)):
+                raise feil("'range' må være [min, maks]")
+            norm["range"] = [float(intervall[0]), float(intervall[1])]
+            if design == "cartesian":
+                steg = p.get("steps")
+                if not isinstance(steg, int) or isinstance(steg, bool) or steg < 1:
+                    raise feil("'range' krever 'steps' (positivt heltall) for design: cartesian")
+                lo, hi = norm["range"]
+                norm["values"] = [lo + (hi - lo) * k / (steg - 1) if steg > 1 else lo for k in range(steg)]
+        else:
+            raise feil("mangler 'values' eller 'range'")
+        ut["parameters"].append(norm)
+
+    return ut
+
+
+def lag_design(sweep: dict) -> list[dict]:
+    """Lag listen av varianter, hver som {parameternavn: verdi}."""
+    parametre = sweep["parameters"]
+    if sweep["design"] == "cartesian":
+        return [
+            {p["name"]: v for p, v in zip(parametre, kombinasjon)}
+            for kombinasjon in itertools.product(*(p["values"] for p in parametre))
+        ]
+
+    # Latin hypercube: hvert av n lag brukes én gang per parameter
+    n = sweep["samples"]
+    rng = random.Random(sweep["seed"])
+    kolonner = {}
+    for p in parametre:
+        lag = list(range(n))
+        rng.shuffle(lag)
+        andeler = [(k + rng.random()) / n for k in lag]
+        if "range" in p:
+            lo, hi = p["range"]
+            kolonner[p["name"]] = [lo + (hi - lo) * a for a in andeler]
+        else:
+            verdier = p["values"]
+            kolonner[p["name"]] = [verdier[min(len(verdier) - 1, int(a * len(verdier)))] for a in andeler]
+    return [{navn: kolonner[navn][i] for navn in kolonner} for i in range(n)]
+
+
+def overstyringer(sweep: dict, variant: dict) -> list[dict]:
+    """Overstyringene som setter én variant, i formatet ANVEND_JS tar imot."""
+    return [
+        {"name": p["name"], "paths": p["paths"], "op": p["op"], "value": variant[p["name"]]}
+        for p in sweep["parameters"]
+    ]
+
+
+def anvend_parametre(page, overstyr: list[dict]) -> None:
+    """
+    Sett variantens verdier i prosjektnoden. Gir RuntimeError hvis en
+    parameter ikke traff noe felt; kall gjenopprett_parametre uansett.
+    """
+    treff = page.evaluate(ANVEND_JS, overstyr)
+    bom = [navn for navn, n in treff.items() if not n]
+    if bom:
+        raise RuntimeError(f"Parameteren traff ingen felt i prosjektet: {', '.join(bom)}")
+
+
+def gjenopprett_parametre(page) -> None:
+    """Sett tilbake verdiene fra anvend_parametre."""
+    page.evaluate(GJENOPPRETT_JS)
@@ -0,0 +1,288 @@
+"""
+BEMIFY Trace - Tidsmåling per fase for runnerne
+
+Runnerne registrerer et spenn (start og varighet) per klimasted for hver
+fase, når sporing er slått på med --trace eller --profile:
+
+    sxi_parse       parseSxi i siden, inkl. overføring av SXI (én per arbeider)
+    epw_read        lesing av EPW-filen fra disk (ved oppstart bare nye og
+                    endrede filer, uten klimasted; se bemify_klima.py)
+    epw_transfer    overføring av EPW-teksten til siden
+    parse_epw       parseEpw i siden
+    klima_transfer  overføring av lagrede klimadata til siden (klimalageret)
+    klima_unpack    utpakking av lagrede klimadata i siden
+    klima_store     lagring av parsede klimadata i klimalageret
+    simulate        bemify.simulate i siden (args.simulationTime fra metadata)
+    extract         fra simuleringen er ferdig til resultatet er ute av siden
+    write           skriving til fil
+
+--trace run.jsonl skriver én JSON-linje per spenn til run.jsonl og samme
+spenn i Chrome-trace-format til run.chrome.json (åpnes i chrome://tracing
+eller ui.perfetto.dev). --profile skriver p50/p95 per fase til konsollen.
+
+Spenn fra arbeiderne samles per oppgave og sendes tilbake sammen med
+resultatet (spor_oppgave/pakk_ut), så sporingen virker også med --daemon.
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import partial
+from pathlib import Path
+
+FASER = (
+    "sxi_parse", "epw_read", "epw_transfer", "parse_epw", "klima_transfer", "klima_unpack", "klima_store",
+    "simulate", "extract", "write",
+)
+
+_lokal = threading.local()
+_aktiv: "Sporing | None" = None
+
+
+class Sporing:
+    """Samler spenn fra alle tråder i én kjøring."""
+
+    def __init__(self):
+        self.start = time.time()
+        self.spenn: list[dict] = []
+        self._las = threading.Lock()
+
+    def legg_til(self, spenn: list[dict]) -> None:
+        with self._las:
+            self.spenn.extend(spenn)
+
+    def skriv_jsonl(self, sti: Path) -> None:
+        """Én linje per spenn, start og varighet i ms fra kjøringens start."""
+        with open(sti, "w", encoding="utf-8", newline="\n") as f:
+            for s in sorted(self.spenn, key=lambda s: s["start"]):
+                linje = {
+                    "phase": s["phase"],
+                    "climate": s["climate"],
+                    "start_ms": round((s["start"] - self.start) * 1000, 3),
+                    "dur_ms": round(s["dur"] * 1000, 3),
+                    "pid": s["pid"],
+                    "thread": s["thread"],
+                }
+                if s.get("args"):
+                    linje["args"] = s["args"]
+                f.write(json.dumps(linje, ensure_ascii=False) + "\n")
+
+    def skriv_chrome(self, sti: Path) -> None:
+        """Chrome trace event format (fullførte hendelser, 'ph': 'X')."""
+        traader: dict = {}
+        hendelser = []
+        for s in sorted(self.spenn, key=lambda s: s["start"]):
+            tid = traader.setdefault((s["pid"], s["thread"]), len(traader) + 1)
+            hendelser.append({
+                "name": s["phase"],
+                "cat": "bemify",
+                "ph": "X",
+                "ts": round((s["start"] - self.start) * 1e6, 1),
+                "dur": round(s["dur"] * 1e6, 1),
+                "pid": s["pid"],
+                "tid": tid,
+                "args": {"climate": s["climate"], **s.get("args", {})},
+            })
+        for (pid, navn), tid in traader.items():
+            hendelser.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": navn}})
+        with open(sti, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": hendelser, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+
+    def oppsummering(self) -> dict:
+        """
+        p50/p95 per fase i ms. Spenn for samme klimasted og fase summeres
+        først (f.eks. flere skrivinger), spenn uten klimasted telles hver for seg.
+        """
+        per_fase: dict[str, dict] = {}
+        for nr, s in enumerate(self.spenn):
+            nokkel = s["climate"] if s["climate"] is not None else ("#", nr)
+            fase = per_fase.setdefault(s["phase"], {})
+            fase[nokkel] = fase.get(nokkel, 0.0) + s["dur"] * 1000
+
+        ut = {}
+        rekkefolge = list(FASER) + sorted(set(per_fase) - set(FASER))
+        for fase in rekkefolge:
+            if fase not in per_fase:
+                continue
+            verdier = sorted(per_fase[fase].values())
+            ut[fase] = {
+                "n": len(verdier),
+                "p50_ms": _persentil(verdier, 50),
+                "p95_ms": _persentil(verdier, 95),
+                "sum_ms": sum(verdier),
+            }
+        return ut
+
+    def skriv_profil(self) -> None:
+        oppsummering = self.oppsummering()
+        total = sum(f["sum_ms"] for f in oppsummering.values()) or 1.0
+        print("\nProfil (ms per klimasted):")
+        print(f"  {'Fase':<14} {'Antall':>7} {'p50':>10} {'p95':>10} {'Sum [s]':>10} {'Andel':>7}")
+        for fase, f in oppsummering.items():
+            print(f"  {fase:<14} {f['n']:>7} {f['p50_ms']:>10.1f} {f['p95_ms']:>10.1f} "
+                  f"{f['sum_ms'] / 1000:>10.2f} {f['sum_ms'] / total:>7.1%}")
+        print("  (faser kan overlappe, f.eks. lasting av neste klima under simulering)")
+
+
+def _persentil(ordnet: list[float], p: float) -> float:
+    """Nærmeste rang i en sortert liste."""
+    return ordnet[max(0, math.ceil(p / 100 * len(ordnet)) - 1)]
+
+
+def start_sporing() -> Sporing:
+    global _aktiv
+    _aktiv = Sporing()
+    return _aktiv
+
+
+def registrer(fase: str, start: float, varighet: float, klima: str | None = None, **args) -> None:
+    """Registrer et spenn. Gjør ingenting når sporing er av."""
+    samler = getattr(_lokal, "samler", None)
+    if samler is None and _aktiv is None:
+        return
+    spenn = {
+        "phase": fase,
+        "climate": klima if klima is not None else getattr(_lokal, "klima", None),
+        "start": start,
+        "dur": max(0.0, varighet),
+        "pid": os.getpid(),
+        "thread": threading.current_thread().name,
+    }
+    args = {k: v for k, v in args.items() if v is not None}
+    if args:
+        spenn["args"] = args
+    if samler is not None:
+        samler.append(spenn)
+    else:
+        _aktiv.legg_til([spenn])
+
+
+@contextmanager
+def spenn(fase: str, klima: str | None = None, **args):
+    """Mål blokken som ett spenn."""
+    start = time.time()
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        registrer(fase, start, time.perf_counter() - t0, klima, **args)
+
+
+def registrer_kall(
+    fase_overforing: str,
+    fase_side: str,
+    start: float,
+    vegg: float,
+    side_ms: float | None,
+    klima: str | None = None,
+) -> None:
+    """
+    Del et evaluate-kall i overføring og arbeid i siden: side_ms er målt
+    med performance.now() i siden, resten av veggtiden regnes som overføring.
+    """
+    if side_ms is None:
+        return
+    side = side_ms / 1000
+    registrer(fase_overforing, start, vegg - side, klima)
+    registrer(fase_side, start + max(0.0, vegg - side), side, klima)
+
+
+def registrer_simulering(start: float, venter_fra: float, slutt: float, status: dict) -> None:
+    """
+    Registrer simulate og extract for én simulering. start er når
+    simuleringen ble startet, venter_fra når Python begynte å vente på den,
+    og status har ms (målt i siden) og simulationTime fra metadata.
+    """
+    ms = status.get("ms")
+    if ms is None:
+        return
+    sim_slutt = start + ms / 1000
+    registrer("simulate", start, ms / 1000, simulationTime=status.get("simulationTime"))
+    fra = max(venter_fra, sim_slutt)
+    registrer("extract", fra, slutt - fra)
+
+
+# --- Oppgaver i arbeiderne ---
+
+class Sporet:
+    """Resultatet av en sporet oppgave, med spennene den registrerte."""
+
+    def __init__(self, resultat, spenn: list[dict]):
+        self.resultat = resultat
+        self.spenn = spenn
+
+
+def _kjor_sporet(navn: str | None, oppgave, page):
+    forrige = getattr(_lokal, "samler", None), getattr(_lokal, "klima", None)
+    _lokal.samler, _lokal.klima = [], navn
+    try:
+        try:
+            resultat = oppgave(page)
+        except Exception as e:
+            resultat = e
+        return Sporet(resultat, _lokal.samler)
+    finally:
+        _lokal.samler, _lokal.klima = forrige
+
+
+def _med_klima(navn: str, oppgave, page):
+    forrige = getattr(_lokal, "klima", None)
+    _lokal.klima = navn
+    try:
+        return oppgave(page)
+    finally:
+        _lokal.klima = forrige
+
+
+def spor_oppgave(oppgave, navn: str | None = None):
+    """Pakk inn en pool-oppgave så spennene den registrerer følger resultatet."""
+    return partial(_kjor_sporet, navn, oppgave) if _aktiv else oppgave
+
+
+def spor_forberedelse(forbered, navn: str):
+    """Merk spennene fra en forberedelse (f.eks. last_klima) med riktig klimasted."""
+    return partial(_med_klima, navn, forbered) if _aktiv and forbered else forbered
+
+
+def pakk_ut(resultat):
+    """Hent resultatet ut av en sporet oppgave og legg spennene i sporingen."""
+    if isinstance(resultat, Sporet):
+        if resultat.spenn and _aktiv:
+            _aktiv.legg_til(resultat.spenn)
+            resultat.spenn = []
+        return resultat.resultat
+    return resultat
+
+
+# --- Kommandolinje ---
+
+def legg_til_sporings_argumenter(parser) -> None:
+    parser.add_argument("--trace", type=Path, metavar="FIL",
+                        help="Skriv tidsspenn per fase og klima til FIL (JSON-linjer) og FIL.chrome.json")
+    parser.add_argument("--profile", action="store_true",
+                        help="Vis p50/p95 per fase etter kjøringen")
+
+
+def sporing_fra_argumenter(args) -> Sporing | None:
+    if args.trace or args.profile:
+        return start_sporing()
+    return None
+
+
+def chrome_sti(sti: Path) -> Path:
+    return sti.with_suffix(".chrome.json")
+
+
+def avslutt_sporing(sporing: Sporing | None, args) -> None:
+    """Skriv trace-filene og profilen som ble bedt om."""
+    if sporing is None:
+        return
+    if args.trace:
+        sporing.skriv_jsonl(args.trace)
+        sporing.skriv_chrome(chrome_sti(args.trace))
+        print(f"Trace lagret: {args.trace}, {chrome_sti(args.trace)}")
+    if args.profile:
+        sporing.skriv_profil()
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Scriptene importerer hverandre som toppnivåmoduler
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
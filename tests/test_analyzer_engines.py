@@ -0,0 +1,100 @@
+"""Motorene i bemify_results_analyzer skal gi samme totaler."""
+
+import io
+import json
+import random
+
+import pytest
+
+from bemify_results_analyzer import ENERGI_POSTER, ENGINES, iter_rows
+
+TOLERANSE = 1e-9
+
+
+def _simulering(rng: random.Random, navn: str) -> dict:
+    soner = {}
+    for z, steg in enumerate((96, 96, 40)):  # Siste sone kortere enn de andre
+        soner[f"sone_{z}"] = [
+            {"effektBehov": {
+                # Noen tidssteg mangler poster (reserveveien i NumpyAccumulator)
+                post: rng.uniform(-500, 5000) for post in ENERGI_POSTER if (i % 7 or rng.random() < 0.5)
+            }}
+            for i in range(steg)
+        ]
+    return {
+        "climateName": navn,
+        "result": {
+            "stepResultsPerSone": soner,
+            "varmetapstallPerSone": [{"areal": 120.0}, {"areal": 80.5}, {"areal": 15.0}],
+        },
+    }
+
+
+@pytest.fixture
+def ndjson() -> bytes:
+    rng = random.Random(2)
+    linjer = [json.dumps(_simulering(rng, f"Klima {n}"), ensure_ascii=False) for n in range(3)]
+    return ("\n".join(linjer) + "\n").encode("utf-8")
+
+
+def test_motorene_gir_samme_totaler(ndjson):
+    rader = {engine: list(iter_rows(io.BytesIO(ndjson), engine)) for engine in ENGINES}
+    python, numpy = rader["python"], rader["numpy"]
+    assert len(python) == len(numpy) == 3
+    for a, b in zip(python, numpy):
+        assert a.keys() == b.keys()
+        assert a["Klimasted"] == b["Klimasted"]
+        for kolonne, verdi in a.items():
+            if isinstance(verdi, float):
+                assert b[kolonne] == pytest.approx(verdi, rel=TOLERANSE, abs=TOLERANSE), kolonne
+        assert a["Maks [kW]"] > 0
+
+
+
+def _kilde(rng: random.Random, i: int) -> dict:
+    """termiskKildeYtelse der energibærere, kategorier og størrelser dukker opp midt i sonen."""
+    kilde = {"1 Levert elektrisitet": {"1a Romoppvarming": {"input_W": rng.uniform(0, 900)}}}
+    if i >= 20:
+        kilde["1 Levert elektrisitet"]["1a Romoppvarming"]["output_W"] = rng.uniform(0, 2500)
+    if i >= 35:
+        kilde["2 Fjernvarme"] = {"2 Varmtvann": {"input_W": rng.uniform(0, 400), "tap_W": None}}
+    if 50 <= i < 70:
+        kilde["1 Levert elektrisitet"]["2 Varmtvann"] = {"input_W": rng.uniform(0, 300)}
+    if i % 11 == 0:
+        del kilde["1 Levert elektrisitet"]["1a Romoppvarming"]["input_W"]  # Mangler i noen tidssteg
+    return kilde
+
+
+def test_motorene_gir_samme_levert_nar_skjemaet_vokser_midt_i_sonen():
+    rng = random.Random(6)
+    simuleringer = []
+    for n in range(2):
+        simulering = _simulering(rng, f"Klima {n}")
+        for z, steg in enumerate(simulering["result"]["stepResultsPerSone"].values()):
+            for i, tidssteg in enumerate(steg):
+                tidssteg["termiskKildeYtelse"] = _kilde(rng, i + 30 * z * n)
+        simuleringer.append(simulering)
+    ndjson = "".join(json.dumps(s, ensure_ascii=False) + "\n" for s in simuleringer).encode("utf-8")
+
+    rader = {engine: list(iter_rows(io.BytesIO(ndjson), engine, delivered=True, top_n=3)) for engine in ENGINES}
+    for simulering, python, numpy in zip(simuleringer, rader["python"], rader["numpy"], strict=True):
+        # Eksakt sum per sti over alle soner og tidssteg
+        eksakt = {}
+        for steg in simulering["result"]["stepResultsPerSone"].values():
+            for tidssteg in steg:
+                for carrier, categories in tidssteg["termiskKildeYtelse"].items():
+                    for category, quantities in categories.items():
+                        for quantity, power_w in quantities.items():
+                            kolonne = f"termiskKildeYtelse/{carrier}/{category}/{quantity.removesuffix('_W')} [kWh]"
+                            eksakt[kolonne] = eksakt.get(kolonne, 0.0) + (power_w or 0.0) * 0.25 / 1000
+        levert = {kolonne for kolonne in numpy if kolonne.startswith("termiskKildeYtelse/")}
+        # Skjemaet deles i filen: stier fra tidligere simuleringer gir 0 i numpy-raden
+        assert set(eksakt) <= levert
+        for kolonne in levert:
+            assert numpy[kolonne] == pytest.approx(eksakt.get(kolonne, 0.0), rel=TOLERANSE, abs=TOLERANSE), kolonne
+            assert python.get(kolonne, 0.0) == pytest.approx(numpy[kolonne], rel=TOLERANSE, abs=TOLERANSE), kolonne
+
+        assert python["Last"].keys() == numpy["Last"].keys()
+        for sone, profil in python["Last"].items():
+            assert profil.peak_w == pytest.approx(numpy["Last"][sone].peak_w, rel=TOLERANSE)
+            assert [t for t, _ in profil.top_hours()] == [t for t, _ in numpy["Last"][sone].top_hours()]
@@ -0,0 +1,102 @@
+"""Fortsettelse av kjor_batch_til_fil etter et avbrudd med ventende delfiler."""
+
+import json
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("playwright")  # bemify_session og runneren krever playwright
+
+import bemify_batch_runner
+from bemify_batch_runner import kjor_batch_til_fil
+from bemify_cache import ResultatCache
+from bemify_klima import les_epw_filer
+
+
+class Pool:
+    """Pool uten nettleser; oppgavene kjøres etter tur i denne prosessen."""
+
+    antall = 1
+
+    def pa_alle(self, oppgave):
+        return [oppgave(None)]
+
+    def kjor(self, oppgaver, ved_ferdig=None, forberedelser=None, vindu=0):
+        for i, oppgave in enumerate(oppgaver):
+            ved_ferdig(i, oppgave(None))
+
+
+def _linje(navn: str, kilde: str) -> str:
+    return json.dumps({"climateName": navn, "result": {"kilde": kilde}}, separators=(",", ":")) + "\n"
+
+
+@pytest.fixture
+def simulert(monkeypatch):
+    """Klimastedene som faktisk simuleres."""
+    simulerte = []
+
+    def simuler_til_fil(page, sxi_innhold, navn, epw, del_sti, **_):
+        simulerte.append(navn)
+        del_sti.write_text(_linje(navn, "simulert"), encoding="utf-8")
+        return navn
+
+    monkeypatch.setattr(bemify_batch_runner, "simuler_til_fil", simuler_til_fil)
+    monkeypatch.setattr(bemify_batch_runner, "sikre_prosjekt",
+                        lambda page, sxi_innhold: {"name": "Test", "category": "Kontor", "zones": 1})
+    monkeypatch.setattr(bemify_batch_runner, "hent_bygg_id", lambda page: "bygg-1")
+    return simulerte
+
+
+@pytest.mark.parametrize("med_cache", [False, True])
+def test_fortsett_gjenbruker_hele_delfiler(tmp_path, simulert, med_cache):
+    stier = []
+    for navn in ("A", "B", "C", "D"):
+        stier.append(tmp_path / f"{navn}.epw")
+        stier[-1].write_text(f"LOCATION,{navn},-,NOR\n1,2,3\n", encoding="utf-8")
+    cache = ResultatCache(tmp_path / "cache", 10**9) if med_cache else None
+    epw_filer = [(sti.stem, epw) for sti, epw in zip(stier, les_epw_filer(stier, cache))]
+
+    # A står i filen; C og D ble ferdige i feil rekkefølge, B ble avbrutt
+    output = tmp_path / "results.ndjson"
+    output.write_text(_linje("A", "fil"), encoding="utf-8")
+    deler = tmp_path / "results.ndjson.deler"
+    deler.mkdir()
+    (deler / "00000.ndjson").write_text(_linje("B", "del")[:-10], encoding="utf-8")
+    (deler / "00001.ndjson").write_text(_linje("C", "del"), encoding="utf-8")
+    (deler / "00002.ndjson").write_text(_linje("D", "del"), encoding="utf-8")
+    (deler / "00003.ndjson").write_text(_linje("E", "del"), encoding="utf-8")  # Ikke i denne kjøringen
+
+    status = kjor_batch_til_fil(Pool(), "<sxi/>", epw_filer, output, cache=cache)
+
+    assert simulert == ["B"]
+    assert status == {"succeeded": ["B", "C", "D"], "failed": [], "skipped": ["A"]}
+    linjer = [json.loads(linje) for linje in output.read_text(encoding="utf-8").splitlines()]
+    assert [(linje["climateName"], linje["result"]["kilde"]) for linje in linjer] == [
+        ("A", "fil"), ("B", "simulert"), ("C", "del"), ("D", "del"),
+    ]
+    assert not deler.exists()
+
+    if med_cache:
+        # De gjenbrukte delfilene er også lagret i cachen
+        output.unlink()
+        simulert.clear()
+        kjor_batch_til_fil(Pool(), "<sxi/>", epw_filer, output, cache=cache)
+        assert simulert == ["A"]
+        assert [json.loads(linje)["result"]["kilde"] for linje in output.read_text(encoding="utf-8").splitlines()] == [
+            "simulert", "simulert", "del", "del",
+        ]
+
+
+def test_overwrite_sletter_delfilene(tmp_path, simulert):
+    sti = tmp_path / "A.epw"
+    sti.write_text("LOCATION,A,-,NOR\n1,2,3\n", encoding="utf-8")
+    output = tmp_path / "results.ndjson"
+    output.write_text("", encoding="utf-8")
+    deler = Path(str(output) + ".deler")
+    deler.mkdir()
+    (deler / "00000.ndjson").write_text(_linje("A", "del"), encoding="utf-8")
+
+    kjor_batch_til_fil(Pool(), "<sxi/>", [("A", les_epw_filer([sti])[0])], output, fortsett=False)
+
+    assert simulert == ["A"]
+    assert json.loads(output.read_text(encoding="utf-8"))["result"]["kilde"] == "simulert"
@@ -0,0 +1,111 @@
+"""Runnerne mot en daemon som kjører i en annen arbeidsmappe enn klienten."""
+
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("playwright")  # bemify_session og runnerne krever playwright
+
+from bemify_batch_runner import kjor_batch_til_fil
+from bemify_cache import ResultatCache
+from bemify_daemon import hent_info_sti, koble_til
+from bemify_klima import les_epw_filer
+
+SCRIPTS = Path(__file__).resolve().parent.parent / "scripts"
+URL = "http://bemify.test"
+
+# Daemon med en pool uten nettleser. Oppgavene kjøres som i ArbeiderPool,
+# men simuler_til_fil skriver bare en linje med klimanavnet til del_sti.
+DAEMON = """
+import json, threading
+import bemify_batch_runner, bemify_session
+from bemify_daemon import Daemon
+
+def simuler_til_fil(page, sxi_innhold, navn, epw, del_sti, cache=None, **_):
+    if cache is not None and not cache.mappe.is_dir():
+        raise RuntimeError(f"finner ikke cachen {cache.mappe}")
+    del_sti.write_text(json.dumps({"climateName": navn, "sha256": epw.sha256}) + "\\n", encoding="utf-8")
+    return navn
+
+bemify_batch_runner.simuler_til_fil = simuler_til_fil
+bemify_session.sikre_prosjekt = lambda page, sxi_innhold: {"name": "Test", "category": "Kontor", "zones": 1}
+bemify_session.hent_bygg_id = lambda page: "bygg-1"
+
+class Pool:
+    antall = 1
+    bemify_url = %r
+
+    def pa_alle(self, oppgave):
+        return [self._en(oppgave)]
+
+    def kjor(self, oppgaver, ved_ferdig=None, forberedelser=None, vindu=0):
+        resultater = []
+        for i, oppgave in enumerate(oppgaver):
+            resultater.append(self._en(oppgave))
+            if ved_ferdig:
+                ved_ferdig(i, resultater[-1])
+        return resultater
+
+    def _en(self, oppgave):
+        try:
+            return oppgave(None)
+        except Exception as e:
+            return e
+
+daemon = Daemon(Pool())
+daemon.skriv_info()
+threading.Thread(target=daemon.serve, daemon=True).start()
+daemon.stoppet.wait()
+""" % URL
+
+
+@pytest.fixture
+def daemon(tmp_path, monkeypatch):
+    """Start daemonen i tmp_path/daemon, med HOME (og infofilen) i tmp_path/home."""
+    hjem = tmp_path / "home"
+    mappe = tmp_path / "daemon"
+    hjem.mkdir()
+    mappe.mkdir()
+    monkeypatch.setenv("HOME", str(hjem))
+    miljo = {**os.environ, "PYTHONPATH": os.pathsep.join([str(SCRIPTS), os.environ.get("PYTHONPATH", "")])}
+    prosess = subprocess.Popen([sys.executable, "-c", DAEMON], cwd=mappe, env=miljo)
+    try:
+        for _ in range(200):
+            if hent_info_sti().exists() or prosess.poll() is not None:
+                break
+            time.sleep(0.05)
+        assert hent_info_sti().exists(), "daemonen startet ikke"
+        yield mappe
+        with koble_til() as klient:
+            klient.stopp()
+        prosess.wait(timeout=10)
+    finally:
+        if prosess.poll() is None:
+            prosess.kill()
+
+
+@pytest.mark.parametrize("med_cache", [False, True])
+def test_relative_stier_med_annen_arbeidsmappe(daemon, tmp_path, monkeypatch, med_cache):
+    klient = tmp_path / "klient"
+    (klient / "klima").mkdir(parents=True)
+    for navn in ("Oslo", "Bergen"):
+        (klient / "klima" / f"{navn}.epw").write_text(f"LOCATION,{navn},-,NOR\n1,2,3\n", encoding="utf-8")
+    monkeypatch.chdir(klient)
+
+    stier = [Path("klima/Oslo.epw"), Path("klima/Bergen.epw")]
+    cache = ResultatCache(Path("cache"), 10**9) if med_cache else None
+    epw_filer = [(sti.stem, epw) for sti, epw in zip(stier, les_epw_filer(stier, cache))]
+    with koble_til(URL) as pool:
+        status = kjor_batch_til_fil(pool, "<sxi/>", epw_filer, Path("results.ndjson"), cache=cache, fortsett=False)
+
+    assert status["failed"] == []
+    assert status["succeeded"] == ["Oslo", "Bergen"]
+    linjer = [json.loads(linje) for linje in (klient / "results.ndjson").read_text(encoding="utf-8").splitlines()]
+    assert [linje["climateName"] for linje in linjer] == ["Oslo", "Bergen"]
+    assert [linje["sha256"] for linje in linjer] == [epw.sha256 for _, epw in epw_filer]
+    assert not list(daemon.iterdir())
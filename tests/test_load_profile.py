@@ -0,0 +1,122 @@
+"""LoadProfile mot en eksakt numpy-beregning over hele serien."""
+
+import numpy as np
+import pytest
+
+from bemify_results_analyzer import STEPS_PER_HOUR, TIMESTEP_HOURS, LoadProfile
+
+
+def _serie(n: int, seed: int = 1) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    # Døgnprofil med støy, noen tidssteg uten effekt eller med negativ effekt og NaN
+    t = np.arange(n) * TIMESTEP_HOURS
+    serie = 2000 + 1500 * np.sin(2 * np.pi * t / 24) + rng.normal(0, 300, n)
+    serie *= rng.lognormal(0, 0.8, n)
+    serie[rng.random(n) < 0.05] = 0.0
+    serie[rng.random(n) < 0.02] *= -1
+    serie[rng.random(n) < 0.01] = np.nan
+    return serie
+
+
+def _timer(serie: np.ndarray) -> np.ndarray:
+    """Timesmiddel, med en ufullstendig siste time for seg."""
+    verdier = np.nan_to_num(serie)
+    return np.array([verdier[i:i + STEPS_PER_HOUR].mean() for i in range(0, len(verdier), STEPS_PER_HOUR)])
+
+
+def _mat(serie: np.ndarray, biter: list[int] | None, top_n: int = 10) -> LoadProfile:
+    profil = LoadProfile(top_n)
+    if biter is None:
+        profil.add(serie)
+    else:
+        start = 0
+        for lengde in biter:
+            profil.add(serie[start:start + lengde])
+            start += lengde
+        profil.add(serie[start:])
+    return profil.finish()
+
+
+def _tilfeldige_biter(n: int, seed: int) -> list[int]:
+    rng = np.random.default_rng(seed)
+    biter = []
+    while sum(biter) < n:
+        biter.append(int(rng.choice([0, 1, 3, 5, 7, 97, 1000])))
+    return biter
+
+
+@pytest.mark.parametrize("n", [35041, 8 * 96 + 2])  # Siste time er påbegynt
+@pytest.mark.parametrize("top_n", [1, 10, 50])
+def test_topp_timer_og_maks(n, top_n):
+    serie = _serie(n)
+    profil = _mat(serie, None, top_n)
+
+    timer = _timer(serie)
+    rekkefolge = np.argsort(-timer, kind="stable")[:top_n]
+    assert [time for time, _ in profil.top_hours()] == list(rekkefolge)
+    assert [w for _, w in profil.top_hours()] == pytest.approx(timer[rekkefolge], rel=1e-12)
+
+    verdier = np.nan_to_num(serie)
+    assert profil.count == n
+    assert profil.peak_w == verdier.max()
+    assert profil.peak_step == int(verdier.argmax())
+
+
+def test_ufullstendig_siste_time_tas_med():
+    serie = np.full(4 * 24 + 3, 100.0)
+    serie[-3:] = 5000.0  # Høyeste time er de tre siste tidsstegene
+    profil = _mat(serie, [2, 4 * 24 - 1], top_n=2)
+    assert profil.top_hours() == [(24, 5000.0), (23, 100.0)]
+
+
+@pytest.mark.parametrize("accuracy", [0.005, 0.02])
+def test_kvantiler_innenfor_relativ_feil(accuracy):
+    serie = _serie(35040, seed=3)
+    profil = LoadProfile(accuracy=accuracy)
+    profil.add(serie)
+
+    sortert = np.sort(np.nan_to_num(serie))
+    for q in np.linspace(0, 1, 201):
+        eksakt = sortert[int(np.floor(q * (len(sortert) - 1)))]
+        estimat = profil.quantile(q)
+        if eksakt <= 0:
+            assert estimat == 0.0
+        else:
+            assert abs(estimat - eksakt) <= accuracy * eksakt * (1 + 1e-9), q
+
+
+def test_varighetskurve():
+    serie = _serie(35040, seed=4)
+    profil = _mat(serie, None)
+    timer, effekt = profil.duration(101)
+    assert timer[0] == 0 and timer[-1] == len(serie) * TIMESTEP_HOURS
+    assert effekt[0] == profil.peak_w
+    assert np.all(np.diff(effekt) <= 0)
+
+    # Effekten som overskrides i 100 timer, mot den sorterte serien
+    sortert = np.sort(np.nan_to_num(serie))
+    eksakt = sortert[int(np.floor((1 - 100 / (len(serie) * TIMESTEP_HOURS)) * (len(serie) - 1)))]
+    assert profil.exceeded(100) == pytest.approx(eksakt, rel=0.005)
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_biter_gir_samme_resultat_som_en_gang(seed):
+    serie = _serie(35041, seed=seed)
+    hel = _mat(serie, None)
+    delt = _mat(serie, _tilfeldige_biter(len(serie), seed))
+
+    assert delt.count == hel.count
+    assert (delt.peak_w, delt.peak_step) == (hel.peak_w, hel.peak_step)
+    assert [w for _, w in delt.top_hours()] == pytest.approx([w for _, w in hel.top_hours()], rel=1e-12)
+    assert [time for time, _ in delt.top_hours()] == [time for time, _ in hel.top_hours()]
+    assert (delt.zero, delt.offset) == (hel.zero, hel.offset)
+    assert np.array_equal(delt.bins, hel.bins)
+    for q in (0, 0.1, 0.5, 0.9, 0.99, 1):
+        assert delt.quantile(q) == hel.quantile(q)
+
+
+def test_tom_serie():
+    profil = LoadProfile().finish()
+    assert profil.top_hours() == []
+    assert np.isnan(profil.quantile(0.5))
+    assert profil.exceeded(100) == 0.0
@@ -0,0 +1,77 @@
+"""load_zones: bare valgte soner gås gjennom, i alle formatene."""
+
+import json
+
+import numpy as np
+import pytest
+
+import bemify_ndjson
+from bemify_loader import iter_simulation, list_simulations, load_zones
+
+SONER = ["sone_a", "sone_b", "sone_c"]
+
+
+def _resultat(navn: str, steg: int = 8) -> dict:
+    return {
+        "climateName": navn,
+        "result": {
+            "stepResultsPerSone": {
+                sone: [{"inneklima": {"luftTemperatur": 20 + z + i / 10, "CO2_nivå": 400 + i}} for i in range(steg)]
+                for z, sone in enumerate(SONER)
+            },
+            "solcelleProduction": [{"effekt": 1.0}],
+        },
+    }
+
+
+def _skriv(tmp_path, format: str):
+    resultater = [_resultat("Oslo"), _resultat("Bergen")]
+    if format == "ndjson":
+        sti = tmp_path / "results.ndjson"
+        sti.write_text("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in resultater), encoding="utf-8")
+    elif format == "batch":
+        sti = tmp_path / "results.json"
+        sti.write_text(json.dumps({"results": resultater}, ensure_ascii=False), encoding="utf-8")
+    else:
+        sti = tmp_path / "Oslo.json"
+        sti.write_text(json.dumps(resultater[0]["result"], ensure_ascii=False), encoding="utf-8")
+    return sti
+
+
+@pytest.fixture(params=["ndjson", "batch", "cli"])
+def resultatfil(request, tmp_path):
+    return _skriv(tmp_path, request.param)
+
+
+def test_valgte_soner_er_som_uten_filter(resultatfil):
+    felt = {"T": "inneklima/luftTemperatur", "CO2": "inneklima/CO2_nivå"}
+    alle = load_zones(resultatfil, 0, felt)
+    valgt = load_zones(resultatfil, 0, felt, zones=["sone_b"])
+    assert list(alle) == SONER
+    assert list(valgt) == ["sone_b"]
+    assert valgt["sone_b"].equals(alle["sone_b"])
+    assert np.allclose(valgt["sone_b"]["T"], 21 + np.arange(8) / 10)
+
+
+def test_andre_soner_hoppes_over(resultatfil, monkeypatch):
+    gatt_gjennom = []
+    walk_array = bemify_ndjson.JsonEventReader._walk_array
+
+    def spor(self, path):
+        gatt_gjennom.append(path[-1])
+        return walk_array(self, path)
+
+    monkeypatch.setattr(bemify_ndjson.JsonEventReader, "_walk_array", spor)
+    hendelser = list(iter_simulation(resultatfil, 0, zones={"sone_c"}))
+    assert {data[0] for event, data in hendelser if event in ("step", "zone_end")} == {"sone_c"}
+    assert sum(event == "step" for event, _ in hendelser) == 8
+    assert not {"sone_a", "sone_b"} & set(gatt_gjennom)
+
+
+def test_list_simulations_ndjson(tmp_path):
+    sti = _skriv(tmp_path, "ndjson")
+    linjer = sti.read_bytes().splitlines(keepends=True)
+    assert list_simulations(sti) == [
+        {"index": 0, "climateName": "Oslo", "length": len(linjer[0])},
+        {"index": 1, "climateName": "Bergen", "length": len(linjer[1])},
+    ]
@@ -0,0 +1,60 @@
+"""REDUSER_JS kjørt i node: feltstier og tallverdier."""
+
+import json
+import shutil
+import subprocess
+
+import pytest
+
+from bemify_metrics import REDUSER_JS, STANDARD_SPESIFIKASJON, normaliser_spesifikasjon
+
+pytestmark = pytest.mark.skipif(shutil.which("node") is None, reason="krever node")
+
+
+def _steg(i: int) -> dict:
+    return {
+        "inneklima": {"luftTemperatur": 15 + i % 10},
+        "effektBehov": {"1a Romoppvarming": 1000.0, "1b Ventilasjonsvarme": None},
+    }
+
+
+def reduser(metrikker: list[dict], steg: int = 200) -> dict:
+    """Kjør reduksjonen på et syntetisk resultat med én sone og returner svaret fra node."""
+    spec = normaliser_spesifikasjon({"metrics": metrikker})
+    result = {"stepResultsPerSone": {"sone_0": [_steg(i) for i in range(steg)]}}
+    skript = f"""
+        const reduser = {REDUSER_JS.strip()};
+        try {{
+            console.log(JSON.stringify({{ ok: reduser({json.dumps(result)}, {json.dumps(spec)}) }}));
+        }} catch (err) {{
+            console.log(JSON.stringify({{ feil: err.message }}));
+        }}
+    """
+    svar = subprocess.run(["node", "-e", skript], capture_output=True, text=True, check=True)
+    return json.loads(svar.stdout)
+
+
+def test_kjent_sti():
+    svar = reduser([{
+        "name": "kalde", "type": "threshold_hours", "field": "inneklima/luftTemperatur", "op": "<", "value": 18,
+    }])
+    # 15, 16 og 17 av hver tiende verdi, 0.25 timer per tidssteg
+    assert svar == {"ok": {"kalde": 60 * 0.25}}
+
+
+def test_ukjent_sti_gir_feil():
+    svar = reduser([{
+        "name": "kalde", "type": "threshold_hours", "field": "inneklima/luftTemperatuur", "op": "<", "value": 18,
+    }])
+    assert "inneklima/luftTemperatuur" in svar["feil"]
+
+
+def test_stjerne_uten_treff_gir_feil():
+    svar = reduser([{"name": "x", "type": "sum_kwh", "field": "ukjent/*"}])
+    assert "ukjent/*" in svar["feil"]
+
+
+def test_null_teller_null():
+    # 1b Ventilasjonsvarme er null i alle tidssteg; stien finnes likevel
+    svar = reduser(STANDARD_SPESIFIKASJON["metrics"][1:2], steg=4)
+    assert svar == {"ok": {"varmeenergi_kWh": 4 * 1000.0 * 0.25 / 1000}}
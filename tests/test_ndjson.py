@@ -0,0 +1,163 @@
+"""Strømmende lesing og byte-indeks for NDJSON-resultater."""
+
+import io
+import json
+import os
+
+import pytest
+
+import bemify_ndjson
+from bemify_ndjson import (
+    STEG_STI,
+    JsonEventReader,
+    climate_name_from_head,
+    index_path,
+    iter_lines,
+    line_index,
+)
+from bemify_results_analyzer import iter_rows
+
+
+def _linje(navn: str, steg: int = 50) -> bytes:
+    post = {
+        "climateName": navn,
+        "result": {"stepResultsPerSone": {"sone_0": [{"effektBehov": {"5 Belysning": 100.0 + i}} for i in range(steg)]}},
+    }
+    return json.dumps(post).encode("utf-8") + b"\n"
+
+
+class _Teller(io.BytesIO):
+    """BytesIO som teller hvor mange byte som er lest."""
+
+    lest = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.lest += len(data)
+        return data
+
+
+def test_avkortet_siste_linje():
+    avkortet = _linje("C")[:-40]
+    data = _linje("A") + _linje("B") + avkortet
+    rader = iter_rows(io.BytesIO(data))
+    assert [next(rader)["Klimasted"], next(rader)["Klimasted"]] == ["A", "B"]
+    with pytest.raises(ValueError, match="Ugyldig JSON"):
+        next(rader)
+
+
+@pytest.mark.parametrize("lines", [True, False])
+def test_avkortet_linje_leser_ikke_resten_av_filen(lines):
+    # En avbrutt linje midt i filen, fulgt av mange hele linjer
+    avkortet = _linje("A")[:-40] + b"\n"
+    resten = b"".join(_linje(f"K{i}") for i in range(200))
+    raw = _Teller(avkortet + resten)
+    leser = JsonEventReader(raw, walk=[STEG_STI], chunk_size=1024, lines=lines)
+    with pytest.raises(ValueError, match="Ugyldig JSON"):
+        for _ in leser:
+            pass
+    # Uten lines kan leseren måtte se linjen etter den avkortede
+    grense = len(avkortet) + (0 if lines else len(_linje("K0"))) + 4 * 1024
+    assert raw.lest < grense < len(raw.getvalue())
+
+
+def _forventet(data: bytes, head_size: int) -> list[tuple[int, int, bytes, bool]]:
+    linjer, offset = [], 0
+    for linje in data.splitlines(keepends=True):
+        komplett = linje.endswith(b"\n")
+        linjer.append((offset, len(linje), linje.rstrip(b"\n")[:head_size], komplett))
+        offset += len(linje)
+    return linjer
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 16, 4096])
+def test_iter_lines_over_blokkgrenser(monkeypatch, chunk_size):
+    monkeypatch.setattr(bemify_ndjson, "CHUNK_SIZE", chunk_size)
+    # Linjer som slutter rett før, på og etter en blokkgrense, tomme linjer og en lang linje
+    data = b"abcdef\n\n" + b"x" * 40 + b"\n1234567\n\n" + b"y" * 15 + b"\n"
+    assert list(iter_lines(io.BytesIO(data), head_size=10)) == _forventet(data, 10)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 4096])
+def test_iter_lines_avkortet_siste_linje(monkeypatch, chunk_size):
+    monkeypatch.setattr(bemify_ndjson, "CHUNK_SIZE", chunk_size)
+    data = _linje("A") + _linje("B")[:-30]
+    linjer = list(iter_lines(io.BytesIO(data)))
+    assert linjer == _forventet(data, 4096)
+    assert [komplett for *_, komplett in linjer] == [True, False]
+    assert climate_name_from_head(linjer[1][2]) == "B"
+
+
+def test_iter_lines_fra_gjeldende_posisjon():
+    data = _linje("A") + _linje("B")
+    raw = io.BytesIO(data)
+    raw.seek(len(_linje("A")))
+    assert [(offset, lengde) for offset, lengde, _, _ in iter_lines(raw)] == [(len(_linje("A")), len(_linje("B")))]
+
+
+@pytest.mark.parametrize("hode, navn", [
+    (b'{"climateName":"Oslo","result":{', "Oslo"),
+    (b'  { "climateName" : "Bod\\u00f8 \\"Sentrum\\"", "result"', 'Bodø "Sentrum"'),
+    ('{"climateName":"Tromsø"}'.encode("utf-8"), "Tromsø"),
+    (b'{"result":{},"climateName":"Oslo"}', None),  # Ikke først i linjen
+    (b'{"climateName":"Osl', None),  # Hodet slutter midt i navnet
+    (b'{"climateName":null}', None),
+    (b"", None),
+])
+def test_climate_name_from_head(hode, navn):
+    assert climate_name_from_head(hode) == navn
+
+
+@pytest.fixture
+def indeksert(tmp_path):
+    sti = tmp_path / "results.ndjson"
+    sti.write_bytes(_linje("A") + b"\n" + _linje("B"))
+    return sti
+
+
+def _uten_bygging(monkeypatch) -> None:
+    def feil(filepath):
+        raise AssertionError("indeksen ble bygget på nytt")
+    monkeypatch.setattr(bemify_ndjson, "build_line_index", feil)
+
+
+def test_line_index_lagres_og_gjenbrukes(indeksert, monkeypatch):
+    linjer = line_index(indeksert)
+    a, b = len(_linje("A")), len(_linje("B"))
+    assert linjer == [
+        {"index": 0, "climateName": "A", "offset": 0, "length": a},
+        {"index": 1, "climateName": "B", "offset": a + 1, "length": b},
+    ]
+    assert index_path(indeksert).exists()
+
+    _uten_bygging(monkeypatch)
+    assert line_index(indeksert) == linjer
+
+
+def test_line_index_bygges_etter_tillegg(indeksert):
+    line_index(indeksert)
+    with open(indeksert, "ab") as f:
+        f.write(_linje("C"))
+    assert [linje["climateName"] for linje in line_index(indeksert)] == ["A", "B", "C"]
+    assert json.loads(index_path(indeksert).read_text(encoding="utf-8"))["source"]["size"] == indeksert.stat().st_size
+
+
+def test_line_index_bygges_etter_endret_mtime(indeksert):
+    line_index(indeksert)
+    # Samme størrelse, men nytt innhold og ny mtime
+    indeksert.write_bytes(indeksert.read_bytes().replace(b'"A"', b'"X"'))
+    stat = indeksert.stat()
+    os.utime(indeksert, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert [linje["climateName"] for linje in line_index(indeksert)] == ["X", "B"]
+
+
+@pytest.mark.parametrize("innhold", ["", "{", '{"format": "annet"}', '{"format": "bemify-ndjson-index", "version": 1}'])
+def test_line_index_ugyldig_indeksfil(indeksert, innhold):
+    index_path(indeksert).write_text(innhold, encoding="utf-8")
+    assert [linje["climateName"] for linje in line_index(indeksert)] == ["A", "B"]
+    assert json.loads(index_path(indeksert).read_text(encoding="utf-8"))["format"] == "bemify-ndjson-index"
+
+
+def test_line_index_uten_lagring(indeksert):
+    assert len(line_index(indeksert, save=False)) == 2
+    assert not index_path(indeksert).exists()
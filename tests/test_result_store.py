@@ -0,0 +1,142 @@
+"""rewrite: komprimering og kvantisering av NDJSON med avgrenset feil."""
+
+import gzip
+import json
+import random
+
+import numpy as np
+import pytest
+
+import bemify_result_store
+from bemify_ndjson import climate_name_from_head, iter_members, member_writer, open_result
+from bemify_result_store import rewrite
+
+
+def _simulering(rng: random.Random, navn: str) -> dict:
+    steg = []
+    for i in range(60):
+        steg.append({
+            "effektBehov": {"1 Romoppvarming": rng.uniform(-50, 5000), "5 Belysning": rng.choice([0.0, 12.5, 100.0])},
+            "inneklima": {"luftTemperatur": rng.gauss(21, 3), "co2": rng.randint(400, 1200)},
+            "smaa": [rng.uniform(-1, 1) * 10 ** rng.randint(-12, -3), 1e-300, -2.5e-7],
+            "store": [rng.uniform(1e15, 1e18), 1.7976931348623157e308, -3e20],
+            "tekst": f"Sone {i}.5 \"{rng.random()}\" 1e5",
+            "1.5": i,
+        })
+    return {"climateName": navn, "result": {"stepResultsPerSone": {"sone_0": steg}, "antall": 60, "versjon": "2.0.1"}}
+
+
+@pytest.fixture
+def kilde(tmp_path):
+    rng = random.Random(5)
+    sti = tmp_path / "results.ndjson"
+    linjer = [json.dumps(_simulering(rng, f"Klima {n}"), ensure_ascii=False) for n in range(4)]
+    # Siste linje uten linjeskift, som etter et avbrudd
+    sti.write_text("\n".join(linjer), encoding="utf-8")
+    return sti
+
+
+def _les(sti) -> list:
+    with open_result(sti) as f:
+        return [json.loads(linje) for linje in f.read().splitlines()]
+
+
+def _sammenlign(a, b, feil) -> None:
+    """Samme nøkler, heltall og strenger; feil(a, b) for desimaltall."""
+    if isinstance(a, dict):
+        assert list(a) == list(b)
+        for k in a:
+            _sammenlign(a[k], b[k], feil)
+    elif isinstance(a, list):
+        assert len(a) == len(b)
+        for x, y in zip(a, b):
+            _sammenlign(x, y, feil)
+    elif isinstance(a, float):
+        assert isinstance(b, (int, float)) and not isinstance(b, bool)
+        feil(a, float(b))
+    else:
+        assert type(a) is type(b) and a == b
+
+
+@pytest.mark.parametrize("endelse", [".gz", ".zst"])
+@pytest.mark.parametrize("decimals", [0, 3])
+def test_decimals_absolutt_feil(kilde, tmp_path, monkeypatch, endelse, decimals):
+    if endelse == ".zst":
+        pytest.importorskip("zstandard")
+    monkeypatch.setattr(bemify_result_store, "CHUNK_SIZE", 37)  # Tall og strenger deles mellom bitene
+    target = tmp_path / f"ut.ndjson{endelse}"
+    stats = rewrite(kilde, target, decimals=decimals)
+    assert stats["lines"] == 4
+
+    grense = 0.5 * 10 ** -decimals
+
+    def feil(a, b):
+        if abs(a) >= 1e15:
+            assert b == a
+        else:
+            assert abs(b - a) <= grense * (1 + 1e-12)
+
+    for a, b in zip(_les(kilde), _les(target), strict=True):
+        _sammenlign(a, b, feil)
+
+
+def test_float32_relativ_feil(kilde, tmp_path, monkeypatch):
+    monkeypatch.setattr(bemify_result_store, "CHUNK_SIZE", 37)
+    target = tmp_path / "ut.ndjson.gz"
+    rewrite(kilde, target, float32=True)
+
+    def feil(a, b):
+        if abs(a) > float(np.finfo(np.float32).max):
+            assert b == a  # Utenfor float32 beholdes teksten
+        elif abs(a) > 1.2e-38:
+            assert abs(b - a) <= 2 ** -23 * abs(a)
+            assert np.float32(b) == np.float32(a)
+        else:
+            assert abs(b - a) <= 1.5e-45
+
+    for a, b in zip(_les(kilde), _les(target), strict=True):
+        _sammenlign(a, b, feil)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 37, 1 << 20])
+def test_uten_kvantisering_er_teksten_uendret(kilde, tmp_path, monkeypatch, chunk_size):
+    monkeypatch.setattr(bemify_result_store, "CHUNK_SIZE", chunk_size)
+    target = tmp_path / "ut.ndjson.gz"
+    rewrite(kilde, target)
+    assert gzip.decompress(target.read_bytes()) == kilde.read_bytes()
+
+
+def test_bitstorrelsen_endrer_ikke_resultatet(kilde, tmp_path, monkeypatch):
+    ut = []
+    for chunk_size in (1, 37, 1 << 20):
+        monkeypatch.setattr(bemify_result_store, "CHUNK_SIZE", chunk_size)
+        rewrite(kilde, tmp_path / "ut.ndjson", decimals=2)
+        ut.append((tmp_path / "ut.ndjson").read_bytes())
+    assert ut[0] == ut[1] == ut[2]
+
+
+def test_ett_gzip_medlem_per_linje_kan_fortsettes(kilde, tmp_path):
+    target = tmp_path / "ut.ndjson.gz"
+    rewrite(kilde, target, decimals=3)
+    medlemmer = list(iter_members(target, "gzip"))
+    assert [[climate_name_from_head(h) for h in hoder] for _, hoder, _ in medlemmer] == [
+        ["Klima 0"], ["Klima 1"], ["Klima 2"], [],
+    ]
+    assert medlemmer[-1][2]  # Siste linje mangler linjeskift og er åpen
+
+    # Avbrutt skriving av et nytt medlem: bare hele medlemmer telles, og
+    # filen kuttes etter det siste før nye linjer føyes til, som i runneren
+    helt = target.read_bytes()
+    with open(target, "ab") as f:
+        f.write(gzip.compress(b'{"climateName":"Klima 4","result":{}}\n', mtime=0)[:-12])
+    assert [m[0] for m in iter_members(target, "gzip")] == [m[0] for m in medlemmer]
+    slutt = medlemmer[2][0]
+    with open(target, "r+b") as f:
+        f.truncate(slutt)
+    with open(target, "ab") as f:
+        with member_writer(f, "gzip") as linje:
+            linje.write(b'{"climateName":"Klima 3","result":{"antall":1.25}}\n')
+    assert target.read_bytes()[:slutt] == helt[:slutt]
+    linjer = _les(target)
+    assert [linje["climateName"] for linje in linjer] == ["Klima 0", "Klima 1", "Klima 2", "Klima 3"]
+    assert linjer[3]["result"] == {"antall": 1.25}
@@ -0,0 +1,76 @@
+"""--rollup auto: sidefilen bygges første gang og brukes deretter."""
+
+import json
+import os
+import random
+
+import pytest
+
+import bemify_results_analyzer
+from bemify_results_analyzer import process_ndjson
+from bemify_rollup import Rollups, rollup_path
+from test_analyzer_engines import TOLERANSE, _simulering
+
+
+@pytest.fixture
+def resultater(tmp_path):
+    rng = random.Random(3)
+    sti = tmp_path / "results.ndjson"
+    linjer = [json.dumps(_simulering(rng, f"Klima {n}"), ensure_ascii=False) for n in range(3)]
+    sti.write_text("\n".join(linjer) + "\n", encoding="utf-8")
+    return sti
+
+
+def _lik(a, b) -> None:
+    assert list(a.columns) == list(b.columns)
+    assert list(a["Klimasted"]) == list(b["Klimasted"])
+    for kolonne in a.columns:
+        if a[kolonne].dtype.kind == "f":
+            assert list(b[kolonne]) == pytest.approx(list(a[kolonne]), rel=TOLERANSE, abs=TOLERANSE), kolonne
+
+
+def _uten_strommning(monkeypatch) -> None:
+    def feil(*args, **kwargs):
+        raise AssertionError("resultatfilen ble lest i stedet for sidefilen")
+    monkeypatch.setattr(bemify_results_analyzer, "iter_rows", feil)
+
+
+def test_auto_bygger_og_bruker_sidefilen(resultater, monkeypatch):
+    hele = process_ndjson(resultater, rollup="off")
+    assert not rollup_path(resultater).exists()
+
+    _lik(hele, process_ndjson(resultater, rollup="auto"))
+    assert Rollups(resultater).gjeldende
+
+    _uten_strommning(monkeypatch)
+    _lik(hele, process_ndjson(resultater, rollup="auto"))
+
+
+def test_auto_bygger_utdatert_sidefil_pa_nytt(resultater, monkeypatch):
+    process_ndjson(resultater, rollup="auto")
+    with open(resultater, "a", encoding="utf-8") as f:
+        f.write(json.dumps(_simulering(random.Random(4), "Klima 3")) + "\n")
+    assert not Rollups(resultater).gjeldende
+
+    hele = process_ndjson(resultater, rollup="off")
+    ny = process_ndjson(resultater, rollup="auto")
+    _lik(hele, ny)
+    assert len(ny) == 4
+    assert Rollups(resultater).gjeldende
+    assert not [p for p in resultater.parent.iterdir() if p.name.endswith((".tmp", ".gammel"))]
+
+    _uten_strommning(monkeypatch)
+    _lik(hele, process_ndjson(resultater, rollup="auto"))
+
+
+@pytest.mark.skipif(os.name == "nt" or os.geteuid() == 0, reason="krever skrivebeskyttede mapper")
+def test_auto_leser_hele_filen_uten_skrivetilgang(resultater):
+    hele = process_ndjson(resultater, rollup="off")
+    resultater.parent.chmod(0o555)
+    try:
+        _lik(hele, process_ndjson(resultater, rollup="auto"))
+        with pytest.raises(OSError):
+            process_ndjson(resultater, rollup="build")
+    finally:
+        resultater.parent.chmod(0o755)
+    assert not rollup_path(resultater).exists()